@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Các định dạng audio dùng chung cho downloader, player và công cụ lọc trùng
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+
+# MP3 (convert) + audio gốc giữ nguyên từ YouTube (chế độ không convert)
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".opus")
+
+
+def is_audio_file(name: str) -> bool:
+    """Tên file có đuôi audio được hỗ trợ"""
+    return name.lower().endswith(AUDIO_EXTENSIONS)
+
+
+def list_audio_files(folder: Path) -> list:
+    """Liệt kê file audio trong thư mục (sắp xếp theo tên)"""
+    folder = Path(folder)
+    return sorted(
+        folder / entry.name for entry in os.scandir(folder)
+        if entry.is_file() and is_audio_file(entry.name)
+    )
+
+
+def find_ffmpeg() -> str:
+    """FFmpeg đặt cạnh script (ffmpeg.exe) hoặc trong PATH"""
+    local = Path(__file__).parent.absolute() / "ffmpeg.exe"
+    if local.exists():
+        return str(local)
+    return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def decode_pcm(filepath: Path, sample_rate: int, offset: float = 0.0,
+               seconds: float = None, channels: int = 1) -> bytes:
+    """
+    Giải mã một đoạn audio thành PCM 16-bit little-endian qua FFmpeg
+
+    Args:
+        filepath: File audio
+        sample_rate: Tần số lấy mẫu đầu ra
+        offset: Bắt đầu từ giây thứ
+        seconds: Độ dài đoạn cần giải mã (None = đến hết file)
+        channels: Số kênh đầu ra
+    """
+    cmd = [find_ffmpeg(), '-nostdin', '-loglevel', 'error']
+    if offset:
+        cmd += ['-ss', str(offset)]
+    cmd += ['-i', str(filepath)]
+    if seconds:
+        cmd += ['-t', str(seconds)]
+    cmd += ['-vn', '-ac', str(channels), '-ar', str(sample_rate), '-f', 's16le', '-']
+    return subprocess.run(cmd, capture_output=True, check=True).stdout
+
+
+def stream_pcm(filepath: Path, sample_rate: int, channels: int = 1, chunk_frames: int = 65536):
+    """
+    Giải mã cả file thành PCM 16-bit little-endian qua FFmpeg, trả dần từng khối
+    (không giữ cả bài trong RAM - dùng cho file dài / mix hàng giờ)
+
+    Yields:
+        bytes, mỗi khối tối đa `chunk_frames` frame (frame = `channels` mẫu)
+    """
+    cmd = [find_ffmpeg(), '-nostdin', '-loglevel', 'error', '-i', str(filepath),
+           '-vn', '-ac', str(channels), '-ar', str(sample_rate), '-f', 's16le', '-']
+    frame_bytes = 2 * channels
+    # stderr ghi ra file tạm: pipe không ai đọc trong lúc đọc stdout -> FFmpeg báo lỗi
+    # nhiều (file hỏng, bài dài) sẽ đầy pipe và treo cả 2 phía
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            while True:
+                data = process.stdout.read(chunk_frames * frame_bytes)
+                if not data:
+                    break
+                yield data[:len(data) - len(data) % frame_bytes]
+            if process.wait() != 0:
+                errors.seek(0)
+                raise subprocess.CalledProcessError(process.returncode, cmd, stderr=errors.read())
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio Fingerprint
+Fingerprint phổ (kiểu Haitsma-Kalker) + chỉ mục LSH (MinHash) để tìm cùng một bài
+từ các bản upload khác nhau (Official MV, Lyrics, reupload khác bitrate, ...)
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import hashlib
+import subprocess
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from audio_files import decode_pcm, list_audio_files
+
+
+# Giải mã mono 5512Hz - đủ cho dải 300-2000Hz dùng làm fingerprint
+SAMPLE_RATE = 5512
+FRAME_SIZE = 2048
+HOP_SIZE = 256
+
+# 33 dải tần log -> 32 bit mỗi frame
+BANDS = 33
+MIN_FREQ = 300
+MAX_FREQ = 2000
+
+# Cửa sổ audio lấy fingerprint (bỏ qua intro ngắn của MV)
+WINDOW_OFFSET = 20.0
+WINDOW_SECONDS = 90.0
+MIN_SECONDS = 10.0
+
+# Key LSH: KEY_BITS bit thấp của frame "ổn định" (giống hệt frame kế tiếp) - các frame
+# giữa nốt giữ nguyên bit khi lệch pha vài mẫu / thêm nhiễu, frame chuyển nốt thì không
+KEY_BITS = 20
+
+# MinHash + LSH: 200 band x 1 hàng, cặp là ứng viên khi trùng >= MIN_BAND_MATCHES band
+# (Jaccard bản reupload lệch bit ~15% chỉ còn ~0.07 -> band nhiều hàng gần như không bao giờ trùng)
+NUM_PERM = 200
+LSH_ROWS = 1
+MIN_BAND_MATCHES = 6
+MAX_BUCKET = 64
+
+# Xác nhận: tỉ lệ bit lệch tốt nhất khi dò độ lệch thời gian (intro dài tới ~30s)
+MAX_BER = 0.35
+MAX_SHIFT_SECONDS = 30.0
+MIN_OVERLAP_FRAMES = 200
+
+# Thư mục cache fingerprint (mỗi file 1 .npy) nằm trong thư mục nhạc
+CACHE_DIR_NAME = ".fingerprints"
+CACHE_VERSION = 1
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Fingerprint mode needs numpy: pip install numpy")
+
+
+def _band_matrix() -> "np.ndarray":
+    """Ma trận (bin FFT x dải) gom năng lượng theo dải tần log"""
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1 / SAMPLE_RATE)
+    edges = np.geomspace(MIN_FREQ, MAX_FREQ, BANDS + 1)
+    band = np.searchsorted(edges, freqs, side='right') - 1
+    matrix = np.zeros((len(freqs), BANDS), dtype=np.float32)
+    valid = (band >= 0) & (band < BANDS)
+    matrix[np.nonzero(valid)[0], band[valid]] = 1.0
+    return matrix
+
+
+def compute_fingerprint(pcm: bytes) -> "np.ndarray":
+    """
+    Fingerprint: mỗi frame 32 bit = dấu của hiệu năng lượng giữa các dải kề nhau theo thời gian
+
+    Frame im lặng được đặt = 0 và bị bỏ qua khi so sánh.
+    """
+    _require_numpy()
+    samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+    if len(samples) < FRAME_SIZE + 2 * HOP_SIZE:
+        return np.zeros(0, dtype=np.uint32)
+
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE).astype(np.float32), axis=1))
+    energy = (spectrum.astype(np.float32) ** 2) @ _band_matrix()
+
+    diff = energy[:, :-1] - energy[:, 1:]
+    bits = (diff[1:] - diff[:-1]) > 0
+    fingerprint = np.packbits(bits, axis=1, bitorder='little').view('<u4').ravel().copy()
+
+    # Frame gần như im lặng cho bit ngẫu nhiên -> bỏ
+    loudness = energy.sum(axis=1)[1:]
+    fingerprint[loudness < loudness.max() * 1e-4] = 0
+    return fingerprint
+
+
+def fingerprint_file(filepath: Path) -> "np.ndarray":
+    """Giải mã cửa sổ cố định của file và tính fingerprint"""
+    min_bytes = int(MIN_SECONDS * SAMPLE_RATE) * 2
+    pcm = decode_pcm(filepath, SAMPLE_RATE, WINDOW_OFFSET, WINDOW_SECONDS)
+    if len(pcm) < min_bytes:
+        # Bài ngắn hơn offset -> lấy từ đầu
+        pcm = decode_pcm(filepath, SAMPLE_RATE, 0.0, WINDOW_SECONDS)
+    return compute_fingerprint(pcm)
+
+
+def _fingerprint_worker(filepath: Path) -> tuple:
+    """Chạy trong process pool"""
+    try:
+        return filepath, fingerprint_file(filepath)
+    except (subprocess.CalledProcessError, OSError, ValueError):
+        return filepath, None
+
+
+def _cache_path(cache_dir: Path, filepath: Path, stat: os.stat_result) -> Path:
+    key = f"{filepath.name}|{stat.st_size}|{stat.st_mtime_ns}|{CACHE_VERSION}"
+    return cache_dir / (hashlib.md5(key.encode('utf-8')).hexdigest() + ".npy")
+
+
+def load_fingerprints(files: list, cache_dir: Path, workers: int = None) -> dict:
+    """
+    Fingerprint cho danh sách file, dùng cache theo (tên, size, mtime)
+
+    Chỉ file mới/đã đổi mới phải giải mã (song song bằng process pool).
+    File cache không còn dùng sẽ bị xóa.
+    """
+    _require_numpy()
+    cache_dir.mkdir(exist_ok=True)
+    result = {}
+    todo = {}
+    for f in files:
+        path = _cache_path(cache_dir, f, f.stat())
+        if path.exists():
+            result[f] = np.load(path)
+        else:
+            todo[f] = path
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for f, fingerprint in executor.map(_fingerprint_worker, todo, chunksize=4):
+                if fingerprint is None:
+                    continue
+                np.save(todo[f], fingerprint)
+                result[f] = fingerprint
+
+    used = {_cache_path(cache_dir, f, f.stat()).name for f in result}
+    for stale in cache_dir.glob("*.npy"):
+        if stale.name not in used:
+            stale.unlink(missing_ok=True)
+    return result
+
+
+def _minhash_params():
+    rng = np.random.default_rng(20240601)
+    prime = np.uint64((1 << 31) - 1)
+    a = rng.integers(1, int(prime), NUM_PERM, dtype=np.uint64)
+    b = rng.integers(0, int(prime), NUM_PERM, dtype=np.uint64)
+    return a, b, prime
+
+
+def stable_keys(fingerprint: "np.ndarray") -> "np.ndarray":
+    """Tập key KEY_BITS bit thấp (dải tần thấp) của các frame có tiếng giống hệt frame kế tiếp"""
+    keys = fingerprint & ((1 << KEY_BITS) - 1)
+    stable = (fingerprint[:-1] != 0) & (fingerprint[1:] != 0) & (keys[:-1] == keys[1:])
+    return np.unique(keys[:-1][stable]).astype(np.uint64)
+
+
+def minhash_signature(fingerprint: "np.ndarray", params) -> "np.ndarray":
+    """MinHash trên tập key ổn định của fingerprint"""
+    a, b, prime = params
+    keys = stable_keys(fingerprint)
+    if len(keys) == 0:
+        return None
+    return ((keys[:, None] * a + b) % prime).min(axis=0)
+
+
+def _popcount(values: "np.ndarray") -> "np.ndarray":
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8)].reshape(-1, 4).sum(axis=1)
+
+
+def bit_error_rate(fp_a: "np.ndarray", fp_b: "np.ndarray") -> float:
+    """Tỉ lệ bit lệch nhỏ nhất giữa 2 fingerprint khi dò độ lệch thời gian"""
+    max_shift = int(MAX_SHIFT_SECONDS * SAMPLE_RATE / HOP_SIZE)
+    best = 1.0
+    for shift in range(-max_shift, max_shift + 1):
+        if shift >= 0:
+            a, b = fp_a[shift:], fp_b
+        else:
+            a, b = fp_a, fp_b[-shift:]
+        n = min(len(a), len(b))
+        if n < MIN_OVERLAP_FRAMES:
+            continue
+        a, b = a[:n], b[:n]
+        loud = (a != 0) & (b != 0)
+        count = int(loud.sum())
+        if count < MIN_OVERLAP_FRAMES:
+            continue
+        ber = int(_popcount(a[loud] ^ b[loud]).sum()) / (32 * count)
+        best = min(best, ber)
+    return best
+
+
+def find_fingerprint_duplicates(folder: Path, workers: int = None) -> dict:
+    """
+    Tìm các file là cùng một bài dựa trên fingerprint audio
+
+    1. Fingerprint từng file (cache theo file, process pool)
+    2. MinHash + LSH để lấy cặp ứng viên (trùng >= MIN_BAND_MATCHES band, không so sánh mọi cặp)
+    3. Xác nhận ứng viên bằng tỉ lệ bit lệch tốt nhất <= MAX_BER
+    """
+    _require_numpy()
+    files = list_audio_files(folder)
+    fingerprints = load_fingerprints(files, folder / CACHE_DIR_NAME, workers)
+
+    params = _minhash_params()
+    buckets = defaultdict(list)
+    for f, fingerprint in fingerprints.items():
+        signature = minhash_signature(fingerprint, params)
+        if signature is None:
+            continue
+        for band in range(NUM_PERM // LSH_ROWS):
+            rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+            buckets[(band, rows.tobytes())].append(f)
+
+    band_matches = Counter()
+    for members in buckets.values():
+        # Bucket quá lớn = key phổ biến (tiếng ồn, im lặng) -> không có ý nghĩa
+        if len(members) < 2 or len(members) > MAX_BUCKET:
+            continue
+        members = sorted(members)
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                band_matches[(a, b)] += 1
+    candidates = [pair for pair, count in band_matches.items() if count >= MIN_BAND_MATCHES]
+
+    # Union-find các cặp đã xác nhận
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in candidates:
+        if bit_error_rate(fingerprints[a], fingerprints[b]) <= MAX_BER:
+            parent[find(a)] = find(b)
+
+    groups = defaultdict(list)
+    for f in parent:
+        groups[find(f)].append(f)
+    return {
+        f"fingerprint: {min(g).stem}": sorted(g)
+        for g in groups.values() if len(g) > 1
+    }
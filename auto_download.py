@@ -9,11 +9,25 @@ License: MIT
 """
 
 import os
+import re
 import sys
+import shutil
+import hashlib
 import subprocess
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
+import queue
+import time
+
+from rate_limiter import RateLimiter
+from download_metrics import MetricsRecorder
+from audio_files import is_audio_file, list_audio_files
+from loudness import LoudnessCache, LOUDNESS_CACHE_NAME, analyze_files
+from download_manifest import (
+    DownloadManifest, STATE_DONE, STATE_REMOVED,
+    STATE_FETCHING, STATE_FETCHED, STATE_TRANSCODING, STATE_FAILED,
+)
 
 # Fix encoding cho Windows console
 if sys.platform == 'win32':
@@ -26,35 +40,277 @@ if sys.platform == 'win32':
 # URL playlist YouTube cần tải
 PLAYLIST_URL = "https://youtube.com/playlist?list=PL9dppUWWRkOfdciwdVkEBioMRixdqgjPz"
 
+# Batch mode: nhiều playlist, mỗi bài chỉ tải 1 lần rồi đặt vào thư mục từng playlist
+# (để trống = chỉ tải PLAYLIST_URL)
+PLAYLIST_URLS = []
+
 # Thư mục lưu file MP3 (None = thư mục "downloads" trong folder script)
 OUTPUT_FOLDER = None
 
 # Chất lượng MP3: "128", "192", "256", "320"
 MP3_QUALITY = "192"
 
-# Số luồng tải song song (tăng lên nếu mạng mạnh)
+# Giữ nguyên audio gốc (m4a/opus), không convert MP3 - nhanh hơn nhiều và không giảm chất lượng
+KEEP_NATIVE = False
+
+# Số luồng tải song song tối đa (tăng lên nếu mạng mạnh)
 MAX_WORKERS = 30
+
+# Số luồng tải tối thiểu - số luồng thực tế tự điều chỉnh trong [MIN_WORKERS, MAX_WORKERS]
+MIN_WORKERS = 4
+
+# Số luồng convert MP3 bằng FFmpeg (None = số nhân CPU)
+TRANSCODE_WORKERS = None
+
+# Số file tối đa chờ convert (tải nhanh hơn convert thì luồng tải sẽ chờ)
+TRANSCODE_QUEUE_SIZE = 16
+
+# Giới hạn tổng băng thông cho mọi luồng (bytes/s, None = không giới hạn), vd: 5 * 1024 * 1024
+MAX_BANDWIDTH = None
+BANDWIDTH_BURST = None
+
+# Giới hạn số request tới YouTube mỗi giây cho mọi luồng (None = không giới hạn)
+MAX_REQUESTS_PER_SEC = None
+REQUEST_BURST = None
+
+# File số liệu JSON lines theo từng bài/stage (None = downloads/.metrics.jsonl)
+METRICS_FILE = None
+
+# Cổng endpoint Prometheus trên localhost khi đang chạy (None = tắt), vd: 9105
+METRICS_PORT = None
+
+# Đồng bộ tăng dần: chỉ tải bài mới, đổi tên file khi playlist đổi thứ tự
+SYNC_MODE = False
+
+# Bài bị xóa khỏi playlist: "report" = chỉ liệt kê, "move" = chuyển vào downloads/_removed
+SYNC_REMOVED = "report"
+
+# Đo loudness (EBU R128) các bài mới sau khi tải xong để player khỏi phải đo (tùy chọn, cần numpy);
+# tắt thì player tự đo nền khi phát, hoặc đo cả thư viện: python loudness.py downloads
+ANALYZE_LOUDNESS = False
+
+# Số process đo loudness (None = số nhân CPU)
+LOUDNESS_WORKERS = None
 # ==================================================
 
 
+# Số thứ tự đầu tên file ("0001 - ")
+INDEX_PREFIX = re.compile(r'^\d{1,4} - ')
+
+# Ký tự không dùng được trong tên thư mục
+UNSAFE_NAME_CHARS = re.compile(r'[<>:"/\\|?*]')
+
+# Đuôi file đích có thể có (xem _output_plan) - để tìm file tạm FFmpeg còn sót sau khi bị kill
+OUTPUT_SUFFIXES = ('.mp3', '.opus', '.m4a')
+
+
+class YoutubeDLPool:
+    """Giữ YoutubeDL sống lâu theo từng worker thread để tái dùng HTTP session"""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._instances = []
+        self.sessions_created = 0
+    
+    def get(self, profile: str, ydl_opts: dict):
+        """Lấy YoutubeDL của thread hiện tại theo profile, tạo mới nếu chưa có"""
+        import yt_dlp
+        
+        instances = getattr(self._local, 'instances', None)
+        if instances is None:
+            instances = self._local.instances = {}
+        
+        ydl = instances.get(profile)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(ydl_opts)
+            instances[profile] = ydl
+            with self._lock:
+                self._instances.append(ydl)
+                self.sessions_created += 1
+        return ydl
+    
+    def close(self):
+        """Đóng toàn bộ session (gọi khi kết thúc lượt tải)"""
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+
+# Lỗi cho thấy YouTube đang throttle -> giảm số luồng toàn cục
+THROTTLE_MARKERS = ('429', 'too many requests', 'rate limit', 'rate-limit', 'timed out',
+                    'timeout', 'connection reset', 'temporarily unavailable')
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Lỗi do bị giới hạn tốc độ / nghẽn mạng (không phải lỗi của riêng video)"""
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def error_class(error: Exception) -> str:
+    """Nhóm lỗi cho số liệu (throttle gom riêng)"""
+    return "Throttled" if is_throttle_error(error) else type(error).__name__
+
+
+class AdaptiveConcurrency:
+    """
+    Giới hạn số lượt tải đồng thời, tự điều chỉnh theo AIMD
+    
+    - Slow start: nhân đôi sau mỗi "vòng" (limit lượt tải thành công) đến lần throttle đầu tiên
+    - Sau đó tăng 1 mỗi vòng nếu tổng throughput không giảm
+    - Bị throttle (429, timeout, tải quá chậm): giảm một nửa và tạm dừng mọi luồng
+    """
+    
+    def __init__(self, min_limit: int, max_limit: int, stall_speed: int = 32 * 1024,
+                 cooldown: float = 10.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = self.min_limit
+        self.peak = self.limit
+        self.stall_speed = stall_speed
+        self.cooldown = cooldown
+        self.throttle_events = 0
+        
+        self._in_flight = 0
+        self._slow_start = True
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        
+        # Thống kê của vòng hiện tại và vòng trước
+        self._window_done = 0
+        self._window_bytes = 0
+        self._window_start = time.monotonic()
+        self._last_rate = 0.0
+    
+    def acquire(self):
+        """Chờ đến khi còn slot (và hết thời gian tạm dừng do throttle)"""
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self._in_flight >= self.limit:
+                    self._cond.wait()
+                else:
+                    break
+            self._in_flight += 1
+    
+    def release(self, started: float, nbytes: int = 0, throttled: bool = False):
+        """Trả slot và cập nhật limit theo kết quả lượt tải"""
+        elapsed = max(time.monotonic() - started, 1e-6)
+        if nbytes and not throttled and nbytes / elapsed < self.stall_speed:
+            throttled = True
+        
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self._on_throttle()
+            elif nbytes:
+                self._on_success(nbytes)
+            self._cond.notify_all()
+    
+    def _on_throttle(self):
+        now = time.monotonic()
+        self.throttle_events += 1
+        self._slow_start = False
+        # Nhiều luồng cùng gặp lỗi trong 1 đợt chỉ tính là 1 lần giảm
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._paused_until = now + self.cooldown
+        self._set_limit(self.limit // 2, "throttled")
+        self._reset_window(now)
+    
+    def _on_success(self, nbytes: int):
+        self._window_done += 1
+        self._window_bytes += nbytes
+        if self._window_done < self.limit:
+            return
+        
+        now = time.monotonic()
+        rate = self._window_bytes / max(now - self._window_start, 1e-6)
+        if self._slow_start:
+            self._set_limit(self.limit * 2, "slow start", rate)
+        elif rate >= self._last_rate * 0.9:
+            self._set_limit(self.limit + 1, "increase", rate)
+        self._last_rate = rate
+        self._reset_window(now)
+    
+    def _reset_window(self, now: float):
+        self._window_done = 0
+        self._window_bytes = 0
+        self._window_start = now
+    
+    def _set_limit(self, limit: int, reason: str, rate: float = None):
+        limit = min(self.max_limit, max(self.min_limit, limit))
+        if limit == self.limit:
+            return
+        speed = f" @ {rate / 1024 / 1024:.2f} MB/s" if rate is not None else ""
+        print(f"[CONCURRENCY] {self.limit} -> {limit} ({reason}{speed})")
+        self.limit = limit
+        self.peak = max(self.peak, limit)
+
+
 class PlaylistDownloader:
     """Class quản lý việc tải playlist YouTube"""
     
     def __init__(self, playlist_url: str, output_folder: str = None, 
-                 quality: str = "192", max_workers: int = 5):
+                 quality: str = "192", max_workers: int = 5, min_workers: int = 1,
+                 transcode_workers: int = None, queue_size: int = 16,
+                 keep_native: bool = False, sync: bool = False,
+                 sync_removed: str = "report", limiter: RateLimiter = None,
+                 metrics_file: str = None, metrics_port: int = None,
+                 loudness: bool = False, loudness_workers: int = None):
         self.playlist_url = playlist_url
         self.quality = quality
+        self.keep_native = keep_native
+        self.sync = sync
+        self.sync_removed = sync_removed
         self.max_workers = max_workers
+        self.concurrency = AdaptiveConcurrency(min_workers, max_workers)
+        
+        # Token bucket dùng chung cho mọi luồng (bytes/s + requests/s)
+        self.limiter = limiter or RateLimiter()
+        self._hook_state = threading.local()
+        self.transcode_workers = transcode_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
         
         # Xác định thư mục
         self.script_dir = Path(__file__).parent.absolute()
         self.output_folder = Path(output_folder) if output_folder else self.script_dir / "downloads"
+        self.staging_folder = self.output_folder / ".staging"
+        self.removed_folder = self.output_folder / "_removed"
         self.ffmpeg_path = self.script_dir / "ffmpeg.exe"
+        self.ffmpeg_bin = str(self.ffmpeg_path)
         
         # Counters thread-safe
         self._download_count = 0
         self._lock = threading.Lock()
         self.total_videos = 0
+        
+        # Manifest video ID -> file, mở trong download()
+        self.manifest = None
+        
+        # YoutubeDL dùng lại theo từng worker thread
+        self.ydl_pool = YoutubeDLPool()
+        
+        # Pipeline: stage tải (I/O) -> hàng đợi giới hạn -> stage convert (CPU)
+        self._transcode_queue = None
+        
+        # Số liệu theo stage, tạo trong download()
+        self.metrics_file = Path(metrics_file) if metrics_file else self.output_folder / ".metrics.jsonl"
+        self.metrics_port = metrics_port
+        self.metrics = None
+        
+        # Stage đo loudness sau khi tải (cache dùng chung với player, chỉ đo file mới)
+        self.loudness = loudness
+        self.loudness_workers = loudness_workers
     
     def _check_dependencies(self) -> bool:
         """Kiểm tra và cài đặt dependencies"""
@@ -72,6 +328,7 @@ class PlaylistDownloader:
             # Thử tìm trong PATH
             try:
                 subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
+                self.ffmpeg_bin = "ffmpeg"
                 print("[OK] FFmpeg found in PATH")
                 return True
             except (subprocess.CalledProcessError, FileNotFoundError):
@@ -90,79 +347,380 @@ class PlaylistDownloader:
             return self._download_count
     
     def _download_single(self, video_info: dict, index: int) -> tuple:
-        """Tải một video thành MP3"""
-        import yt_dlp
-        import re
-        
+        """Stage tải: lấy audio gốc về thư mục staging rồi đẩy sang hàng đợi convert"""
         video_url = video_info.get('url') or video_info.get('webpage_url')
         title = video_info.get('title', 'Unknown')[:60]
         
         if not video_url:
             return False, f"No URL: {title}"
         
-        # Kiểm tra file đã tồn tại (với bất kỳ format số nào)
-        # Pattern: số + " - " + title
-        safe_title = re.sub(r'[<>:"/\\|?*]', '', title)[:50]
-        existing_files = list(self.output_folder.glob(f"*{safe_title[:30]}*.mp3"))
-        if existing_files:
+        # Kiểm tra đã tải qua manifest (O(1), không quét thư mục)
+        video_id = video_info.get('id')
+        if video_id and self.manifest.is_done(video_id):
             count = self._increment_counter()
             print(f"[{count}/{self.total_videos}] SKIP (exists): {title[:40]}")
-            return True, title
+            return "skipped", title
         
-        # Dùng format 4 chữ số để hỗ trợ playlist lớn (1-9999)
+        # Audio gốc lưu theo video ID, chưa convert
         ydl_opts = {
-            'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': self.quality,
-            }],
-            'outtmpl': str(self.output_folder / f'{index:04d} - %(title)s.%(ext)s'),
+            'format': self._audio_format(),
+            'outtmpl': str(self.staging_folder / '%(id)s.%(ext)s'),
             'ffmpeg_location': str(self.script_dir),
-            'ignoreerrors': True,
+            # Lỗi phải được raise để nhận biết throttle (429, timeout)
+            'ignoreerrors': False,
+            # Tải tiếp file .part từ byte đã có (tên file cố định theo video ID)
+            'continuedl': True,
             'nooverwrites': True,
             'quiet': True,
             'no_warnings': True,
             'retries': 3,
             'geo_bypass': True,
+            'progress_hooks': [self._progress_hook],
         }
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
+            ydl = self.ydl_pool.get('fetch', ydl_opts)
             
-            count = self._increment_counter()
-            print(f"[{count}/{self.total_videos}] {title}")
-            return True, title
+            # Chờ slot theo giới hạn đồng thời hiện tại
+            self.concurrency.acquire()
+            started = time.monotonic()
+            self._journal(video_id, STATE_FETCHING, title=title)
+            
+            # Thời gian chờ limiter không tính là mạng chậm khi điều chỉnh số luồng
+            self._hook_state.waited = self.limiter.before_request()
+            try:
+                info = ydl.extract_info(video_url, download=True)
+            except Exception as e:
+                self.concurrency.release(started + self._hook_state.waited,
+                                         throttled=is_throttle_error(e))
+                raise
+            
+            downloads = (info or {}).get('requested_downloads') or [{}]
+            source = downloads[-1].get('filepath')
+            if not source or not Path(source).exists():
+                self.concurrency.release(started + self._hook_state.waited)
+                self._journal(video_id, STATE_FAILED, error="no audio file")
+                self.metrics.failure('fetch', "NoAudioFile", video_id)
+                print(f"[ERROR] {title}: no audio file")
+                return False, title
+            source = Path(source)
+            nbytes = source.stat().st_size
+            self.concurrency.release(started + self._hook_state.waited, nbytes)
+            self.metrics.record('fetch', started, time.monotonic(), nbytes, video_id)
+            
+            # Dùng format 4 chữ số để hỗ trợ playlist lớn (1-9999)
+            target = Path(ydl.prepare_filename(
+                info, outtmpl=str(self.output_folder / f'{index:04d} - %(title)s.%(ext)s')
+            ))
+            
+            job = {
+                'video_id': info.get('id') or video_id,
+                'title': title,
+                'source': source,
+                'target': target,
+                'acodec': info.get('acodec') or '',
+                'abr': info.get('abr'),
+            }
+            self._journal(job['video_id'], STATE_FETCHED, source=source, target=target,
+                          acodec=job['acodec'], abr=job['abr'])
+            
+            # Hàng đợi đầy -> chờ stage convert (backpressure)
+            self._transcode_queue.put(job)
+            return "fetched", title
             
         except Exception as e:
+            self._journal(video_id, STATE_FAILED, error=str(e)[:200])
+            self.metrics.failure('fetch', error_class(e), video_id, str(e))
             print(f"[ERROR] {title}: {str(e)[:50]}")
             return False, str(e)
     
+    def _audio_format(self) -> str:
+        """Format yt-dlp cho stage tải"""
+        if self.keep_native:
+            # Ưu tiên opus: chất lượng tốt hơn ở cùng bitrate và pygame phát trực tiếp được
+            return 'bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio/best'
+        return 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best'
+    
+    def _output_plan(self, job: dict) -> tuple:
+        """
+        Chọn đuôi file đích và tham số FFmpeg cho một job
+        
+        Returns:
+            (suffix, ffmpeg_args) - ffmpeg_args = None nghĩa là chỉ cần đổi tên file
+        """
+        if self.keep_native:
+            acodec = job['acodec']
+            source_ext = job['source'].suffix.lower()
+            if acodec.startswith('opus'):
+                if source_ext == '.opus':
+                    return '.opus', None
+                return '.opus', ['-codec:a', 'copy', '-f', 'opus']
+            if acodec.startswith('mp4a'):
+                if source_ext == '.m4a':
+                    return '.m4a', None
+                return '.m4a', ['-codec:a', 'copy', '-f', 'ipod']
+            # Codec khác (hiếm) -> vẫn encode MP3
+        return '.mp3', ['-codec:a', 'libmp3lame', '-b:a', f'{self.quality}k', '-f', 'mp3']
+    
+    @staticmethod
+    def _transcode_temp(target: Path) -> Path:
+        """File FFmpeg ghi tạm trước khi đổi tên (atomic) thành file đích"""
+        return target.with_name(target.name + ".tmp")
+    
+    def _transcode_single(self, job: dict) -> bool:
+        """Stage convert: FFmpeg encode MP3 hoặc remux audio gốc (chế độ KEEP_NATIVE)"""
+        suffix, ffmpeg_args = self._output_plan(job)
+        source = job['source']
+        target = job['target'].with_suffix(suffix)
+        temp = self._transcode_temp(target)
+        
+        video_id = job['video_id']
+        self._journal(video_id, STATE_TRANSCODING)
+        stage = 'transcode'
+        try:
+            if ffmpeg_args is not None:
+                started = time.monotonic()
+                subprocess.run([
+                    self.ffmpeg_bin, '-y', '-nostdin', '-loglevel', 'error',
+                    '-i', str(source), '-vn', *ffmpeg_args, str(temp),
+                ], capture_output=True, check=True)
+                self.metrics.record('transcode', started, time.monotonic(),
+                                    temp.stat().st_size, video_id)
+            
+            # Stage ghi: đưa file vào chỗ (atomic rename), xóa nguồn, cập nhật manifest
+            stage = 'write'
+            started = time.monotonic()
+            if ffmpeg_args is None:
+                os.replace(source, target)
+            else:
+                os.replace(temp, target)
+                source.unlink()
+            if video_id:
+                bitrate = int(self.quality) if suffix == '.mp3' else round(job['abr'] or 0) or None
+                self.manifest.mark_done(video_id, target, title=job['title'], bitrate=bitrate)
+            self.metrics.record('write', started, time.monotonic(), target.stat().st_size, video_id)
+        except (subprocess.CalledProcessError, OSError) as e:
+            temp.unlink(missing_ok=True)
+            self._journal(video_id, STATE_FAILED, error=str(e)[:200])
+            self.metrics.failure(stage, error_class(e), video_id, str(e))
+            detail = getattr(e, 'stderr', b'') or str(e).encode()
+            print(f"[ERROR] {job['title']}: {stage} failed: {detail[-50:].decode(errors='replace')}")
+            return False
+        
+        self._journal(video_id, STATE_DONE)
+        self.metrics.track_done()
+        
+        count = self._increment_counter()
+        print(f"[{count}/{self.total_videos}] {job['title']}")
+        return True
+    
+    def _transcode_worker(self, results: list):
+        """Luồng convert: lấy job từ hàng đợi đến khi gặp None"""
+        while True:
+            job = self._transcode_queue.get()
+            if job is None:
+                break
+            try:
+                ok = self._transcode_single(job)
+            except Exception as e:
+                self.metrics.failure('transcode', error_class(e), job['video_id'], str(e))
+                print(f"[ERROR] {job['title']}: {str(e)[:50]}")
+                ok = False
+            with self._lock:
+                results.append(ok)
+    
+    def _progress_hook(self, d: dict):
+        """yt-dlp progress hook: trừ băng thông theo số byte mới tải (chặn luồng nếu vượt)"""
+        if d.get('status') not in ('downloading', 'finished'):
+            return
+        state = self._hook_state
+        downloaded = d.get('downloaded_bytes') or 0
+        if getattr(state, 'filename', None) != d.get('filename'):
+            state.filename = d.get('filename')
+            state.last_bytes = 0
+        delta = downloaded - state.last_bytes
+        state.last_bytes = downloaded
+        state.waited = getattr(state, 'waited', 0.0) + self.limiter.consume_bytes(delta)
+    
+    def _journal(self, video_id: str, state: str, **fields):
+        """Ghi trạng thái video vào journal (bỏ qua video không có ID)"""
+        if video_id:
+            self.manifest.journal_set(video_id, state, **fields)
+    
+    def _cleanup_orphans(self) -> int:
+        """Xóa file tạm không thuộc video nào đang dở dang trong journal"""
+        in_progress = {
+            e['video_id'] for e in self.manifest.journal_entries(
+                STATE_FETCHING, STATE_FETCHED, STATE_TRANSCODING)
+        }
+        removed = 0
+        
+        # Staging: giữ file (kể cả .part để tải tiếp) của video đang dở dang
+        for f in self.staging_folder.iterdir():
+            if f.is_file() and f.name.split('.', 1)[0] not in in_progress:
+                f.unlink(missing_ok=True)
+                removed += 1
+        
+        # Output: chỉ file tạm FFmpeg của video có trong journal (không đụng file của người dùng)
+        for e in self.manifest.journal_entries(
+                STATE_FETCHING, STATE_FETCHED, STATE_TRANSCODING, STATE_FAILED):
+            if not e['target']:
+                continue
+            for suffix in OUTPUT_SUFFIXES:
+                temp = self._transcode_temp(Path(e['target']).with_suffix(suffix))
+                if temp.is_file():
+                    temp.unlink()
+                    removed += 1
+        return removed
+    
+    def _resume_jobs(self) -> list:
+        """Job convert của các video đã tải xong audio gốc nhưng chưa convert"""
+        jobs = []
+        for e in self.manifest.journal_entries(STATE_FETCHED, STATE_TRANSCODING):
+            if not e['source'] or not e['target'] or not Path(e['source']).exists():
+                continue
+            jobs.append({
+                'video_id': e['video_id'],
+                'title': e['title'] or e['video_id'],
+                'source': Path(e['source']),
+                'target': Path(e['target']),
+                'acodec': e['acodec'] or '',
+                'abr': e['abr'],
+            })
+        return jobs
+    
+    @staticmethod
+    def _unique_positions(videos: list) -> list:
+        """
+        (index, video) theo thứ tự playlist; video có nhiều lần trong playlist chỉ giữ vị trí
+        đầu tiên (các lần tải cùng ID ghi chung 1 file staging / .part)
+        """
+        seen = set()
+        positions = []
+        for idx, video in enumerate(videos, 1):
+            video_id = video.get('id')
+            if video_id in seen:
+                continue
+            if video_id:
+                seen.add(video_id)
+            positions.append((idx, video))
+        return positions
+    
+    def _sync(self, videos: list) -> list:
+        """
+        Đồng bộ tăng dần với lần sync trước
+        
+        Bài đã tải mà đổi vị trí được đổi tên tại chỗ (không tải lại),
+        bài bị xóa khỏi playlist được liệt kê hoặc chuyển vào _removed.
+        
+        Returns:
+            Danh sách (video, index) cần tải mới
+        """
+        previous = self.manifest.load_positions(self.playlist_url)
+        positions = self._unique_positions(videos)
+        current_ids = {video.get('id') for idx, video in positions if video.get('id')}
+        pending = []
+        renames = []
+        
+        for idx, video in positions:
+            video_id = video.get('id')
+            entry = self.manifest.get(video_id) if video_id else None
+            
+            if video_id and self.manifest.is_done(video_id):
+                old = Path(entry['path'])
+            elif entry and entry['state'] == STATE_REMOVED and Path(entry['path']).exists():
+                # Bài được thêm lại vào playlist -> lấy lại từ _removed
+                old = Path(entry['path'])
+            else:
+                pending.append((video, idx))
+                continue
+            
+            new = self.output_folder / f"{idx:04d} - {INDEX_PREFIX.sub('', old.name)}"
+            if new != old:
+                renames.append((video_id, old, new))
+        
+        # Đổi tên 2 bước qua tên tạm để không đè file đang chờ đổi tên
+        staged = []
+        for video_id, old, new in renames:
+            temp = self.output_folder / f".sync-{video_id}{old.suffix}"
+            os.replace(old, temp)
+            self.manifest.update_path(video_id, temp, STATE_DONE)
+            staged.append((video_id, temp, new))
+        for video_id, temp, new in staged:
+            os.replace(temp, new)
+            self.manifest.update_path(video_id, new)
+        
+        # Bài có ở lần sync trước nhưng không còn trong playlist
+        removed = [
+            vid for vid in sorted(previous, key=previous.get)
+            if vid not in current_ids and self.manifest.is_done(vid)
+        ]
+        for vid in removed:
+            path = Path(self.manifest.get(vid)['path'])
+            if self.sync_removed == "move":
+                self.removed_folder.mkdir(exist_ok=True)
+                target = self.removed_folder / INDEX_PREFIX.sub('', path.name)
+                os.replace(path, target)
+                self.manifest.update_path(vid, target, STATE_REMOVED)
+                print(f"[SYNC] MOVED (removed): {path.name}")
+            else:
+                print(f"[SYNC] REMOVED from playlist: {path.name}")
+        
+        self.manifest.save_positions(self.playlist_url, [v.get('id') for idx, v in positions if v.get('id')])
+        
+        unchanged = len(positions) - len(pending) - len(renames)
+        print(f"[SYNC] {len(pending)} new | {len(renames)} moved | "
+              f"{len(removed)} removed | {unchanged} unchanged")
+        return pending
+    
+    def _analyze_loudness(self):
+        """Đo loudness các file chưa có trong cache (process pool), ghi số liệu stage 'loudness'"""
+        cache = LoudnessCache(self.script_dir / LOUDNESS_CACHE_NAME)
+        print(f"\n[LOUDNESS] Analyzing new tracks ({len(cache)} cached)...")
+        measured = failed = 0
+        try:
+            for filepath, result, seconds in analyze_files(list_audio_files(self.output_folder),
+                                                           cache, self.loudness_workers):
+                if result is None:
+                    failed += 1
+                    self.metrics.failure('loudness', "AnalysisFailed", message=filepath.name)
+                    continue
+                measured += 1
+                ended = time.monotonic()
+                self.metrics.record('loudness', ended - seconds, ended)
+        except RuntimeError as e:  # thiếu numpy
+            print(f"[LOUDNESS] Skipped: {e}")
+            return
+        print(f"[LOUDNESS] {measured} measured, {failed} failed")
+    
     def _get_playlist_videos(self) -> list:
         """Lấy danh sách video từ playlist"""
-        import yt_dlp
-        
         ydl_opts = {
             'extract_flat': True,
             'quiet': True,
             'no_warnings': True,
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(self.playlist_url, download=False)
+        ydl = self.ydl_pool.get('flat', ydl_opts)
+        self.limiter.before_request()
+        started = time.monotonic()
+        info = ydl.extract_info(self.playlist_url, download=False)
         
         if 'entries' not in info:
             return []
         
-        return [v for v in info['entries'] if v]
+        videos = [v for v in info['entries'] if v]
+        self.metrics.record('enumerate', started, time.monotonic())
+        return videos
     
     def download(self) -> bool:
         """Tải toàn bộ playlist"""
         # Header
         print("=" * 60)
         print("   YOUTUBE PLAYLIST MP3 DOWNLOADER")
-        print(f"   Threads: {self.max_workers} | Quality: {self.quality}kbps")
+        quality = "native (no transcode)" if self.keep_native else f"{self.quality}kbps"
+        print(f"   Fetch: {self.concurrency.min_limit}-{self.max_workers} | Transcode: {self.transcode_workers} | "
+              f"Quality: {quality}")
         print("=" * 60)
         
         # Kiểm tra dependencies
@@ -171,69 +729,313 @@ class PlaylistDownloader:
         
         # Tạo thư mục output
         self.output_folder.mkdir(parents=True, exist_ok=True)
+        self.staging_folder.mkdir(exist_ok=True)
         
         print(f"\n[FOLDER] {self.output_folder}")
         print(f"[URL] {self.playlist_url}")
         print("-" * 60)
         
-        # Lấy danh sách video
-        print("\n[INFO] Getting playlist info...")
-        try:
-            videos = self._get_playlist_videos()
-        except Exception as e:
-            print(f"[ERROR] Failed to get playlist: {e}")
-            return False
+        # Số liệu JSON lines (+ endpoint Prometheus nếu bật)
+        self.metrics = MetricsRecorder(self.metrics_file)
+        self.metrics.add_gauge('ytdl_concurrency_limit', lambda: self.concurrency.limit)
+        self.metrics.add_gauge('ytdl_limiter_wait_seconds', lambda: round(self.limiter.waited, 3))
+        if self.metrics_port:
+            host, port = self.metrics.serve(self.metrics_port)
+            print(f"[METRICS] http://{host}:{port}/metrics")
         
-        if not videos:
-            print("[ERROR] No videos found in playlist")
-            return False
+        # Load manifest + journal 1 lần
+        self.manifest = DownloadManifest(self.output_folder)
+        known = self.manifest.load()
+        
+        # Lượt trước bị dừng giữa chừng -> dùng lại snapshot playlist
+        videos = self.manifest.load_run(self.playlist_url)
+        if videos:
+            print("\n[RESUME] Unfinished run found, reusing playlist snapshot")
+        else:
+            print("\n[INFO] Getting playlist info...")
+            try:
+                videos = self._get_playlist_videos()
+            except Exception as e:
+                print(f"[ERROR] Failed to get playlist: {e}")
+                self.metrics.failure('enumerate', error_class(e), message=str(e))
+                self.manifest.close()
+                self.metrics.close()
+                return False
+            
+            if not videos:
+                print("[ERROR] No videos found in playlist")
+                self.manifest.close()
+                self.metrics.close()
+                return False
+            self.manifest.start_run(self.playlist_url, videos)
         
         self.total_videos = len(videos)
         print(f"[FOUND] {self.total_videos} videos")
+        
+        # Rebuild manifest từ thư mục nếu có file chưa được ghi nhận
+        rebuilt = self.manifest.rebuild(videos)
+        print(f"[MANIFEST] {known} known, {rebuilt} rebuilt from folder")
+        
+        # Dọn file tạm mồ côi, lấy lại các bài đã tải xong nhưng chưa convert
+        cleaned = self._cleanup_orphans()
+        resumed = self._resume_jobs()
+        if cleaned or resumed:
+            print(f"[RESUME] {len(resumed)} fetched tracks go straight to transcode, "
+                  f"{cleaned} orphaned temp files removed")
+        
+        # Sync: chỉ tải bài mới, bài đã có coi như thành công
+        if self.sync:
+            work = self._sync(videos)
+        else:
+            work = [(video, idx) for idx, video in self._unique_positions(videos)]
+        resumed_ids = {job['video_id'] for job in resumed}
+        work = [(video, idx) for video, idx in work if video.get('id') not in resumed_ids]
+        self.manifest.journal_queue([video.get('id') for video, _ in work if video.get('id')])
+        self._download_count = len(videos) - len(work) - len(resumed)
         print("-" * 60)
-        print(f"\n[START] Downloading with {self.max_workers} threads...\n")
+        print(f"\n[START] Downloading with {self.concurrency.limit}-{self.max_workers} threads, "
+              f"transcoding with {self.transcode_workers}...\n")
+        
+        # Stage convert chạy song song với stage tải
+        self._transcode_queue = queue.Queue(maxsize=self.queue_size)
+        transcode_results = []
+        transcoders = [
+            threading.Thread(target=self._transcode_worker, args=(transcode_results,),
+                             name=f"transcode-{i}", daemon=True)
+            for i in range(self.transcode_workers)
+        ]
+        for t in transcoders:
+            t.start()
+        for job in resumed:
+            self._transcode_queue.put(job)
         
         # Tải song song
-        success = 0
+        success = len(videos) - len(work) - len(resumed)
         failed = 0
         
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             futures = {
                 executor.submit(self._download_single, video, idx): idx 
-                for idx, video in enumerate(videos, 1)
+                for video, idx in work
             }
             
             for future in as_completed(futures):
                 try:
-                    ok, _ = future.result()
-                    if ok:
+                    status, _ = future.result()
+                    if status == "skipped":
                         success += 1
-                    else:
+                    elif not status:
                         failed += 1
                 except Exception:
                     failed += 1
         
+        # Báo hết việc cho stage convert và chờ xong
+        for _ in transcoders:
+            self._transcode_queue.put(None)
+        for t in transcoders:
+            t.join()
+        success += sum(1 for ok in transcode_results if ok)
+        failed += sum(1 for ok in transcode_results if not ok)
+        
+        if self.loudness:
+            self._analyze_loudness()
+        
+        # Chạy hết lượt -> lần sau lấy lại playlist mới
+        self.manifest.finish_run(self.playlist_url)
+        self.manifest.close()
+        self.ydl_pool.close()
+        
         # Kết quả
         print("\n" + "=" * 60)
         print(f"[DONE] Completed!")
         print(f"       Success: {success}/{self.total_videos}")
         if failed > 0:
             print(f"       Failed: {failed}")
+        print(f"       Sessions: {self.ydl_pool.sessions_created}")
+        print(f"       Concurrency: final {self.concurrency.limit} | peak {self.concurrency.peak} | "
+              f"throttled {self.concurrency.throttle_events}x")
+        print(f"       {self.limiter.summary()}")
+        for stats in self.metrics.stages.values():
+            print(f"       {stats.summary()}")
+        print(f"[METRICS] {self.metrics_file}")
+        self.metrics.close()
         print(f"[FOLDER] {self.output_folder}")
         print("=" * 60)
         
         return True
 
 
+class BatchDownloader(PlaylistDownloader):
+    """
+    Tải nhiều playlist cùng lúc, gộp theo video ID
+    
+    Mỗi video chỉ tải + convert 1 lần vào thư mục chung `_library`,
+    sau đó được link (hardlink, không được thì copy) vào thư mục `<tên> [<ID playlist>]`
+    của từng playlist theo đúng thứ tự trong playlist đó.
+    """
+    
+    def __init__(self, playlist_urls: list, output_folder: str = None,
+                 enumerate_workers: int = 8, **kwargs):
+        script_dir = Path(__file__).parent.absolute()
+        self.batch_root = Path(output_folder) if output_folder else script_dir / "downloads"
+        
+        # Key cố định cho tập playlist (dùng cho snapshot / resume)
+        digest = hashlib.sha1("\n".join(sorted(playlist_urls)).encode('utf-8')).hexdigest()[:12]
+        super().__init__(playlist_url=f"batch:{digest}",
+                         output_folder=str(self.batch_root / "_library"), **kwargs)
+        
+        self.playlist_urls = list(playlist_urls)
+        self.enumerate_workers = enumerate_workers
+        self.playlists = []
+    
+    def _enumerate_playlist(self, url: str) -> dict:
+        """Lấy danh sách (flat) và tên của một playlist"""
+        ydl_opts = {
+            'extract_flat': True,
+            'quiet': True,
+            'no_warnings': True,
+        }
+        ydl = self.ydl_pool.get('flat', ydl_opts)
+        self.limiter.before_request()
+        started = time.monotonic()
+        info = ydl.extract_info(url, download=False) or {}
+        self.metrics.record('enumerate', started, time.monotonic())
+        return {
+            'url': url,
+            'id': info.get('id') or hashlib.md5(url.encode('utf-8')).hexdigest()[:12],
+            'title': info.get('title') or info.get('id') or url,
+            'entries': [v for v in info.get('entries') or [] if v],
+        }
+    
+    def _enumerate_all(self):
+        """Lấy danh sách mọi playlist song song"""
+        workers = max(1, min(self.enumerate_workers, len(self.playlist_urls)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._enumerate_playlist, url) for url in self.playlist_urls]
+            results = []
+            for url, future in zip(self.playlist_urls, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    self.metrics.failure('enumerate', error_class(e), message=str(e))
+                    print(f"[ERROR] Failed to get playlist {url}: {str(e)[:50]}")
+        self.playlists = results
+    
+    def _get_playlist_videos(self) -> list:
+        """Gộp mọi playlist thành 1 danh sách video không trùng ID (giữ thứ tự gặp đầu tiên)"""
+        self._enumerate_all()
+        
+        unique = {}
+        total = 0
+        for playlist in self.playlists:
+            for video in playlist['entries']:
+                total += 1
+                key = video.get('id') or video.get('url')
+                unique.setdefault(key, video)
+        
+        print(f"[BATCH] {len(self.playlists)} playlists | {total} entries | "
+              f"{len(unique)} unique videos")
+        return list(unique.values())
+    
+    def _place_playlist(self, playlist: dict, manifest: DownloadManifest,
+                        library_names: set) -> tuple:
+        """
+        Link bài từ _library vào thư mục playlist theo thứ tự playlist
+        
+        Returns:
+            (số file link mới, số file thứ tự cũ đã gỡ)
+        """
+        # Kèm ID: 2 playlist cùng tên không dùng chung 1 thư mục (và gỡ link của nhau)
+        title = UNSAFE_NAME_CHARS.sub('', playlist['title']).strip() or "playlist"
+        folder = self.batch_root / UNSAFE_NAME_CHARS.sub('', f"{title} [{playlist['id']}]")
+        folder.mkdir(parents=True, exist_ok=True)
+        
+        desired = {}
+        for pos, video in enumerate(playlist['entries'], 1):
+            video_id = video.get('id')
+            if not video_id or not manifest.is_done(video_id):
+                continue
+            source = Path(manifest.get(video_id)['path'])
+            desired[f"{pos:04d} - {INDEX_PREFIX.sub('', source.name)}"] = source
+        
+        # File cũ do batch đặt vào nhưng sai vị trí (playlist đổi thứ tự / bị xóa)
+        removed = 0
+        existing = set()
+        for f in folder.iterdir():
+            if not f.is_file() or not is_audio_file(f.name):
+                continue
+            if f.name in desired:
+                existing.add(f.name)
+            elif INDEX_PREFIX.sub('', f.name) in library_names:
+                f.unlink()
+                removed += 1
+        
+        linked = 0
+        for target_name, source in desired.items():
+            if target_name in existing:
+                continue
+            target = folder / target_name
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+            linked += 1
+        return linked, removed
+    
+    def download(self) -> bool:
+        """Tải toàn bộ các playlist (mỗi video 1 lần) rồi đặt vào thư mục từng playlist"""
+        if not super().download():
+            return False
+        
+        # Resume dùng snapshot nên chưa có thông tin từng playlist -> lấy lại (flat, nhanh)
+        if not self.playlists:
+            self._enumerate_all()
+        
+        manifest = DownloadManifest(self.output_folder)
+        manifest.load()
+        library_names = {
+            INDEX_PREFIX.sub('', f.name) for f in self.output_folder.iterdir()
+            if f.is_file() and is_audio_file(f.name)
+        }
+        
+        total = sum(len(p['entries']) for p in self.playlists)
+        unique = len({v.get('id') or v.get('url') for p in self.playlists for v in p['entries']})
+        print(f"\n[BATCH] Placing tracks into {len(self.playlists)} playlist folders...")
+        for playlist in self.playlists:
+            linked, removed = self._place_playlist(playlist, manifest, library_names)
+            print(f"        {playlist['title'][:40]}: {len(playlist['entries'])} tracks, "
+                  f"+{linked} linked, -{removed} stale")
+        manifest.close()
+        self.ydl_pool.close()
+        
+        print(f"[BATCH] Dedup saved {total - unique} fetches ({total} entries, {unique} unique)")
+        print(f"[FOLDER] {self.batch_root}")
+        return True
+
+
 def main():
     """Entry point"""
-    downloader = PlaylistDownloader(
-        playlist_url=PLAYLIST_URL,
-        output_folder=OUTPUT_FOLDER,
+    options = dict(
         quality=MP3_QUALITY,
-        max_workers=MAX_WORKERS
+        max_workers=MAX_WORKERS,
+        min_workers=MIN_WORKERS,
+        transcode_workers=TRANSCODE_WORKERS,
+        queue_size=TRANSCODE_QUEUE_SIZE,
+        keep_native=KEEP_NATIVE,
+        sync=SYNC_MODE,
+        sync_removed=SYNC_REMOVED,
+        limiter=RateLimiter(MAX_BANDWIDTH, BANDWIDTH_BURST, MAX_REQUESTS_PER_SEC, REQUEST_BURST),
+        metrics_file=METRICS_FILE,
+        metrics_port=METRICS_PORT,
+        loudness=ANALYZE_LOUDNESS,
+        loudness_workers=LOUDNESS_WORKERS
     )
     
+    if PLAYLIST_URLS:
+        downloader = BatchDownloader(PLAYLIST_URLS, output_folder=OUTPUT_FOLDER, **options)
+    else:
+        downloader = PlaylistDownloader(playlist_url=PLAYLIST_URL, output_folder=OUTPUT_FOLDER,
+                                        **options)
     downloader.download()
     input("\nPress Enter to exit...")
 
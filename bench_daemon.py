@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark khởi động Music Player: giao diện Qt (music_player.py) vs daemon (player_daemon.py)
+Đo thời gian từ lúc chạy process tới khi sẵn sàng (quét thư mục xong / HTTP đã nghe)
+và bộ nhớ (RSS) của process, trên thư viện MP3 giả (không cần file nhạc thật).
+Lần chạy đầu là cold (chưa có library index), các lần sau là warm.
+
+RSS đọc từ /proc (Linux); hệ khác chỉ đo thời gian.
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import sys
+import io
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+# Fix encoding cho Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+
+# ==================== CẤU HÌNH ====================
+# Số bài trong thư viện giả
+TRACK_COUNTS = [2000, 20000]
+
+# Số lần chạy mỗi chế độ (lần đầu cold, còn lại warm)
+RUNS = 4
+
+# Mỗi bài: FRAMES frame MP3 im lặng (MPEG-1 Layer III 128 kbps 44.1 kHz, 417 byte/frame)
+FRAMES = 40
+FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+
+# Chờ tối đa (giây) 1 process sẵn sàng
+READY_TIMEOUT = 300
+
+# Dòng process con in ra khi sẵn sàng
+READY_MARKERS = {"gui": "[READY]", "daemon": "[DAEMON]"}
+
+
+def make_library(folder: Path, count: int):
+    """Thư mục downloads/ gồm `count` bài giống hệt nhau (hard link, không được thì copy)"""
+    music = folder / "downloads"
+    music.mkdir(parents=True)
+    source = folder / "source.mp3"
+    source.write_bytes(FRAME * FRAMES)
+    for i in range(count):
+        target = music / f"{i:05d} - Track {i}.mp3"
+        try:
+            os.link(source, target)
+        except OSError:
+            target.write_bytes(source.read_bytes())
+            os.utime(target, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns))
+
+    # Loudness đã đo sẵn (mọi bài cùng size + mtime) -> không chạy process pool đo loudness
+    from loudness import LoudnessCache, LOUDNESS_CACHE_NAME
+    cache = LoudnessCache(folder / LOUDNESS_CACHE_NAME)
+    cache.put(source, {'lufs': -18.0, 'peak': 0.5})
+    cache.save()
+
+
+def reset_state(folder: Path):
+    """Xóa library index / trạng thái -> lần chạy sau là cold"""
+    from library_index import LIBRARY_INDEX_NAME
+    for name in (LIBRARY_INDEX_NAME, "player_cache.json"):
+        try:
+            (folder / name).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> tuple:
+    """(RSS hiện tại, RSS cao nhất) MB của process, (None, None) nếu không có /proc"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None, None
+    return tuple(int(fields[key].split()[0]) / 1024 for key in ("VmRSS", "VmHWM"))
+
+
+def run_child(mode: str, folder: Path) -> dict:
+    """Chạy 1 process (gui / daemon) tới khi sẵn sàng, đo thời gian + RSS rồi dừng"""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # Chỉ đo khởi động: không cần thiết bị âm thanh thật (máy chủ/CI không có)
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env["PYTHONUNBUFFERED"] = "1"
+
+    started = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, str(folder),
+         "--port", str(free_port())],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        encoding="utf-8", errors="replace", env=env,
+    )
+    try:
+        for line in child.stdout:
+            if line.startswith(READY_MARKERS[mode]):
+                break
+            if time.perf_counter() - started > READY_TIMEOUT:
+                raise TimeoutError(mode)
+        else:
+            raise RuntimeError(f"{mode} exited with code {child.wait()}")
+        ready = time.perf_counter() - started
+        rss, peak = rss_mb(child.pid)
+    finally:
+        # kill: SDL (pygame) chặn SIGTERM của app Qt
+        child.kill()
+        child.wait()
+    return {'ready': ready, 'rss': rss, 'peak': peak}
+
+
+def child_gui(folder: Path):
+    """Process con: cửa sổ Qt, sẵn sàng khi quét thư mục xong"""
+    from PyQt6.QtWidgets import QApplication
+    import music_player
+
+    app = QApplication(sys.argv)
+    player = music_player.MusicPlayer(script_dir=folder)
+    player.show()
+    while player.scanner is not None and not player.scanner.isFinished():
+        app.processEvents()
+        time.sleep(0.001)
+    app.processEvents()
+    print(f"{READY_MARKERS['gui']} {len(player.playlist)}", flush=True)
+    app.exec()
+
+
+def child_daemon(folder: Path, port: int):
+    """Process con: daemon, sẵn sàng khi endpoint HTTP đã nghe (dòng "[DAEMON] http://...")"""
+    from player_daemon import PlayerDaemon
+
+    PlayerDaemon(folder).run(port)
+
+
+def fmt_mb(value) -> str:
+    return "n/a" if value is None else f"{value:.0f}"
+
+
+def bench(count: int, runs: int):
+    with tempfile.TemporaryDirectory(prefix="bench_daemon_") as temp:
+        folder = Path(temp)
+        make_library(folder, count)
+        print(f"\n{count} bài")
+        print(f"{'':8} {'cold (s)':>9} {'warm (s)':>9} {'RSS (MB)':>9} {'peak (MB)':>10}")
+        for mode in ("gui", "daemon"):
+            reset_state(folder)
+            results = [run_child(mode, folder) for _ in range(runs)]
+            warm = results[1:] or results
+            print(f"{mode:8} {results[0]['ready']:9.2f} "
+                  f"{statistics.median(r['ready'] for r in warm):9.2f} "
+                  f"{fmt_mb(warm[-1]['rss']):>9} {fmt_mb(warm[-1]['peak']):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark khởi động: music_player.py vs player_daemon.py")
+    parser.add_argument("--tracks", type=int, nargs="+", default=TRACK_COUNTS)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DIR"), help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, folder = args.child
+        if mode == "gui":
+            child_gui(Path(folder))
+        else:
+            child_daemon(Path(folder), args.port)
+        return
+
+    for count in args.tracks:
+        bench(count, max(args.runs, 1))
+
+
+if __name__ == "__main__":
+    main()
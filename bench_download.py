@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark PlaylistDownloader offline
+Chạy toàn bộ pipeline của auto_download.py với playlist giả và HTTP server cục bộ
+(không cần mạng): đo tracks/s, CPU time, peak RSS và thời gian FFmpeg
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import sys
+import io
+import json
+import math
+import wave
+import time
+import random
+import struct
+import tempfile
+import argparse
+import threading
+import subprocess
+import contextlib
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from auto_download import PlaylistDownloader
+
+# Fix encoding cho Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+
+# ==================== CẤU HÌNH ====================
+# Số bài trong playlist giả
+PLAYLIST_SIZES = [100, 1000, 10000]
+
+# Số luồng tải cần so sánh
+WORKER_COUNTS = [4, 8, 16, 30]
+
+# Độ dài mỗi bài (giây) - WAV mono 22.05kHz 16-bit, ~43KB/giây
+TRACK_SECONDS = 5
+
+# Độ trễ trước khi trả response (ms)
+LATENCY_MS = 50
+
+# Băng thông mỗi kết nối (bytes/s, None = không giới hạn)
+BANDWIDTH = 2 * 1024 * 1024
+
+# Tỉ lệ request bị trả lỗi 429 (0.0 - 1.0)
+ERROR_RATE = 0.0
+
+# Chất lượng MP3 khi convert
+QUALITY = "128"
+# ==================================================
+
+
+def make_wav(seconds: float, sample_rate: int = 22050) -> bytes:
+    """Tạo file WAV sine 440Hz (không cần FFmpeg)"""
+    frames = int(seconds * sample_rate)
+    samples = b''.join(
+        struct.pack('<h', int(12000 * math.sin(2 * math.pi * 440 * i / sample_rate)))
+        for i in range(sample_rate)
+    )
+    # Lặp 1 giây mẫu cho đủ độ dài
+    data = (samples * (frames // sample_rate + 1))[:frames * 2]
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(data)
+    return buffer.getvalue()
+
+
+class FakeMediaServer:
+    """HTTP server cục bộ phục vụ /track/<id>.wav với độ trễ, băng thông và lỗi giả lập"""
+
+    def __init__(self, payload: bytes, latency: float = 0.0, bandwidth: int = None,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.payload = payload
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def start(self) -> str:
+        """Chạy server trong luồng nền, trả về base URL"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, with_body: bool):
+                if not self.path.startswith("/track/"):
+                    self.send_error(404)
+                    return
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if fake._should_fail():
+                    self.send_error(429, "Too Many Requests")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/wav")
+                self.send_header("Content-Length", str(len(fake.payload)))
+                self.end_headers()
+                if not with_body:
+                    return
+                chunk = 64 * 1024
+                for offset in range(0, len(fake.payload), chunk):
+                    self.wfile.write(fake.payload[offset:offset + chunk])
+                    if fake.bandwidth:
+                        time.sleep(chunk / fake.bandwidth)
+
+            def do_GET(self):
+                self._respond(True)
+
+            def do_HEAD(self):
+                self._respond(False)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class FakePlaylistDownloader(PlaylistDownloader):
+    """PlaylistDownloader lấy playlist giả thay vì hỏi YouTube"""
+
+    def __init__(self, base_url: str, tracks: int, **kwargs):
+        super().__init__(playlist_url=f"{base_url}/playlist", **kwargs)
+        self.base_url = base_url
+        self.tracks = tracks
+
+    def _get_playlist_videos(self) -> list:
+        started = time.monotonic()
+        videos = [
+            {
+                'id': f"bench{i:05d}",
+                'title': f"Bench Track {i:05d}",
+                'url': f"{self.base_url}/track/bench{i:05d}.wav",
+            }
+            for i in range(1, self.tracks + 1)
+        ]
+        self.metrics.record('enumerate', started, time.monotonic())
+        return videos
+
+
+def _usage() -> dict:
+    """CPU time (process + process con như FFmpeg) và peak RSS (MB)"""
+    if resource is None:
+        times = os.times()
+        return {'cpu_self_s': times.user + times.system,
+                'cpu_children_s': times.children_user + times.children_system,
+                'peak_rss_mb': None, 'peak_rss_children_mb': None}
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Linux báo ru_maxrss theo KB, macOS theo byte
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'cpu_self_s': own.ru_utime + own.ru_stime,
+        'cpu_children_s': children.ru_utime + children.ru_stime,
+        'peak_rss_mb': round(own.ru_maxrss / scale, 1),
+        'peak_rss_children_mb': round(children.ru_maxrss / scale, 1),
+    }
+
+
+def run_once(tracks: int, workers: int, transcode_workers: int = None,
+             adaptive: bool = False, keep_native: bool = False) -> dict:
+    """Chạy 1 cấu hình trong process hiện tại, trả về kết quả"""
+    server = FakeMediaServer(make_wav(TRACK_SECONDS), LATENCY_MS / 1000, BANDWIDTH, ERROR_RATE)
+    base_url = server.start()
+
+    with tempfile.TemporaryDirectory(prefix="bench_download_") as output:
+        downloader = FakePlaylistDownloader(
+            base_url, tracks,
+            output_folder=output,
+            quality=QUALITY,
+            max_workers=workers,
+            min_workers=1 if adaptive else workers,
+            transcode_workers=transcode_workers,
+            keep_native=keep_native,
+        )
+        before = _usage()
+        started = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloader.download()
+        wall = time.monotonic() - started
+        after = _usage()
+    server.stop()
+
+    stages = {name: stats.to_dict() for name, stats in downloader.metrics.stages.items()}
+    done = downloader.metrics.tracks_done
+    return {
+        'tracks': tracks,
+        'workers': workers,
+        'transcode_workers': downloader.transcode_workers,
+        'adaptive': adaptive,
+        'done': done,
+        'wall_s': round(wall, 2),
+        'tracks_per_s': round(done / wall, 2) if wall else 0.0,
+        'cpu_self_s': round(after['cpu_self_s'] - before['cpu_self_s'], 2),
+        'cpu_children_s': round(after['cpu_children_s'] - before['cpu_children_s'], 2),
+        'peak_rss_mb': after['peak_rss_mb'],
+        'peak_rss_children_mb': after['peak_rss_children_mb'],
+        'ffmpeg_s': stages['transcode']['busy_s'],
+        'fetch_p95_s': stages['fetch']['p95_s'],
+        'requests': server.requests,
+        'injected_errors': server.errors,
+    }
+
+
+def sweep(sizes: list, workers: list, **options) -> list:
+    """Mỗi cấu hình chạy trong process riêng để CPU time / peak RSS không lẫn nhau"""
+    results = []
+    print(f"{'tracks':>7} {'workers':>7} {'tracks/s':>9} {'wall s':>8} {'cpu s':>7} "
+          f"{'ffmpeg s':>9} {'child cpu':>9} {'rss MB':>7}")
+    for size in sizes:
+        for count in workers:
+            cmd = [sys.executable, str(Path(__file__).absolute()), "--run",
+                   "--tracks", str(size), "--workers", str(count)]
+            if options.get('transcode_workers'):
+                cmd += ["--transcode-workers", str(options['transcode_workers'])]
+            if options.get('adaptive'):
+                cmd.append("--adaptive")
+            if options.get('keep_native'):
+                cmd.append("--native")
+            output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{result['tracks']:>7} {result['workers']:>7} {result['tracks_per_s']:>9} "
+                  f"{result['wall_s']:>8} {result['cpu_self_s']:>7} {result['ffmpeg_s']:>9} "
+                  f"{result['cpu_children_s']:>9} {result['peak_rss_mb'] or '-':>7}")
+    return results
+
+
+def main():
+    """Entry point"""
+    parser = argparse.ArgumentParser(description="Offline benchmark cho PlaylistDownloader")
+    parser.add_argument("--run", action="store_true", help="chạy 1 cấu hình, in kết quả JSON")
+    parser.add_argument("--tracks", type=int, nargs="+", default=PLAYLIST_SIZES)
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKER_COUNTS)
+    parser.add_argument("--transcode-workers", type=int, default=None)
+    parser.add_argument("--adaptive", action="store_true", help="để số luồng tự điều chỉnh")
+    parser.add_argument("--native", action="store_true", help="chế độ KEEP_NATIVE")
+    parser.add_argument("--json", type=Path, default=None, help="lưu kết quả sweep ra file")
+    args = parser.parse_args()
+
+    if args.run:
+        result = run_once(args.tracks[0], args.workers[0], args.transcode_workers,
+                          args.adaptive, args.native)
+        print(json.dumps(result))
+        return
+
+    print("=" * 60)
+    print("   PLAYLIST DOWNLOADER BENCHMARK (offline)")
+    print(f"   Latency: {LATENCY_MS}ms | Bandwidth: {BANDWIDTH or 'unlimited'} B/s | "
+          f"Errors: {ERROR_RATE:.0%}")
+    print("=" * 60)
+    results = sweep(args.tracks, args.workers, transcode_workers=args.transcode_workers,
+                    adaptive=args.adaptive, keep_native=args.native)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"\n[SAVED] {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark danh sách bài của Music Player
+So sánh QListWidget (1 item mỗi bài) với PlaylistModel + PlaylistView trên playlist giả:
+thời gian load, bộ nhớ và thời gian chọn bài (không cần file nhạc thật).
+--search: thời gian mỗi lần gõ phím trong ô tìm kiếm (tra chỉ mục + lọc model, và cả vẽ lại)
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import sys
+import io
+import gc
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+# Chạy không cần màn hình
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QListWidget, QListWidgetItem
+from PyQt6.QtGui import QFont
+
+from playlist_model import PlaylistModel, PlaylistView, display_name
+from search_index import SearchIndex, track_text
+
+# Fix encoding cho Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+
+# ==================== CẤU HÌNH ====================
+# Số bài trong playlist giả
+TRACK_COUNTS = [1800, 20000, 50000]
+
+# Số lần chọn bài ngẫu nhiên khi đo thời gian lookup
+LOOKUPS = 1000
+
+# Các câu tìm kiếm, đo từng ký tự như người gõ (không dấu, khớp tiêu đề có dấu)
+SEARCH_QUERIES = ["tinh yeu", "son tung mtp", "đen vâu", "mua roi acoustic", "official"]
+# ==================================================
+
+# Từ dùng cho tiêu đề giả khi đo tìm kiếm
+_TITLE_WORDS = (
+    "tình yêu người ơi mưa rơi hạ trắng em về đâu anh nhớ nhiều lắm chúng ta của hiện tại "
+    "nơi này có đừng làm trái tim đau bạc phận sóng gió hồng nhan chạy ngay đi lạc trôi "
+    "cô đơn dành cho ai official music video lyrics remix live acoustic cover karaoke"
+).split()
+_ARTISTS = ["Sơn Tùng M-TP", "Đen Vâu", "Mỹ Tâm", "Hà Anh Tuấn", "Bích Phương", "Jack",
+            "Hoàng Thùy Linh", "Noo Phước Thịnh", "Erik", "Chi Pu"]
+
+
+def make_paths(count: int) -> list:
+    """Đường dẫn giả giống thư mục downloads"""
+    return [
+        os.path.join("downloads", f"{i:05d} - Artist {i % 997} - Synthetic Track Title {i}.mp3")
+        for i in range(1, count + 1)
+    ]
+
+
+def make_search_paths(count: int) -> list:
+    """Đường dẫn giả có tiêu đề tiếng Việt (cố định theo seed), sắp xếp như playlist"""
+    rng = random.Random(count)
+    return sorted(
+        os.path.join("downloads", f"{i:05d} - {rng.choice(_ARTISTS)} - "
+                                  f"{' '.join(rng.choices(_TITLE_WORDS, k=rng.randint(3, 7)))}.mp3")
+        for i in range(1, count + 1)
+    )
+
+
+def _rss_mb() -> float:
+    """RSS hiện tại (MB), None nếu không đọc được"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _load_widget(app: QApplication, paths: list):
+    view = QListWidget()
+    view.resize(800, 600)
+    for path in paths:
+        view.addItem(QListWidgetItem(f"🎵 {display_name(path)}"))
+    view.show()
+    app.processEvents()
+
+    def select(row):
+        view.setCurrentRow(row)
+        view.scrollToItem(view.item(row))
+    return view, select
+
+
+def _load_model(app: QApplication, paths: list):
+    view = PlaylistView()
+    view.resize(800, 600)
+    model = PlaylistModel(view)
+    view.setModel(model)
+    model.set_tracks(paths)
+    view.show()
+    app.processEvents()
+
+    def select(row):
+        index = model.index(row)
+        view.setCurrentIndex(index)
+        view.scrollTo(index)
+    return view, select
+
+
+LOADERS = {'widget': _load_widget, 'model': _load_model}
+
+
+def _close(app: QApplication, view):
+    view.close()
+    view.deleteLater()
+    app.processEvents()
+
+
+def run_once(app: QApplication, kind: str, count: int) -> dict:
+    """Load playlist `count` bài bằng cách `kind`, đo thời gian/bộ nhớ"""
+    paths = make_paths(count)
+    gc.collect()
+    rss_before = _rss_mb()
+
+    started = time.perf_counter()
+    view, select = LOADERS[kind](app, paths)
+    load_s = time.perf_counter() - started
+    rss_after = _rss_mb()
+
+    rows = [(i * 7919) % count for i in range(LOOKUPS)]
+    started = time.perf_counter()
+    for row in rows:
+        select(row)
+    app.processEvents()
+    select_us = (time.perf_counter() - started) / LOOKUPS * 1e6
+    _close(app, view)
+
+    # Đo bộ nhớ Python riêng (tracemalloc làm chậm nên không đo chung với thời gian)
+    tracemalloc.start()
+    view, _ = LOADERS[kind](app, paths)
+    python_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    _close(app, view)
+
+    return {
+        'kind': kind,
+        'tracks': count,
+        'load_s': round(load_s, 3),
+        'python_mb': round(python_mb, 1),
+        'rss_delta_mb': round(rss_after - rss_before, 1) if rss_before is not None else None,
+        'select_us': round(select_us, 1),
+    }
+
+
+def run_search(app: QApplication, count: int) -> dict:
+    """Dựng chỉ mục tìm kiếm cho `count` bài, đo thời gian mỗi lần gõ phím"""
+    paths = make_search_paths(count)
+    view = PlaylistView()
+    view.setFont(QFont("Segoe UI", 11))  # giống music_player
+    view.resize(800, 600)
+    model = PlaylistModel(view)
+    view.setModel(model)
+    model.set_tracks(paths)
+    view.show()
+    app.processEvents()
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    for first in range(0, count, 200):
+        index.add_many((path, track_text(path)) for path in paths[first:first + 200])
+    build_s = time.perf_counter() - started
+
+    timings, lookups, filters = [], [], []
+    for query in SEARCH_QUERIES:
+        for end in range(1, len(query) + 1):
+            started = time.perf_counter()
+            hits = index.search(query[:end])
+            lookups.append((time.perf_counter() - started) * 1000)
+            model.set_filter(hits)
+            if model.rowCount():
+                view.scrollTo(model.index(0))
+            filters.append((time.perf_counter() - started) * 1000)
+            app.processEvents()
+            timings.append((time.perf_counter() - started) * 1000)
+        model.set_filter(None)
+        app.processEvents()
+    _close(app, view)
+
+    timings.sort()
+    lookups.sort()
+    filters.sort()
+    return {
+        'kind': 'search',
+        'tracks': count,
+        'build_s': round(build_s, 2),
+        'keystrokes': len(timings),
+        'lookup_ms': round(lookups[len(lookups) // 2], 2),
+        'lookup_max_ms': round(lookups[-1], 2),
+        'filter_ms': round(filters[len(filters) // 2], 2),
+        'filter_max_ms': round(filters[-1], 2),
+        'median_ms': round(timings[len(timings) // 2], 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95)], 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def main():
+    """Entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark danh sách bài của Music Player")
+    parser.add_argument("--tracks", type=int, nargs="+", default=TRACK_COUNTS)
+    parser.add_argument("--kind", choices=sorted(LOADERS), nargs="+", default=['widget', 'model'])
+    parser.add_argument("--search", action="store_true", help="đo ô tìm kiếm thay vì load danh sách")
+    parser.add_argument("--json", action="store_true", help="in kết quả dạng JSON")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = []
+    if args.search:
+        if not args.json:
+            print(f"{'tracks':>7} {'build s':>8} {'keys':>5} {'lookup ms':>10} {'lookup max':>11} "
+                  f"{'filter ms':>10} {'filter max':>11} {'median ms':>10} {'p95 ms':>7} {'max ms':>7}")
+        for count in args.tracks:
+            result = run_search(app, count)
+            results.append(result)
+            if not args.json:
+                print(f"{result['tracks']:>7} {result['build_s']:>8} {result['keystrokes']:>5} "
+                      f"{result['lookup_ms']:>10} {result['lookup_max_ms']:>11} "
+                      f"{result['filter_ms']:>10} {result['filter_max_ms']:>11} "
+                      f"{result['median_ms']:>10} {result['p95_ms']:>7} {result['max_ms']:>7}")
+        if args.json:
+            print(json.dumps(results, indent=2))
+        return
+
+    if not args.json:
+        print(f"{'kind':>7} {'tracks':>7} {'load s':>8} {'py MB':>7} {'rss MB':>7} {'select us':>10}")
+    for count in args.tracks:
+        for kind in args.kind:
+            result = run_once(app, kind, count)
+            results.append(result)
+            if not args.json:
+                print(f"{result['kind']:>7} {result['tracks']:>7} {result['load_s']:>8} "
+                      f"{result['python_mb']:>7} {result['rss_delta_mb'] or '-':>7} "
+                      f"{result['select_us']:>10}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
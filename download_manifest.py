@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Download Manifest
+Lưu trạng thái tải theo YouTube video ID (SQLite) để kiểm tra bài đã tải trong O(1)
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from audio_files import is_audio_file
+
+
+# Tên file manifest nằm trong thư mục downloads
+MANIFEST_NAME = ".manifest.sqlite3"
+
+STATE_DONE = "done"
+STATE_REMOVED = "removed"
+
+# Trạng thái journal của một video trong pipeline
+STATE_QUEUED = "queued"
+STATE_FETCHING = "fetching"
+STATE_FETCHED = "fetched"
+STATE_TRANSCODING = "transcoding"
+STATE_FAILED = "failed"
+
+# Cột journal được phép ghi kèm trạng thái
+JOURNAL_FIELDS = ('title', 'source', 'target', 'acodec', 'abr', 'error')
+
+
+def normalize_title(title: str) -> str:
+    """Chuẩn hóa title/tên file để so khớp khi rebuild manifest"""
+    # Bỏ số thứ tự đầu file (0001 - , 002 - , ...)
+    name = re.sub(r'^\d{1,4}\s*[-_\.]\s*', '', title)
+    name = name.lower()
+    # Bỏ ký tự đặc biệt (kể cả ký tự yt-dlp thay thế trong tên file)
+    name = re.sub(r'[^\w\s]', '', name)
+    return ' '.join(name.split())
+
+
+class DownloadManifest:
+    """Manifest video ID -> file (path, size, bitrate, state), thread-safe"""
+
+    def __init__(self, folder: Path, db_path: Path = None):
+        self.folder = Path(folder)
+        self.db_path = Path(db_path) if db_path else self.folder / MANIFEST_NAME
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                video_id TEXT PRIMARY KEY,
+                path     TEXT NOT NULL,
+                size     INTEGER,
+                bitrate  INTEGER,
+                state    TEXT NOT NULL,
+                title    TEXT,
+                updated  REAL
+            )
+        """)
+        # Thứ tự playlist ở lần sync trước (để phát hiện thêm/xóa/đổi vị trí)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS positions (
+                playlist TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (playlist, video_id)
+            )
+        """)
+        # Journal: trạng thái từng video để chạy tiếp sau khi bị kill giữa chừng
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                video_id TEXT PRIMARY KEY,
+                state    TEXT NOT NULL,
+                title    TEXT,
+                source   TEXT,
+                target   TEXT,
+                acodec   TEXT,
+                abr      REAL,
+                error    TEXT,
+                updated  REAL
+            )
+        """)
+        # Snapshot playlist của lượt chạy chưa xong (khỏi lấy lại danh sách)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                playlist TEXT PRIMARY KEY,
+                videos   TEXT NOT NULL,
+                complete INTEGER NOT NULL DEFAULT 0,
+                started  REAL
+            )
+        """)
+        self._conn.commit()
+
+        # Cache trong RAM, load 1 lần mỗi lần chạy
+        self._entries = {}
+        self._file_names = set()
+
+    def load(self) -> int:
+        """Đọc manifest và liệt kê thư mục đúng 1 lần"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id, path, size, bitrate, state, title FROM entries"
+            ).fetchall()
+            self._entries = {
+                row[0]: {
+                    'path': row[1], 'size': row[2], 'bitrate': row[3],
+                    'state': row[4], 'title': row[5],
+                }
+                for row in rows
+            }
+            self._file_names = {
+                entry.name for entry in os.scandir(self.folder)
+                if entry.is_file()
+            }
+        return len(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, video_id: str) -> dict:
+        """Lấy entry theo video ID (None nếu chưa có)"""
+        return self._entries.get(video_id)
+
+    def is_done(self, video_id: str) -> bool:
+        """Video đã tải xong và file vẫn còn trong thư mục"""
+        entry = self._entries.get(video_id)
+        if not entry or entry['state'] != STATE_DONE:
+            return False
+        return Path(entry['path']).name in self._file_names
+
+    def mark_done(self, video_id: str, path: Path, title: str = None,
+                  bitrate: int = None):
+        """Ghi nhận video đã tải xong"""
+        path = Path(path)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = None
+        self._put(video_id, str(path), size, bitrate, STATE_DONE, title)
+        with self._lock:
+            self._file_names.add(path.name)
+
+    def update_path(self, video_id: str, path: Path, state: str = None):
+        """Cập nhật đường dẫn (sau khi đổi tên/di chuyển file) và trạng thái"""
+        entry = self._entries[video_id]
+        path = Path(path)
+        self._put(video_id, str(path), entry['size'], entry['bitrate'],
+                  state or entry['state'], entry['title'])
+        with self._lock:
+            self._file_names.discard(Path(entry['path']).name)
+            if path.parent == self.folder:
+                self._file_names.add(path.name)
+
+    def load_positions(self, playlist: str) -> dict:
+        """Vị trí video ở lần sync trước: {video_id: position}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id, position FROM positions WHERE playlist = ?",
+                (playlist,)
+            ).fetchall()
+        return dict(rows)
+
+    def save_positions(self, playlist: str, video_ids: list):
+        """Lưu thứ tự playlist hiện tại (position bắt đầu từ 1)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM positions WHERE playlist = ?", (playlist,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO positions (playlist, video_id, position) "
+                "VALUES (?, ?, ?)",
+                [(playlist, vid, pos) for pos, vid in enumerate(video_ids, 1)]
+            )
+            self._conn.commit()
+
+    def start_run(self, playlist: str, videos: list):
+        """Lưu snapshot playlist (flat) cho lượt chạy mới"""
+        snapshot = [
+            {k: v[k] for k in ('id', 'title', 'url', 'webpage_url') if v.get(k)}
+            for v in videos
+        ]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (playlist, videos, complete, started) "
+                "VALUES (?, ?, 0, ?)",
+                (playlist, json.dumps(snapshot), time.time())
+            )
+            self._conn.commit()
+
+    def load_run(self, playlist: str) -> list:
+        """Snapshot playlist của lượt chạy trước nếu lượt đó chưa xong, ngược lại None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT videos FROM runs WHERE playlist = ? AND complete = 0",
+                (playlist,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def finish_run(self, playlist: str):
+        """Đánh dấu lượt chạy đã xong và dọn các dòng journal đã hoàn tất"""
+        with self._lock:
+            self._conn.execute("UPDATE runs SET complete = 1 WHERE playlist = ?", (playlist,))
+            self._conn.execute("DELETE FROM journal WHERE state = ?", (STATE_DONE,))
+            self._conn.commit()
+
+    def journal_queue(self, video_ids: list):
+        """Ghi trạng thái queued cho các video sắp xử lý (giữ nguyên video đang dở dang)"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO journal (video_id, state, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(video_id) DO UPDATE SET state = excluded.state, "
+                "updated = excluded.updated WHERE journal.state IN (?, ?)",
+                [(vid, STATE_QUEUED, now, STATE_DONE, STATE_FAILED) for vid in video_ids]
+            )
+            self._conn.commit()
+
+    def journal_set(self, video_id: str, state: str, **fields):
+        """Chuyển trạng thái journal (commit ngay để an toàn khi crash)"""
+        columns = [k for k in JOURNAL_FIELDS if k in fields]
+        values = [str(fields[k]) if k in ('source', 'target') and fields[k] else fields[k]
+                  for k in columns]
+        assignments = ''.join(f", {k} = excluded.{k}" for k in columns)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO journal (video_id, state, updated{''.join(', ' + k for k in columns)}) "
+                f"VALUES (?, ?, ?{', ?' * len(columns)}) "
+                f"ON CONFLICT(video_id) DO UPDATE SET state = excluded.state, "
+                f"updated = excluded.updated{assignments}",
+                (video_id, state, time.time(), *values)
+            )
+            self._conn.commit()
+
+    def journal_entries(self, *states: str) -> list:
+        """Các dòng journal ở trạng thái cho trước"""
+        placeholders = ', '.join('?' * len(states))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT video_id, state, title, source, target, acodec, abr, error "
+                f"FROM journal WHERE state IN ({placeholders})",
+                states
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _put(self, video_id: str, path: str, size: int, bitrate: int,
+             state: str, title: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(video_id, path, size, bitrate, state, title, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (video_id, path, size, bitrate, state, title, time.time())
+            )
+            self._conn.commit()
+            self._entries[video_id] = {
+                'path': path, 'size': size, 'bitrate': bitrate,
+                'state': state, 'title': title,
+            }
+
+    def rebuild(self, videos: list) -> int:
+        """
+        Khôi phục manifest từ các file có sẵn trong thư mục
+
+        Args:
+            videos: Danh sách entry (flat) của playlist, cần có 'id' và 'title'
+
+        Returns:
+            Số entry được thêm vào manifest
+        """
+        claimed = {Path(e['path']).name for e in self._entries.values()}
+        unclaimed = [
+            name for name in self._file_names
+            if name not in claimed and is_audio_file(name)
+        ]
+        if not unclaimed:
+            return 0
+
+        # Index theo title chuẩn hóa (khớp chính xác) và 30 ký tự đầu (khớp gần đúng)
+        by_title = {}
+        by_prefix = defaultdict(list)
+        for name in sorted(unclaimed):
+            key = normalize_title(Path(name).stem)
+            by_title.setdefault(key, name)
+            by_prefix[key[:30]].append(name)
+
+        missing = [
+            (video, normalize_title(video.get('title') or ''))
+            for video in videos
+            if video.get('id') and video['id'] not in self._entries
+        ]
+        # Khớp gần đúng chỉ khi 30 ký tự đầu là duy nhất ở cả 2 phía
+        # ("Bài A (Live)" / "Bài A (Remix)" trùng prefix -> không đoán, tránh nhận nhầm bài)
+        video_prefixes = Counter(key[:30] for video, key in missing if key)
+
+        added = 0
+        used = set()
+        for video, key in missing:
+            if not key or video['id'] in self._entries:
+                continue
+            name = by_title.get(key)
+            if not name or name in used:
+                names = by_prefix.get(key[:30], [])
+                name = names[0] if len(names) == 1 and video_prefixes[key[:30]] == 1 else None
+            if not name or name in used:
+                continue
+            used.add(name)
+            self.mark_done(video['id'], self.folder / name, title=video.get('title'))
+            added += 1
+        return added
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
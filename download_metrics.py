@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Download Metrics
+Số liệu theo từng stage (enumerate / fetch / transcode / write / loudness) của downloader:
+ghi JSON lines và (tùy chọn) phục vụ dạng Prometheus text trên localhost
+
+Author: Your Name
+License: MIT
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+STAGES = ("enumerate", "fetch", "transcode", "write", "loudness")
+
+
+class StageStats:
+    """Thống kê một stage: số item, bytes, thời gian từng item và throughput (thread-safe)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.durations = []
+        self._first_start = None
+        self._last_end = None
+        self._lock = threading.Lock()
+
+    def record(self, started: float, ended: float, nbytes: int = 0):
+        """Ghi nhận một item đã xử lý xong"""
+        with self._lock:
+            self.count += 1
+            self.bytes += nbytes
+            self.busy += ended - started
+            self.durations.append(ended - started)
+            if self._first_start is None or started < self._first_start:
+                self._first_start = started
+            if self._last_end is None or ended > self._last_end:
+                self._last_end = ended
+
+    @property
+    def wall(self) -> float:
+        """Thời gian từ item đầu tiên bắt đầu đến item cuối cùng xong"""
+        if not self.count:
+            return 0.0
+        return max(self._last_end - self._first_start, 1e-6)
+
+    def percentile(self, q: float) -> float:
+        """Percentile (nearest-rank) của thời gian xử lý một item"""
+        with self._lock:
+            durations = sorted(self.durations)
+        if not durations:
+            return 0.0
+        rank = max(1, min(len(durations), round(q * len(durations) + 0.5)))
+        return durations[rank - 1]
+
+    def to_dict(self) -> dict:
+        wall = self.wall
+        return {
+            'count': self.count,
+            'bytes': self.bytes,
+            'busy_s': round(self.busy, 3),
+            'wall_s': round(wall, 3),
+            'tracks_per_min': round(self.count * 60 / wall, 2) if wall else 0.0,
+            'mb_per_s': round(self.bytes / wall / 1024 / 1024, 3) if wall else 0.0,
+            'p50_s': round(self.percentile(0.50), 3),
+            'p95_s': round(self.percentile(0.95), 3),
+            'p99_s': round(self.percentile(0.99), 3),
+        }
+
+    def summary(self) -> str:
+        """Chuỗi tóm tắt: số bài, bài/phút, MB/s, p50/p95/p99"""
+        if not self.count:
+            return f"{self.name}: 0 tracks"
+        d = self.to_dict()
+        return (f"{self.name}: {d['count']} tracks | {d['tracks_per_min']:.1f} tracks/min | "
+                f"{d['mb_per_s']:.2f} MB/s | p50 {d['p50_s']:.2f}s p95 {d['p95_s']:.2f}s "
+                f"p99 {d['p99_s']:.2f}s")
+
+
+class MetricsRecorder:
+    """Gom số liệu theo stage, ghi từng record ra JSON lines, phục vụ /metrics (Prometheus)"""
+
+    def __init__(self, jsonl_path: Path = None):
+        self.stages = {name: StageStats(name.capitalize()) for name in STAGES}
+        self.failures = Counter()
+        self.tracks_done = 0
+        self.started = time.monotonic()
+
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._file = None
+        if jsonl_path:
+            Path(jsonl_path).parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(jsonl_path, 'a', encoding='utf-8')
+
+    def _emit(self, record: dict):
+        if not self._file:
+            return
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record(self, stage: str, started: float, ended: float, nbytes: int = 0,
+               video_id: str = None):
+        """Ghi một item hoàn tất ở stage (thời điểm theo time.monotonic())"""
+        self.stages[stage].record(started, ended, nbytes)
+        self._emit({
+            'type': 'stage', 'ts': time.time(), 'stage': stage, 'video_id': video_id,
+            'duration_s': round(ended - started, 4), 'bytes': nbytes,
+        })
+
+    def failure(self, stage: str, error_class: str, video_id: str = None, message: str = None):
+        """Ghi một lỗi ở stage, gom theo loại lỗi"""
+        with self._lock:
+            self.failures[(stage, error_class)] += 1
+        self._emit({
+            'type': 'failure', 'ts': time.time(), 'stage': stage, 'video_id': video_id,
+            'error_class': error_class, 'message': (message or '')[:200],
+        })
+
+    def track_done(self):
+        """Một bài đã đi hết pipeline"""
+        with self._lock:
+            self.tracks_done += 1
+
+    def add_gauge(self, name: str, getter):
+        """Gauge đọc lúc xuất số liệu (vd: số luồng hiện tại)"""
+        self._gauges[name] = getter
+
+    def snapshot(self) -> dict:
+        """Tổng hợp hiện tại: tracks/min, MB/s, percentile theo stage, lỗi theo loại"""
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        with self._lock:
+            failures = [
+                {'stage': stage, 'error_class': error_class, 'count': count}
+                for (stage, error_class), count in sorted(self.failures.items())
+            ]
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'tracks_done': self.tracks_done,
+            'tracks_per_min': round(self.tracks_done * 60 / elapsed, 2),
+            'mb_per_s': round(self.stages['fetch'].bytes / elapsed / 1024 / 1024, 3),
+            'stages': {name: stats.to_dict() for name, stats in self.stages.items()},
+            'failures': failures,
+            'gauges': {name: getter() for name, getter in self._gauges.items()},
+        }
+
+    def prometheus(self) -> str:
+        """Số liệu dạng Prometheus text exposition"""
+        snap = self.snapshot()
+        lines = [
+            "# TYPE ytdl_tracks_done_total counter",
+            f"ytdl_tracks_done_total {snap['tracks_done']}",
+            "# TYPE ytdl_tracks_per_minute gauge",
+            f"ytdl_tracks_per_minute {snap['tracks_per_min']}",
+            "# TYPE ytdl_stage_items_total counter",
+        ]
+        for name, d in snap['stages'].items():
+            lines.append(f'ytdl_stage_items_total{{stage="{name}"}} {d["count"]}')
+        lines.append("# TYPE ytdl_stage_bytes_total counter")
+        for name, d in snap['stages'].items():
+            lines.append(f'ytdl_stage_bytes_total{{stage="{name}"}} {d["bytes"]}')
+        lines.append("# TYPE ytdl_stage_duration_seconds summary")
+        for name, d in snap['stages'].items():
+            for q, key in (("0.5", 'p50_s'), ("0.95", 'p95_s'), ("0.99", 'p99_s')):
+                lines.append(f'ytdl_stage_duration_seconds{{stage="{name}",quantile="{q}"}} {d[key]}')
+            lines.append(f'ytdl_stage_duration_seconds_sum{{stage="{name}"}} {d["busy_s"]}')
+            lines.append(f'ytdl_stage_duration_seconds_count{{stage="{name}"}} {d["count"]}')
+        lines.append("# TYPE ytdl_failures_total counter")
+        for f in snap['failures']:
+            lines.append(f'ytdl_failures_total{{stage="{f["stage"]}",'
+                         f'error_class="{f["error_class"]}"}} {f["count"]}')
+        for name, value in snap['gauges'].items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Chạy endpoint /metrics (Prometheus text) và /metrics.json trong luồng nền"""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = recorder.prometheus().encode('utf-8')
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(recorder.snapshot()).encode('utf-8')
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http",
+                         daemon=True).start()
+        return self._server.server_address
+
+    def close(self):
+        """Ghi record tổng kết, dừng endpoint và đóng file"""
+        self._emit({'type': 'summary', 'ts': time.time(), **self.snapshot()})
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -33,7 +33,8 @@ def check_dependencies():
         return True
 
 
-def download_playlist(playlist_url: str, output_folder: str = None, quality: str = "192"):
+def download_playlist(playlist_url: str, output_folder: str = None, quality: str = "192",
+                      keep_native: bool = False):
     """
     Tải playlist YouTube thành MP3
     
@@ -41,6 +42,7 @@ def download_playlist(playlist_url: str, output_folder: str = None, quality: str
         playlist_url: URL playlist YouTube
         output_folder: Thư mục lưu file (mặc định: ./downloads)
         quality: Chất lượng MP3 (128, 192, 256, 320)
+        keep_native: True = giữ audio gốc (m4a/opus), không encode MP3
     """
     import yt_dlp
     
@@ -55,7 +57,7 @@ def download_playlist(playlist_url: str, output_folder: str = None, quality: str
     
     print(f"\n[FOLDER] {output_folder}")
     print(f"[URL] {playlist_url}")
-    print(f"[QUALITY] {quality}kbps")
+    print(f"[QUALITY] {'native (no transcode)' if keep_native else quality + 'kbps'}")
     print("-" * 60)
     
     def progress_hook(d):
@@ -67,13 +69,21 @@ def download_playlist(playlist_url: str, output_folder: str = None, quality: str
             filename = Path(d.get('filename', '')).name
             print(f"\n[OK] {filename}")
     
-    ydl_opts = {
-        'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best',
-        'postprocessors': [{
+    if keep_native:
+        # 'best' = chỉ tách/remux audio (webm -> .opus, m4a giữ nguyên), không encode
+        audio_format = 'bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio/best'
+        postprocessor = {'key': 'FFmpegExtractAudio', 'preferredcodec': 'best'}
+    else:
+        audio_format = 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best'
+        postprocessor = {
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
             'preferredquality': quality,
-        }],
+        }
+    
+    ydl_opts = {
+        'format': audio_format,
+        'postprocessors': [postprocessor],
         'outtmpl': str(output_folder / '%(playlist_index)04d - %(title)s.%(ext)s'),
         'ffmpeg_location': str(script_dir),
         'ignoreerrors': True,
@@ -130,7 +140,10 @@ def main():
     print("\n[INPUT] Enter MP3 quality (128/192/256/320, default: 192):")
     quality = input("[QUALITY] ").strip() or "192"
     
-    download_playlist(url, folder, quality)
+    print("\n[INPUT] Keep original audio m4a/opus, no MP3 encode? (y/N):")
+    keep_native = input("[NATIVE] ").strip().lower() == 'y'
+    
+    download_playlist(url, folder, quality, keep_native)
     input("\nPress Enter to exit...")
 
 
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Library Index
+Chỉ mục thư viện nhạc lưu trên đĩa (duration, bitrate, tags, size, track ID ổn định)
+để player không phải parse lại file bằng mutagen mỗi lần mở thư mục / phát bài
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import json
+import uuid
+import threading
+from pathlib import Path
+
+try:
+    from mutagen import File as MutagenFile
+except ImportError:
+    MutagenFile = None
+
+from audio_files import is_audio_file
+
+
+# File index nằm cạnh player_cache.json
+LIBRARY_INDEX_NAME = "library_index.json"
+
+# Số file mỗi đợt khi quét (player hiển thị dần theo từng đợt)
+SCAN_BATCH = 200
+
+# Tăng khi đổi cấu trúc entry -> index cũ bị bỏ, parse lại
+INDEX_VERSION = 1
+
+TAG_FIELDS = ('title', 'artist', 'album')
+
+
+def read_metadata(filepath: Path) -> dict:
+    """Đọc duration (giây), bitrate (bps) và tags bằng mutagen"""
+    meta = {'duration': 0.0, 'bitrate': 0}
+    meta.update({field: None for field in TAG_FIELDS})
+    if MutagenFile is None:
+        return meta
+    try:
+        audio = MutagenFile(str(filepath), easy=True)
+    except Exception:
+        return meta
+    if audio is None:
+        return meta
+    meta['duration'] = round(float(getattr(audio.info, 'length', 0) or 0), 3)
+    meta['bitrate'] = int(getattr(audio.info, 'bitrate', 0) or 0)
+    for field in TAG_FIELDS:
+        values = audio.tags.get(field) if audio.tags else None
+        if values:
+            meta[field] = str(values[0])
+    return meta
+
+
+class LibraryIndex:
+    """
+    Index path -> metadata, kiểm tra hợp lệ theo (size, mtime)
+
+    Chỉ file mới hoặc đã đổi mới bị parse lại; file đổi tên (cùng size + mtime)
+    giữ nguyên track ID và metadata. Thread-safe (quét được trong luồng nền).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries = {}
+        self.dirty = False
+        self.parsed = 0
+        self._lock = threading.RLock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.entries = data.get('tracks', {})
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, filepath) -> dict:
+        """Entry của file (None nếu chưa có trong index)"""
+        return self.entries.get(str(filepath))
+
+    def _valid(self, entry: dict, stat: os.stat_result) -> bool:
+        return entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns
+
+    def _add(self, key: str, stat: os.stat_result, meta: dict, track_id: str = None) -> dict:
+        entry = {
+            'id': track_id or uuid.uuid4().hex[:16],
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            **meta,
+        }
+        with self._lock:
+            self.entries[key] = entry
+            self.dirty = True
+        return entry
+
+    def _resolve(self, key: str, stat: os.stat_result, renamed: dict) -> dict:
+        """Entry hợp lệ cho file: dùng lại, lấy từ file đã đổi tên, hoặc parse mới"""
+        entry = self.entries.get(key)
+        if entry and self._valid(entry, stat):
+            return entry
+        old_key = renamed.pop((stat.st_size, stat.st_mtime_ns), None)
+        old = self.entries.get(old_key) if old_key else None
+        if old:
+            meta = {k: v for k, v in old.items() if k not in ('id', 'size', 'mtime')}
+            return self._add(key, stat, meta, old['id'])
+        self.parsed += 1
+        return self._add(key, stat, read_metadata(key), entry['id'] if entry else None)
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                if self.entries.pop(key, None) is not None:
+                    self.dirty = True
+
+    def ensure(self, filepath) -> dict:
+        """Entry hợp lệ của 1 file, parse nếu chưa có hoặc file đã đổi"""
+        key = str(filepath)
+        return self._resolve(key, os.stat(key), {})
+
+    def scan_batches(self, folder: Path, batch_size: int = SCAN_BATCH):
+        """
+        Cập nhật index cho thư mục, trả dần từng đợt [(path, entry), ...] theo thứ tự tên file
+
+        Liệt kê thư mục 1 lần, chỉ parse file mới/đã đổi. Entry của file không
+        còn trong thư mục bị xóa khi quét xong; index được lưu cả khi dừng giữa chừng.
+        """
+        folder = Path(folder)
+        items = sorted(
+            (item for item in os.scandir(folder) if item.is_file() and is_audio_file(item.name)),
+            key=lambda item: item.name
+        )
+        keys = {str(folder / item.name): item for item in items}
+
+        # Entry của thư mục này mà file không còn -> ứng viên "đổi tên"
+        prefix = str(folder) + os.sep
+        with self._lock:
+            vanished = [
+                key for key in self.entries
+                if key.startswith(prefix) and os.sep not in key[len(prefix):] and key not in keys
+            ]
+        renamed = {(self.entries[k]['size'], self.entries[k]['mtime']): k for k in vanished}
+
+        try:
+            batch = []
+            for key, item in keys.items():
+                try:
+                    stat = item.stat()
+                except OSError:  # bị xóa trong lúc quét
+                    continue
+                batch.append((key, self._resolve(key, stat, renamed)))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            self._forget(vanished)
+        finally:
+            self.save()
+
+    def scan(self, folder: Path) -> list:
+        """
+        Cập nhật index cho thư mục (chỉ parse file mới/đã đổi) và lưu nếu có thay đổi
+
+        Returns:
+            Danh sách (path, entry) theo thứ tự tên file
+        """
+        return [track for batch in self.scan_batches(folder) for track in batch]
+
+    def refresh(self, folder: Path, known: set) -> tuple:
+        """
+        Cập nhật tăng dần khi thư mục thay đổi (không quét lại metadata các file đã biết)
+
+        Args:
+            folder: Thư mục nhạc
+            known: Các path đang có trong danh sách phát
+
+        Returns:
+            (added: [(path, entry)], removed: [path]) - file đổi tên là 1 removed + 1 added
+        """
+        folder = Path(folder)
+        present = {
+            str(folder / item.name): item for item in os.scandir(folder)
+            if item.is_file() and is_audio_file(item.name)
+        }
+        removed = sorted(known - present.keys())
+        renamed = {
+            (self.entries[k]['size'], self.entries[k]['mtime']): k
+            for k in removed if k in self.entries
+        }
+        added = []
+        for key in sorted(present.keys() - known):
+            try:
+                added.append((key, self._resolve(key, present[key].stat(), renamed)))
+            except OSError:
+                continue
+        self._forget(removed)
+        self.save()
+        return added, removed
+
+    def save(self):
+        """Ghi index (atomic: file tạm rồi rename)"""
+        with self._lock:
+            if not self.dirty:
+                return
+            temp = self.path.with_name(self.path.name + ".tmp")
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'tracks': self.entries}, f,
+                          ensure_ascii=False)
+            os.replace(temp, self.path)
+            self.dirty = False
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Loudness
+Đo độ to tích hợp (EBU R128 / ITU-R BS.1770, LUFS) và peak của từng bài song song
+bằng process pool, lưu cache theo danh tính file để player tự cân bằng âm lượng
+(kiểu ReplayGain 2.0: đưa mọi bài về cùng mức -18 LUFS)
+
+Chạy riêng để đo cả thư viện:  python loudness.py [thư mục nhạc]
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from audio_files import stream_pcm, list_audio_files
+
+
+# File cache nằm cạnh library_index.json, dùng chung cho player và downloader
+LOUDNESS_CACHE_NAME = "loudness_cache.json"
+
+# Tăng khi đổi cách đo -> cache cũ bị bỏ, đo lại
+CACHE_VERSION = 1
+
+# Mức đích (LUFS) - ReplayGain 2.0
+REFERENCE_LUFS = -18.0
+
+# Bộ lọc K-weighting của BS.1770 cho 48 kHz: shelf cao tần + high-pass RLB (b0, b1, b2, a1, a2)
+SAMPLE_RATE = 48000
+CHANNELS = 2
+K_WEIGHTING = (
+    (1.53512485958697, -2.69169618940638, 1.19839281085285, -1.69065929318241, 0.73248077421585),
+    (1.0, -2.0, 1.0, -1.99004745483398, 0.99007225036621),
+)
+
+# Lọc theo khối bằng FFT (overlap-save): đáp ứng xung của bộ lọc tắt hẳn trong FILTER_TAIL mẫu
+FFT_SIZE = 1 << 16
+FILTER_TAIL = 8192
+
+# Khối đo 400 ms, bước 100 ms (chồng 75%); ngưỡng tuyệt đối -70 LUFS, tương đối -10 LU
+STEP_SAMPLES = SAMPLE_RATE // 10
+BLOCK_STEPS = 4
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+
+# Ghi cache sau mỗi SAVE_EVERY bài (dừng giữa chừng không mất kết quả đã đo)
+SAVE_EVERY = 50
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Loudness analysis needs numpy: pip install numpy")
+
+
+@lru_cache(maxsize=None)
+def _k_response(size: int) -> "np.ndarray":
+    """Đáp ứng tần số (phức) của bộ lọc K-weighting tại các bin của rfft dài `size`"""
+    z = np.exp(-2j * np.pi * np.fft.rfftfreq(size))
+    response = np.ones(len(z), dtype=complex)
+    for b0, b1, b2, a1, a2 in K_WEIGHTING:
+        response *= (b0 + b1 * z + b2 * z * z) / (1.0 + a1 * z + a2 * z * z)
+    return response
+
+
+def _loudness(mean_squares: "np.ndarray") -> "np.ndarray":
+    with np.errstate(divide='ignore'):
+        return -0.691 + 10 * np.log10(mean_squares)
+
+
+def integrated_loudness(steps: "np.ndarray") -> float:
+    """
+    Độ to tích hợp (LUFS) từ năng lượng đã K-weighting của từng đoạn 100 ms
+
+    Args:
+        steps: Trung bình bình phương mỗi 100 ms (đã cộng các kênh)
+
+    Returns:
+        LUFS, None nếu bài quá ngắn (< 400 ms) hoặc im lặng
+    """
+    if len(steps) < BLOCK_STEPS:
+        return None
+    blocks = np.lib.stride_tricks.sliding_window_view(steps, BLOCK_STEPS).mean(axis=1)
+    loudness = _loudness(blocks)
+    above = loudness > ABSOLUTE_GATE
+    if not above.any():
+        return None
+    threshold = _loudness(blocks[above].mean()) + RELATIVE_GATE
+    return float(_loudness(blocks[above & (loudness > threshold)].mean()))
+
+
+def measure_file(filepath: Path) -> dict:
+    """
+    Giải mã cả bài (48 kHz stereo, từng khối), lọc K-weighting và đo
+
+    Returns:
+        {'lufs': độ to tích hợp (None nếu im lặng/quá ngắn), 'peak': sample peak 0..1}
+    """
+    _require_numpy()
+    step = FFT_SIZE - FILTER_TAIL
+    response = _k_response(FFT_SIZE)
+    history = np.zeros((CHANNELS, FILTER_TAIL))
+    pending = np.zeros(0)
+    steps = []
+    peak = 0
+
+    for data in stream_pcm(filepath, SAMPLE_RATE, CHANNELS, step):
+        pcm = np.frombuffer(data, dtype='<i2').reshape(-1, CHANNELS)
+        peak = max(peak, int(np.abs(pcm, dtype=np.int32).max()))
+        # Mỗi kênh 1 hàng liền nhau cho FFT
+        block = np.concatenate((history, pcm.T / 32768.0), axis=1)
+        history = block[:, -FILTER_TAIL:]
+        # Overlap-save: FILTER_TAIL mẫu đầu bị lẫn vòng (circular) -> bỏ
+        filtered = np.fft.irfft(np.fft.rfft(block, FFT_SIZE) * response,
+                                FFT_SIZE)[:, FILTER_TAIL:block.shape[1]]
+        power = np.concatenate((pending, np.einsum('ij,ij->j', filtered, filtered)))
+        whole = len(power) - len(power) % STEP_SAMPLES
+        steps.append(power[:whole].reshape(-1, STEP_SAMPLES).mean(axis=1))
+        pending = power[whole:]
+
+    lufs = integrated_loudness(np.concatenate(steps)) if steps else None
+    return {
+        'lufs': None if lufs is None else round(lufs, 2),
+        'peak': round(peak / 32768.0, 4),
+    }
+
+
+def _measure_worker(filepath: Path) -> tuple:
+    """Chạy trong process pool: (file, kết quả hoặc None nếu lỗi, số giây)"""
+    started = time.perf_counter()
+    try:
+        result = measure_file(filepath)
+    except (subprocess.CalledProcessError, OSError, ValueError):
+        result = None
+    return filepath, result, time.perf_counter() - started
+
+
+def track_gain(entry: dict, reference: float = REFERENCE_LUFS) -> float:
+    """Gain (dB) đưa bài về mức `reference`, không để peak vượt 0 dBFS; 0 nếu chưa đo"""
+    if not entry or entry.get('lufs') is None:
+        return 0.0
+    gain = reference - entry['lufs']
+    if entry.get('peak'):
+        gain = min(gain, -20 * math.log10(entry['peak']))
+    return gain
+
+
+class LoudnessCache:
+    """
+    Kết quả đo theo danh tính file (size, mtime) thay vì đường dẫn
+
+    File đổi tên hoặc link sang thư mục playlist không phải đo lại; file bị ghi đè
+    (size/mtime đổi) thì đo lại. Ghi atomic và gộp với bản trên đĩa, nên player và
+    downloader cùng đo được mà không ghi đè kết quả của nhau. Thread-safe.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.dirty = False
+        self._lock = threading.RLock()
+        self.entries = self._read()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                return dict(data.get('tracks', {}))
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    @staticmethod
+    def identity(stat: os.stat_result) -> str:
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def get(self, filepath, stat: os.stat_result = None) -> dict:
+        """Kết quả đã đo của file (None nếu chưa đo hoặc file không còn)"""
+        try:
+            stat = stat or os.stat(filepath)
+        except OSError:
+            return None
+        return self.entries.get(self.identity(stat))
+
+    def put(self, filepath, result: dict, stat: os.stat_result = None):
+        stat = stat or os.stat(filepath)
+        with self._lock:
+            self.entries[self.identity(stat)] = result
+            self.dirty = True
+
+    def gain(self, filepath) -> float:
+        """Gain (dB) của bài, 0 nếu chưa đo"""
+        return track_gain(self.get(filepath))
+
+    def save(self):
+        """Ghi cache (gộp với bản trên đĩa, atomic: file tạm rồi rename)"""
+        with self._lock:
+            if not self.dirty:
+                return
+            merged = self._read()
+            merged.update(self.entries)
+            self.entries = merged
+            temp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'tracks': merged}, f, separators=(',', ':'))
+            os.replace(temp, self.path)
+            self.dirty = False
+
+
+def analyze_files(files: list, cache: LoudnessCache, workers: int = None, stop=None):
+    """
+    Đo song song (process pool) các file chưa có trong cache, ghi cache theo từng đợt
+
+    Chỉ giữ tối đa 2 x `workers` file đang chờ nên dừng giữa chừng (`stop()` trả True
+    hoặc đóng generator) chỉ phải chờ các file đang đo dở.
+
+    Yields:
+        (file, kết quả hoặc None nếu lỗi, số giây đo) theo thứ tự đo xong
+    """
+    _require_numpy()
+    todo = []
+    for f in files:
+        try:
+            if cache.get(f, os.stat(f)) is None:
+                todo.append(f)
+        except OSError:
+            continue
+    if not todo:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    pending = iter(todo)
+    running = set()
+    measured = 0
+    # spawn: được gọi từ process nhiều luồng (Qt, HTTP, luồng tải) - fork ở đó có thể
+    # chép cả lock đang bị luồng khác giữ sang process con và treo
+    executor = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+    try:
+        while True:
+            for f in islice(pending, 2 * workers - len(running)):
+                running.add(executor.submit(_measure_worker, f))
+            if not running:
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                filepath, result, seconds = future.result()
+                if result is not None:
+                    try:
+                        cache.put(filepath, result)
+                    except OSError:  # bị xóa trong lúc đo
+                        continue
+                    measured += 1
+                    if measured % SAVE_EVERY == 0:
+                        cache.save()
+                yield filepath, result, seconds
+            if stop is not None and stop():
+                break
+    finally:
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=True)
+        cache.save()
+
+
+def main():
+    """Đo cả thư mục nhạc (chỉ file mới/đã đổi)"""
+    script_dir = Path(__file__).parent.absolute()
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else script_dir / "downloads"
+    if not folder.is_dir():
+        print(f"[ERROR] Folder not found: {folder}")
+        return
+
+    cache = LoudnessCache(script_dir / LOUDNESS_CACHE_NAME)
+    files = list_audio_files(folder)
+    print(f"[LOUDNESS] {folder}: {len(files)} files, {len(cache)} cached")
+    started = time.perf_counter()
+    measured = failed = 0
+    for filepath, result, seconds in analyze_files(files, cache):
+        if result is None:
+            failed += 1
+            print(f"[FAIL] {filepath.name}")
+            continue
+        measured += 1
+        print(f"[OK] {result['lufs']} LUFS, peak {result['peak']}, "
+              f"gain {track_gain(result):+.1f} dB ({seconds:.1f}s) {filepath.name}")
+    print(f"[DONE] {measured} measured, {failed} failed in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
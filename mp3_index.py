@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MP3 Seek Index
+Quét header frame MP3 1 lần, lưu byte offset của frame theo từng mốc thời gian
+để seek chính xác tới frame (kể cả file VBR / mix dài) bằng tìm nhị phân
+
+Author: Your Name
+License: MIT
+"""
+
+import io
+import os
+import sys
+import mmap
+import struct
+import bisect
+import tempfile
+from array import array
+from functools import lru_cache
+from pathlib import Path
+
+
+# Thư mục seek index (cạnh library_index.json), mỗi bài 1 file theo track ID
+SEEK_INDEX_DIR = "seek_index"
+
+# Khoảng cách (giây) giữa 2 điểm trong index
+SEEK_INTERVAL = 1.0
+
+# Đổi khi đổi định dạng file index -> index cũ bị bỏ, quét lại
+INDEX_MAGIC = b"MP3S"
+INDEX_VERSION = 1
+_HEADER = struct.Struct("<4sHIIqqQI")
+
+# Frame Layer III dài nhất (320 kbps @ 32 kHz, có padding)
+MAX_FRAME_BYTES = 1441
+
+_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2.5
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+@lru_cache(maxsize=None)
+def _frame_info(b1: int, b2: int) -> tuple:
+    """(độ dài frame, sample rate, số mẫu/frame) từ byte 2-3 của header Layer III, None nếu không hợp lệ"""
+    if b1 & 0xE0 != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer = (b1 >> 1) & 3
+    bitrate_idx = b2 >> 4
+    rate_idx = (b2 >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    bitrate = _BITRATES[version][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_idx]
+    samples = 1152 if version == 3 else 576
+    length = samples // 8 * bitrate // sample_rate + ((b2 >> 1) & 1)
+    return length, sample_rate, samples
+
+
+def parse_header(data, pos: int) -> tuple:
+    """Header frame tại `pos` (None nếu không phải frame MP3)"""
+    if pos + 4 > len(data) or data[pos] != 0xFF:
+        return None
+    return _frame_info(data[pos + 1], data[pos + 2])
+
+
+def _id3v2_size(data) -> int:
+    """Số byte của tag ID3v2 đầu file (0 nếu không có)"""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    return size + 10 + (10 if data[5] & 0x10 else 0)
+
+
+def _resync(data, pos: int) -> int:
+    """Vị trí frame hợp lệ kế tiếp từ `pos` (frame sau nó cũng phải hợp lệ), -1 nếu hết"""
+    while True:
+        pos = data.find(b"\xff", pos)
+        if pos < 0:
+            return -1
+        info = parse_header(data, pos)
+        if info:
+            after = pos + info[0]
+            if after >= len(data) or parse_header(data, after):
+                return pos
+        pos += 1
+
+
+def scan_frames(data, start: int = 0):
+    """Duyệt các frame MP3: (offset, độ dài, sample rate, số mẫu)"""
+    pos = _resync(data, start)
+    while 0 <= pos < len(data):
+        info = parse_header(data, pos)
+        if info is None or pos + info[0] > len(data):
+            pos = _resync(data, pos + 1)
+            continue
+        yield (pos,) + info
+        pos += info[0]
+
+
+def _is_info_frame(data, pos: int, length: int) -> bool:
+    """Frame đầu chứa header Xing/Info/VBRI (không có audio)"""
+    head = data[pos:pos + min(length, 64)]
+    return b"Xing" in head or b"Info" in head or b"VBRI" in head
+
+
+class SeekIndex:
+    """Điểm seek: frame thứ frames[i] của bài bắt đầu tại byte offsets[i]"""
+
+    def __init__(self, sample_rate: int, samples_per_frame: int, total_frames: int,
+                 frames: array, offsets: array):
+        self.sample_rate = sample_rate
+        self.samples_per_frame = samples_per_frame
+        self.total_frames = total_frames
+        self.frames = frames
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @property
+    def frame_seconds(self) -> float:
+        return self.samples_per_frame / self.sample_rate
+
+    @property
+    def duration(self) -> float:
+        return self.total_frames * self.frame_seconds
+
+    def lookup(self, seconds: float) -> tuple:
+        """(frame, offset) của điểm index gần nhất không sau `seconds` - O(log n)"""
+        target = int(max(seconds, 0.0) / self.frame_seconds)
+        i = max(bisect.bisect_right(self.frames, target) - 1, 0)
+        return self.frames[i], self.offsets[i]
+
+    def locate(self, filepath: Path, seconds: float) -> tuple:
+        """
+        (thời điểm, byte offset) của frame chứa `seconds`
+
+        Tìm điểm index gần nhất rồi đi tiếp từng header (tối đa SEEK_INTERVAL giây)
+        """
+        target = min(int(max(seconds, 0.0) / self.frame_seconds), self.total_frames - 1)
+        frame, offset = self.lookup(seconds)
+        if target > frame:
+            with open(filepath, "rb") as f:
+                f.seek(offset)
+                data = f.read((target - frame + 1) * MAX_FRAME_BYTES + 4)
+            pos = 0
+            while frame < target:
+                info = parse_header(data, pos)
+                if info is None:
+                    break
+                pos += info[0]
+                frame += 1
+            offset += pos
+        return frame * self.frame_seconds, offset
+
+    def to_bytes(self, size: int, mtime_ns: int) -> bytes:
+        frames, offsets = array("Q", self.frames), array("Q", self.offsets)
+        if sys.byteorder == "big":
+            frames.byteswap()
+            offsets.byteswap()
+        header = _HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.sample_rate,
+                              self.samples_per_frame, size, mtime_ns, self.total_frames,
+                              len(frames))
+        return header + frames.tobytes() + offsets.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, size: int, mtime_ns: int):
+        """Đọc index đã lưu (None nếu sai định dạng hoặc file nhạc đã đổi)"""
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, sample_rate, spf, saved_size, saved_mtime, total, count = \
+            _HEADER.unpack_from(data)
+        if (magic, version, saved_size, saved_mtime) != (INDEX_MAGIC, INDEX_VERSION, size, mtime_ns):
+            return None
+        if len(data) != _HEADER.size + count * 16:
+            return None
+        frames, offsets = array("Q"), array("Q")
+        frames.frombytes(data[_HEADER.size:_HEADER.size + count * 8])
+        offsets.frombytes(data[_HEADER.size + count * 8:])
+        if sys.byteorder == "big":
+            frames.byteswap()
+            offsets.byteswap()
+        return cls(sample_rate, spf, total, frames, offsets)
+
+
+def build_seek_index(filepath: Path, interval: float = SEEK_INTERVAL) -> SeekIndex:
+    """Quét header frame của file MP3, lấy 1 điểm mỗi `interval` giây (None nếu không có frame)"""
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            frames, offsets = array("Q"), array("Q")
+            sample_rate = samples = None
+            count = 0
+            next_mark = 0.0
+            for pos, length, rate, spf in scan_frames(data, _id3v2_size(data)):
+                if sample_rate is None:
+                    if _is_info_frame(data, pos, length):
+                        continue
+                    sample_rate, samples = rate, spf
+                    step = interval * rate / spf
+                if count >= next_mark:
+                    frames.append(count)
+                    offsets.append(pos)
+                    next_mark += step
+                count += 1
+    if not count:
+        return None
+    return SeekIndex(sample_rate, samples, count, frames, offsets)
+
+
+class FrameSlice(io.RawIOBase):
+    """File MP3 nhìn từ byte `offset` (frame đầu tiên) - để pygame phát bắt đầu từ frame đó"""
+
+    def __init__(self, filepath: Path, offset: int):
+        super().__init__()
+        self._file = open(filepath, "rb")
+        self._base = offset
+        self._size = os.fstat(self._file.fileno()).st_size - offset
+        self._file.seek(offset)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        return self._file.readinto(buffer)
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self.tell()
+        elif whence == io.SEEK_END:
+            pos += self._size
+        self._file.seek(self._base + max(pos, 0))
+        return self.tell()
+
+    def tell(self) -> int:
+        return self._file.tell() - self._base
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class SeekIndexCache:
+    """Seek index lưu trên đĩa theo track ID, kiểm tra hợp lệ theo (size, mtime) của file nhạc"""
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+
+    def _file(self, key: str) -> Path:
+        return self.folder / f"{key}.idx"
+
+    def get(self, filepath: Path, key: str) -> SeekIndex:
+        """Index của file MP3 (quét và lưu nếu chưa có/đã cũ), None nếu không phải MP3"""
+        if not str(filepath).lower().endswith(".mp3"):
+            return None
+        stat = os.stat(filepath)
+        cached = self._file(key)
+        try:
+            index = SeekIndex.from_bytes(cached.read_bytes(), stat.st_size, stat.st_mtime_ns)
+            if index is not None:
+                return index
+        except OSError:
+            pass
+
+        index = build_seek_index(filepath)
+        if index is None:
+            return None
+        # Ghi atomic, tên tạm riêng (luồng preload và luồng GUI có thể ghi cùng lúc)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        fd, temp = tempfile.mkstemp(prefix=key, suffix=".tmp", dir=self.folder)
+        with os.fdopen(fd, "wb") as f:
+            f.write(index.to_bytes(stat.st_size, stat.st_mtime_ns))
+        os.replace(temp, cached)
+        return index
+
+    def prune(self, keys: set):
+        """Xóa index của các bài không còn trong thư viện"""
+        if not self.folder.is_dir():
+            return
+        for item in os.scandir(self.folder):
+            if item.name.endswith(".idx") and item.name[:-4] not in keys:
+                try:
+                    os.remove(item.path)
+                except OSError:
+                    pass
@@ -5,11 +5,12 @@ MP3 Music Player - Desktop App
 Ứng dụng nghe nhạc MP3 với giao diện đẹp
 
 Features:
-- Phát nhạc MP3 từ thư mục
+- Phát nhạc MP3 / M4A / Opus từ thư mục
 - Phát ngẫu nhiên (shuffle)
 - Phát ngẫu nhiên không lặp (shuffle no repeat)
 - Phát lần lượt (sequential)
 - Lưu vị trí phát để tiếp tục lần sau
+- Tự cân bằng âm lượng giữa các bài (đo loudness EBU R128 trong nền)
 - Giao diện hiện đại
 
 Author: Your Name
@@ -18,65 +19,136 @@ License: MIT
 
 import os
 import sys
-import json
-import random
+import subprocess
 from pathlib import Path
 
+from library_index import LibraryIndex
+from loudness import LoudnessCache, analyze_files
+from search_index import SearchIndex, track_text
+
 # Kiểm tra và cài đặt dependencies
 def install_dependencies():
     required = ['pygame', 'PyQt6', 'mutagen']
     import subprocess
     for pkg in required:
         try:
-            __import__(pkg.lower().replace('6', ''))
+            __import__(pkg)
         except ImportError:
             print(f"Installing {pkg}...")
             subprocess.check_call([sys.executable, "-m", "pip", "install", pkg, "-q"])
 
 install_dependencies()
 
-# Import mutagen để lấy duration MP3
-try:
-    from mutagen.mp3 import MP3
-except ImportError:
-    MP3 = None
-
 import pygame
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QSlider, QListWidget, QListWidgetItem,
+    QPushButton, QLabel, QSlider, QLineEdit,
     QFileDialog, QStyle, QFrame, QSplitter
 )
-from PyQt6.QtCore import Qt, QTimer, QSize
+from PyQt6.QtCore import Qt, QTimer, QSize, QThread, QFileSystemWatcher, pyqtSignal
 from PyQt6.QtGui import QFont, QIcon, QPalette, QColor
 
+from playlist_model import PlaylistModel, PlaylistView
+from player_core import PlayerCore, preload_track, NORMALIZE_LOUDNESS
+
+
+# Gom các thay đổi thư mục liên tiếp (ms) trước khi cập nhật danh sách
+WATCH_DEBOUNCE_MS = 500
 
-class MusicPlayer(QMainWindow):
-    """Main Music Player Window"""
+# Số process đo loudness nền (để dành CPU cho việc phát nhạc)
+LOUDNESS_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+
+class FolderScanner(QThread):
+    """Quét thư mục nhạc trong luồng nền, dựng chỉ mục tìm kiếm, gửi kết quả theo từng đợt"""
     
-    def __init__(self):
-        super().__init__()
-        
-        # Khởi tạo pygame mixer
-        pygame.mixer.init()
-        
-        # Biến state
-        self.playlist = []
-        self.current_index = 0
-        self.is_playing = False
-        self.is_paused = False
-        self.play_mode = "sequential"  # sequential, shuffle, shuffle_no_repeat
-        self.shuffle_history = []
-        self.shuffle_remaining = []
-        
-        # Duration tracking
-        self.track_duration = 0  # seconds
-        self.track_start_time = 0  # thời điểm bắt đầu phát
-        
-        # Đường dẫn cache
-        self.script_dir = Path(__file__).parent.absolute()
-        self.cache_file = self.script_dir / "player_cache.json"
-        self.music_folder = self.script_dir / "downloads"
+    batch_ready = pyqtSignal(list)
+    
+    def __init__(self, library: LibraryIndex, folder: Path, search_index: SearchIndex, parent=None):
+        super().__init__(parent)
+        self.library = library
+        self.folder = folder
+        self.search_index = search_index
+    
+    def run(self):
+        batches = self.library.scan_batches(self.folder)
+        try:
+            for batch in batches:
+                if self.isInterruptionRequested():
+                    break
+                self.search_index.add_many((path, track_text(path, entry)) for path, entry in batch)
+                self.batch_ready.emit([path for path, entry in batch])
+        finally:
+            batches.close()
+
+
+class LoudnessAnalyzer(QThread):
+    """Đo loudness các bài chưa có trong cache (process pool), báo từng bài đo xong"""
+    
+    track_measured = pyqtSignal(str)
+    
+    def __init__(self, paths: list, cache: LoudnessCache, parent=None):
+        super().__init__(parent)
+        self.paths = paths
+        self.cache = cache
+    
+    def run(self):
+        try:
+            for path, result, seconds in analyze_files(self.paths, self.cache, LOUDNESS_WORKERS,
+                                                       stop=self.isInterruptionRequested):
+                if result is not None:
+                    self.track_measured.emit(path)
+        except (RuntimeError, OSError) as e:
+            print(f"[LOUDNESS] {e}")
+
+
+class TrackPreloader(QThread):
+    """Chuẩn bị bài kế tiếp trong luồng nền: giải mã (m4a), đọc trước file, dựng seek index"""
+    
+    track_ready = pyqtSignal(str, str)  # path, đường dẫn pygame phát được
+    
+    def __init__(self, path: str, prepare, build_index, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.prepare = prepare
+        self.build_index = build_index
+    
+    def run(self):
+        try:
+            playable = preload_track(self.path, self.prepare, self.build_index,
+                                     self.isInterruptionRequested)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Error preloading: {e}")
+            return
+        if playable is not None:
+            self.track_ready.emit(self.path, playable)
+
+
+class MusicPlayer(QMainWindow, PlayerCore):
+    """Main Music Player Window (trạng thái + điều khiển phát nằm trong PlayerCore)"""
+    
+    def __init__(self, script_dir: Path = None):
+        super().__init__(script_dir=script_dir or Path(__file__).parent.absolute())
+        
+        self.preloader = None
+        self.search_index = SearchIndex()
+        
+        # Đo loudness nền; đổi gain đúng lúc chuyển sang bài queue
+        self.analyzer = None
+        self.analysis_pending = False
+        self.gain_timer = QTimer(self)
+        self.gain_timer.setSingleShot(True)
+        self.gain_timer.timeout.connect(self.apply_queued_gain)
+        
+        # Quét nền + theo dõi thư mục (bài mới tải xong tự hiện trong danh sách)
+        self.scanner = None
+        self.refresh_pending = False
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_folder_changed)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(WATCH_DEBOUNCE_MS)
+        self.refresh_timer.timeout.connect(self.refresh_folder)
         
         # Setup UI
         self.setup_ui()
@@ -122,11 +194,23 @@ class MusicPlayer(QMainWindow):
         folder_layout.addWidget(btn_browse)
         layout.addLayout(folder_layout)
         
+        # ===== Search =====
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("🔍 Tìm bài (gõ không dấu cũng được, Enter để phát)")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.setFont(QFont("Segoe UI", 11))
+        self.search_box.textChanged.connect(self.filter_playlist)
+        self.search_box.returnPressed.connect(self.play_first_result)
+        layout.addWidget(self.search_box)
+        
         # ===== Playlist =====
-        self.playlist_widget = QListWidget()
-        self.playlist_widget.setFont(QFont("Segoe UI", 11))
-        self.playlist_widget.itemDoubleClicked.connect(self.play_selected)
-        layout.addWidget(self.playlist_widget, 1)
+        # Model/view: chỉ vẽ các dòng đang hiển thị, dòng cao cố định (thư viện hàng chục nghìn bài)
+        self.playlist_model = PlaylistModel(self)
+        self.playlist_view = PlaylistView()
+        self.playlist_view.setModel(self.playlist_model)
+        self.playlist_view.setFont(QFont("Segoe UI", 11))
+        self.playlist_view.doubleClicked.connect(self.play_selected)
+        layout.addWidget(self.playlist_view, 1)
         
         # ===== Now Playing =====
         now_playing_frame = QFrame()
@@ -246,20 +330,29 @@ class MusicPlayer(QMainWindow):
                 background-color: #e94560;
                 border-color: #e94560;
             }
-            QListWidget {
+            QLineEdit {
+                background-color: #16213e;
+                border: 2px solid #0f3460;
+                border-radius: 8px;
+                padding: 8px;
+            }
+            QLineEdit:focus {
+                border-color: #e94560;
+            }
+            QTableView {
                 background-color: #16213e;
                 border: 2px solid #0f3460;
                 border-radius: 8px;
                 padding: 5px;
             }
-            QListWidget::item {
+            QTableView::item {
                 padding: 8px;
                 border-radius: 4px;
             }
-            QListWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #e94560;
             }
-            QListWidget::item:hover {
+            QTableView::item:hover {
                 background-color: #0f3460;
             }
             QSlider::groove:horizontal {
@@ -290,263 +383,256 @@ class MusicPlayer(QMainWindow):
         """)
     
     def load_music_folder(self):
-        """Load nhạc từ thư mục"""
-        self.playlist = []
-        self.playlist_widget.clear()
-        
+        """Load nhạc từ thư mục (quét nền, danh sách hiện dần theo từng đợt)"""
         if not self.music_folder.exists():
             self.music_folder.mkdir(parents=True, exist_ok=True)
         
-        mp3_files = sorted(self.music_folder.glob("*.mp3"))
+        self.stop_scan()
+        self.set_tracks([])
+        self.search_index.clear()
+        
+        # Theo dõi thư mục mới
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.watcher.addPath(str(self.music_folder))
+        self.refresh_pending = False
+        
+        self.folder_label.setText(f"📁 {self.music_folder} (đang quét...)")
+        self.scanner = FolderScanner(self.library, self.music_folder, self.search_index, self)
+        self.scanner.batch_ready.connect(self.on_scan_batch)
+        self.scanner.finished.connect(self.on_scan_finished)
+        self.scanner.start()
+    
+    def stop_scan(self):
+        """Dừng lượt quét đang chạy (nếu có)"""
+        if self.scanner is not None:
+            self.scanner.requestInterruption()
+            self.scanner.wait()
+            self.scanner = None
+    
+    def on_scan_batch(self, paths: list):
+        """Nhận 1 đợt kết quả quét"""
+        if self.sender() is not self.scanner:
+            return
+        self.playlist_model.append_tracks(paths)
+        if self.search_box.text():
+            self.filter_playlist()
+        self.folder_label.setText(f"📁 {self.music_folder} ({len(self.playlist)} bài, đang quét...)")
+    
+    def on_scan_finished(self):
+        """Quét xong"""
+        if self.sender() is not self.scanner:
+            return
+        self.folder_label.setText(f"📁 {self.music_folder} ({len(self.playlist)} bài)")
+        self.playlist_ready()
+        self.start_analysis()
         
-        for f in mp3_files:
-            self.playlist.append(str(f))
-            # Hiển thị tên đẹp hơn
-            display_name = f.stem
-            item = QListWidgetItem(f"🎵 {display_name}")
-            self.playlist_widget.addItem(item)
+        # Thay đổi xảy ra trong lúc quét
+        if self.refresh_pending:
+            self.refresh_folder()
+    
+    def on_folder_changed(self, path: str):
+        """Thư mục thay đổi (thêm/xóa/đổi tên file) - gom lại rồi cập nhật 1 lần"""
+        self.refresh_timer.start()
+    
+    def refresh_folder(self):
+        """Cập nhật danh sách theo thay đổi của thư mục, không quét lại toàn bộ"""
+        if self.scanner is not None and self.scanner.isRunning():
+            self.refresh_pending = True
+            return
+        self.refresh_pending = False
+        try:
+            added, removed = self.library.refresh(self.music_folder, set(self.playlist))
+        except OSError as e:
+            print(f"Error refreshing folder: {e}")
+            return
+        if added or removed:
+            self.apply_folder_changes([path for path, entry in added], removed)
+    
+    def apply_folder_changes(self, added: list, removed: list):
+        """Áp thay đổi vào danh sách + chỉ mục tìm kiếm, đo loudness bài mới"""
+        super().apply_folder_changes(added, removed)
+        for path in removed:
+            self.search_index.remove(path)
+        self.search_index.add_many((path, track_text(path, self.library.get(path))) for path in added)
+        if self.search_box.text():
+            self.filter_playlist()
         
         self.folder_label.setText(f"📁 {self.music_folder} ({len(self.playlist)} bài)")
-        
-        # Reset shuffle remaining
-        self.shuffle_remaining = list(range(len(self.playlist)))
-        random.shuffle(self.shuffle_remaining)
+        if added:
+            self.start_analysis()
+    
+    def start_analysis(self):
+        """Đo loudness các bài chưa đo (nền); đang đo thì đo tiếp sau lượt hiện tại"""
+        if not NORMALIZE_LOUDNESS:
+            return
+        if self.analyzer is not None and self.analyzer.isRunning():
+            self.analysis_pending = True
+            return
+        self.analysis_pending = False
+        self.analyzer = LoudnessAnalyzer(list(self.playlist), self.loudness, self)
+        self.analyzer.track_measured.connect(self.on_track_measured)
+        self.analyzer.finished.connect(self.on_analysis_finished)
+        self.analyzer.start()
+    
+    def stop_analysis(self):
+        """Dừng đo loudness (chờ các bài đang đo dở)"""
+        if self.analyzer is not None:
+            self.analyzer.requestInterruption()
+            self.analyzer.wait()
+            self.analyzer = None
+    
+    def on_track_measured(self, path: str):
+        """Bài vừa đo xong đang phát -> áp gain ngay"""
+        if path == self.current_path():
+            self.set_track_gain(path)
+    
+    def on_analysis_finished(self):
+        if self.sender() is not self.analyzer:
+            return
+        if self.analysis_pending:
+            self.start_analysis()
     
     def browse_folder(self):
         """Chọn thư mục nhạc"""
         folder = QFileDialog.getExistingDirectory(self, "Chọn thư mục nhạc", str(self.music_folder))
         if folder:
             self.music_folder = Path(folder)
+            self.saved_shuffle = None
             self.load_music_folder()
             self.save_cache()
     
-    def play_selected(self, item):
+    def play_selected(self, index):
         """Phát bài được chọn"""
-        idx = self.playlist_widget.row(item)
-        self.play_track(idx)
+        self.play_track(self.playlist_model.playlist_row(index.row()))
     
-    def get_track_duration(self, filepath: str) -> int:
-        """Lấy duration của file MP3 (seconds)"""
-        try:
-            if MP3:
-                audio = MP3(filepath)
-                return int(audio.info.length)
-        except Exception:
-            pass
-        return 0
-    
-    def play_track(self, index: int):
-        """Phát một bài hát"""
-        if not self.playlist or index < 0 or index >= len(self.playlist):
-            return
-        
-        self.current_index = index
-        track_path = self.playlist[index]
-        
-        try:
-            pygame.mixer.music.load(track_path)
-            pygame.mixer.music.play()
-            self.is_playing = True
-            self.is_paused = False
-            self.btn_play.setText("⏸")
-            
-            # Lấy duration
-            self.track_duration = self.get_track_duration(track_path)
-            self.track_start_time = 0
-            
-            # Cập nhật UI duration
-            if self.track_duration > 0:
-                mins, secs = divmod(self.track_duration, 60)
-                self.time_total.setText(f"{mins}:{secs:02d}")
-                self.progress_slider.setRange(0, self.track_duration)
-                self.progress_slider.setValue(0)
-            else:
-                self.time_total.setText("--:--")
-            
-            self.time_current.setText("0:00")
-            
-            # Update UI
-            track_name = Path(track_path).stem
-            self.now_playing_label.setText(f"🎵 {track_name}")
-            self.playlist_widget.setCurrentRow(index)
-            
-            # Update shuffle history
-            if self.play_mode == "shuffle_no_repeat":
-                if index in self.shuffle_remaining:
-                    self.shuffle_remaining.remove(index)
-                self.shuffle_history.append(index)
-            
-            self.save_cache()
-            
-        except Exception as e:
-            print(f"Error playing: {e}")
+    def filter_playlist(self, text: str = None):
+        """Lọc danh sách theo ô tìm kiếm (tra chỉ mục tiền tố, không dựng lại danh sách)"""
+        if text is None:
+            text = self.search_box.text()
+        self.playlist_model.set_filter(self.search_index.search(text))
+        self.select_current()
+    
+    def play_first_result(self):
+        """Enter trong ô tìm kiếm: phát bài đầu tiên của kết quả"""
+        if self.playlist_model.rowCount() > 0:
+            self.play_track(self.playlist_model.playlist_row(0))
+    
+    def select_current(self):
+        """Chọn + cuộn tới bài đang phát (nếu không bị lọc ẩn)"""
+        row = self.playlist_model.view_row(self.current_index)
+        if row >= 0:
+            index = self.playlist_model.index(row)
+            self.playlist_view.setCurrentIndex(index)
+            self.playlist_view.scrollTo(index)
+    
+    # ==================== Hook của PlayerCore ====================
+    
+    def row_of(self, path: str) -> int:
+        return self.playlist_model.row_of(path)
     
-    def toggle_play(self):
-        """Play/Pause"""
-        if not self.playlist:
+    def set_tracks(self, paths: list):
+        self.playlist = paths
+        self.playlist_model.set_tracks(paths)
+    
+    def update_tracks(self, added: list, removed: list):
+        self.playlist_model.update_tracks(added, removed)
+    
+    def start_preload(self, path: str):
+        """Chuẩn bị bài kế tiếp bằng QThread (kết quả về luồng GUI qua signal)"""
+        if self.preloader is not None:
+            self.preloader.requestInterruption()
+        self.preloader = TrackPreloader(path, self.get_playable_path, self.get_seek_index, self)
+        self.preloader.track_ready.connect(self.on_track_ready)
+        self.preloader.finished.connect(self.on_preload_finished)
+        self.preloader.start()
+    
+    def stop_preload(self):
+        """Dừng luồng chuẩn bị bài kế tiếp (khi đóng app)"""
+        if self.preloader is not None:
+            self.preloader.requestInterruption()
+            self.preloader.wait()
+            self.preloader = None
+    
+    def on_preload_finished(self):
+        """Luồng chuẩn bị kết thúc (xong hoặc bị thay bằng bài khác)"""
+        preloader = self.sender()
+        if preloader is self.preloader:
+            self.preloader = None
+        preloader.deleteLater()
+    
+    def on_track_ready(self, path: str, playable: str):
+        if self.sender() is not self.preloader:
             return
-        
-        if not self.is_playing:
-            if self.is_paused:
-                pygame.mixer.music.unpause()
-                self.is_paused = False
-            else:
-                self.play_track(self.current_index)
-            self.is_playing = True
-            self.btn_play.setText("⏸")
+        super().on_track_ready(path, playable)
+    
+    def schedule_queued_gain(self, delay: float):
+        if not self.gain_timer.isActive():
+            self.gain_timer.start(max(int(delay * 1000), 0))
+    
+    def on_track_changed(self):
+        """Cập nhật UI khi đổi bài"""
+        self.btn_play.setText("⏸")
+        
+        # Cập nhật UI duration
+        if self.track_duration > 0:
+            mins, secs = divmod(self.track_duration, 60)
+            self.time_total.setText(f"{mins}:{secs:02d}")
+            self.progress_slider.setRange(0, self.track_duration)
+            self.progress_slider.setValue(0)
         else:
-            pygame.mixer.music.pause()
-            self.is_playing = False
-            self.is_paused = True
-            self.btn_play.setText("▶")
-    
-    def play_next(self):
-        """Phát bài tiếp theo"""
-        if not self.playlist:
-            return
-        
-        if self.play_mode == "sequential":
-            next_idx = (self.current_index + 1) % len(self.playlist)
+            self.time_total.setText("--:--")
         
-        elif self.play_mode == "shuffle":
-            next_idx = random.randint(0, len(self.playlist) - 1)
-        
-        elif self.play_mode == "shuffle_no_repeat":
-            if not self.shuffle_remaining:
-                # Reset khi hết vòng
-                self.shuffle_remaining = list(range(len(self.playlist)))
-                random.shuffle(self.shuffle_remaining)
-                self.shuffle_history = []
-            next_idx = self.shuffle_remaining[0]
-        
-        else:
-            next_idx = (self.current_index + 1) % len(self.playlist)
+        self.time_current.setText("0:00")
         
-        self.play_track(next_idx)
+        # Update UI
+        track_name = Path(self.current_path()).stem
+        self.now_playing_label.setText(f"🎵 {track_name}")
+        self.select_current()
     
-    def play_previous(self):
-        """Phát bài trước"""
-        if not self.playlist:
-            return
-        
-        if self.play_mode == "shuffle_no_repeat" and self.shuffle_history:
-            # Quay lại bài trước trong history
-            if len(self.shuffle_history) > 1:
-                self.shuffle_history.pop()  # Bỏ bài hiện tại
-                prev_idx = self.shuffle_history[-1]
-            else:
-                prev_idx = self.shuffle_history[0]
-        else:
-            prev_idx = (self.current_index - 1) % len(self.playlist)
-        
-        self.play_track(prev_idx)
+    def on_state_changed(self):
+        self.btn_play.setText("⏸" if self.is_playing else "▶")
     
     def set_play_mode(self, mode: str):
         """Đổi chế độ phát"""
-        self.play_mode = mode
-        
         # Update button states
         self.btn_sequential.setChecked(mode == "sequential")
         self.btn_shuffle.setChecked(mode == "shuffle")
         self.btn_shuffle_no_repeat.setChecked(mode == "shuffle_no_repeat")
-        
-        # Reset shuffle state khi đổi mode
-        if mode == "shuffle_no_repeat":
-            self.shuffle_remaining = list(range(len(self.playlist)))
-            random.shuffle(self.shuffle_remaining)
-            self.shuffle_history = [self.current_index] if self.playlist else []
-        
-        self.save_cache()
+        super().set_play_mode(mode)
     
     def change_volume(self, value: int):
         """Thay đổi âm lượng"""
-        pygame.mixer.music.set_volume(value / 100)
+        self.volume = value
+        self.apply_volume()
     
     def seek_position(self):
         """Seek đến vị trí khi user kéo slider"""
-        if (self.is_playing or self.is_paused) and self.track_duration > 0:
-            seek_pos = self.progress_slider.value()
-            try:
-                # Pygame seek bằng cách play lại từ vị trí mới
-                pygame.mixer.music.play(start=seek_pos)
-                self.track_start_time = seek_pos
-                if self.is_paused:
-                    pygame.mixer.music.pause()
-            except Exception as e:
-                print(f"Seek error: {e}")
+        self.seek(self.progress_slider.value())
     
     def update_progress(self):
         """Cập nhật progress bar mỗi giây"""
-        if self.is_playing and pygame.mixer.music.get_busy():
-            # Tính thời gian hiện tại
-            pos_ms = pygame.mixer.music.get_pos()  # milliseconds từ lúc play
-            if pos_ms >= 0:
-                current_pos = self.track_start_time + (pos_ms // 1000)
-                
-                # Cập nhật time label
-                mins, secs = divmod(current_pos, 60)
-                self.time_current.setText(f"{mins}:{secs:02d}")
-                
-                # Cập nhật slider (không trigger signal)
-                if not self.progress_slider.isSliderDown():
-                    self.progress_slider.setValue(current_pos)
-        
-        # Auto play next khi hết bài
-        if self.is_playing and not pygame.mixer.music.get_busy() and not self.is_paused:
-            self.play_next()
-    
-    def save_cache(self):
-        """Lưu trạng thái"""
-        cache = {
-            "music_folder": str(self.music_folder),
-            "current_index": self.current_index,
-            "play_mode": self.play_mode,
-            "shuffle_history": self.shuffle_history,
-            "shuffle_remaining": self.shuffle_remaining,
-            "volume": self.volume_slider.value()
-        }
-        
-        try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache, f, indent=2)
-        except Exception as e:
-            print(f"Error saving cache: {e}")
+        current_pos = self.poll(self.timer.interval())
+        if current_pos is not None:
+            # Cập nhật time label
+            mins, secs = divmod(current_pos, 60)
+            self.time_current.setText(f"{mins}:{secs:02d}")
+            
+            # Cập nhật slider (không trigger signal)
+            if not self.progress_slider.isSliderDown():
+                self.progress_slider.setValue(current_pos)
     
     def load_cache(self):
-        """Load trạng thái đã lưu"""
-        if not self.cache_file.exists():
-            return
-        
-        try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-            
-            if "music_folder" in cache:
-                self.music_folder = Path(cache["music_folder"])
-            
-            if "current_index" in cache:
-                self.current_index = cache["current_index"]
-            
-            if "play_mode" in cache:
-                self.set_play_mode(cache["play_mode"])
-            
-            if "shuffle_history" in cache:
-                self.shuffle_history = cache["shuffle_history"]
-            
-            if "shuffle_remaining" in cache:
-                self.shuffle_remaining = cache["shuffle_remaining"]
-            
-            if "volume" in cache:
-                self.volume_slider.setValue(cache["volume"])
-                pygame.mixer.music.set_volume(cache["volume"] / 100)
-            
-        except Exception as e:
-            print(f"Error loading cache: {e}")
+        """Load trạng thái đã lưu + cập nhật thanh âm lượng"""
+        super().load_cache()
+        self.volume_slider.setValue(self.volume)
     
     def closeEvent(self, event):
         """Lưu cache khi đóng app"""
-        self.save_cache()
-        pygame.mixer.quit()
+        self.stop_scan()
+        self.stop_preload()
+        self.stop_analysis()
+        self.shutdown()
         event.accept()
 
 
@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Player Core
+Phần lõi của player không phụ thuộc Qt: danh sách phát, chế độ phát, chuyển bài liền mạch,
+seek, cân bằng âm lượng và lưu trạng thái. Dùng chung cho app Qt (music_player.py)
+và chế độ chạy nền không giao diện (player_daemon.py)
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import time
+import bisect
+import random
+import hashlib
+import threading
+import subprocess
+import tempfile
+from pathlib import Path
+from collections import deque
+
+import pygame
+
+from library_index import LibraryIndex, LIBRARY_INDEX_NAME
+from loudness import LoudnessCache, LOUDNESS_CACHE_NAME
+from mp3_index import SeekIndexCache, FrameSlice, SEEK_INDEX_DIR
+from player_state import StateStore
+from shuffle_engine import ShuffleEngine
+
+
+# Định dạng pygame (SDL_mixer) phát trực tiếp; còn lại (m4a/AAC) giải mã sang WAV tạm
+PYGAME_NATIVE_EXTENSIONS = (".mp3", ".ogg", ".opus", ".wav", ".flac")
+
+PLAY_MODES = ("sequential", "shuffle", "shuffle_no_repeat")
+
+# Đọc trước bài kế tiếp theo từng khối (byte) để file nằm sẵn trong cache của OS
+PRELOAD_CHUNK = 1 << 20
+
+# Số lần chuyển bài gần nhất dùng để tính độ trễ trung bình
+TRANSITION_SAMPLES = 50
+
+# Tự cân bằng âm lượng theo loudness đã đo (False = phát nguyên mức của file)
+NORMALIZE_LOUDNESS = True
+
+
+def preload_track(path: str, prepare, build_index, cancelled=lambda: False) -> str:
+    """
+    Chuẩn bị 1 bài: giải mã (m4a), đọc trước file vào cache của OS, dựng seek index
+
+    Returns:
+        Đường dẫn pygame phát được, None nếu bị hủy giữa chừng
+    """
+    playable = prepare(path)
+    with open(playable, 'rb') as f:
+        while f.read(PRELOAD_CHUNK):
+            if cancelled():
+                return None
+    build_index(path)
+    return playable
+
+
+class PlayerCore:
+    """
+    Trạng thái + điều khiển phát nhạc (pygame), không phụ thuộc Qt
+
+    Lớp con (GUI / daemon) gọi `poll()` định kỳ và có thể ghi đè các hook:
+    `on_track_changed`, `on_state_changed`, `row_of`, `update_tracks`,
+    `start_preload`, `schedule_queued_gain`. Mặc định dùng threading.
+    """
+
+    def __init__(self, script_dir: Path):
+        # Khởi tạo pygame mixer
+        pygame.mixer.init()
+
+        # Biến state
+        self.playlist = []
+        self._rows = {}  # path -> vị trí trong playlist
+        self.current_index = 0
+        self.is_playing = False
+        self.is_paused = False
+        self.play_mode = "sequential"  # sequential, shuffle, shuffle_no_repeat
+        self.shuffle = ShuffleEngine()
+        self.saved_shuffle = None
+        self.volume = 70
+        self.lock = threading.RLock()  # luồng nền (preload, hẹn giờ) gọi lại vào core
+
+        # Bài kế tiếp: tính trước, chuẩn bị trong nền rồi queue cho pygame
+        self.next_path = None
+        self.queued_path = None
+        self.last_poll = (0.0, 0)  # (perf_counter, get_pos) lần poll gần nhất
+        self.transitions = deque(maxlen=TRANSITION_SAMPLES)  # khoảng lặng khi chuyển bài (ms)
+
+        # Duration tracking
+        self.track_duration = 0  # seconds
+        self.track_length = 0.0  # seconds (chính xác, để đo khoảng lặng khi chuyển bài)
+        self.track_start_time = 0  # thời điểm bắt đầu phát
+
+        # Đường dẫn cache
+        self.script_dir = Path(script_dir)
+        self.cache_file = self.script_dir / "player_cache.json"
+        self.state = StateStore(self.cache_file)
+        self.music_folder = self.script_dir / "downloads"
+
+        # Index metadata (duration, tags, ...) - chỉ parse file mới/đã đổi
+        self.library = LibraryIndex(self.script_dir / LIBRARY_INDEX_NAME)
+        self.seek_cache = SeekIndexCache(self.script_dir / SEEK_INDEX_DIR)
+        self.seek_file = None  # file MP3 đang phát từ 1 frame giữa bài (sau khi seek)
+        # WAV tạm đã giải mã trong phiên này {bài gốc: WAV} -> xóa khi không còn phát / chờ phát
+        self.decoded = {}
+
+        # Loudness từng bài (cache theo size + mtime, dùng chung với downloader) -> gain khi phát
+        self.loudness = LoudnessCache(self.script_dir / LOUDNESS_CACHE_NAME)
+        self.track_gain = 1.0
+        self._gain_timer = None
+
+    # ==================== Hook cho lớp con ====================
+
+    def on_track_changed(self):
+        """Bài đang phát vừa đổi (GUI cập nhật nhãn, thanh thời gian...)"""
+
+    def on_state_changed(self):
+        """Phát / tạm dừng vừa đổi"""
+
+    def row_of(self, path: str) -> int:
+        """Vị trí của path trong danh sách, -1 nếu không có"""
+        return self._rows.get(path, -1)
+
+    def set_tracks(self, paths: list):
+        """Thay toàn bộ danh sách (không copy list)"""
+        self.playlist = paths
+        self._rows = {path: row for row, path in enumerate(paths)}
+
+    def update_tracks(self, added: list, removed: list):
+        """Bỏ các bài `removed`, chèn `added` đúng thứ tự tên (sửa list tại chỗ)"""
+        for row in sorted((self._rows[p] for p in removed if p in self._rows), reverse=True):
+            del self.playlist[row]
+        for path in sorted(added):
+            self.playlist.insert(bisect.bisect_left(self.playlist, path), path)
+        self._rows = {path: row for row, path in enumerate(self.playlist)}
+
+    def start_preload(self, path: str):
+        """Chuẩn bị bài kế tiếp trong luồng nền, xong thì on_track_ready"""
+        threading.Thread(target=self._preload, args=(path,), daemon=True).start()
+
+    def _preload(self, path: str):
+        try:
+            playable = preload_track(path, self.get_playable_path, self.get_seek_index,
+                                     lambda: path != self.next_path)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Error preloading: {e}")
+            return
+        if playable is not None:
+            with self.lock:
+                self.on_track_ready(path, playable)
+
+    def schedule_queued_gain(self, delay: float):
+        """Hẹn đổi gain sau `delay` giây (lúc pygame chuyển sang bài queue)"""
+        if self._gain_timer is not None and self._gain_timer.is_alive():
+            return
+        self._gain_timer = threading.Timer(max(delay, 0.0), self._queued_gain)
+        self._gain_timer.daemon = True
+        self._gain_timer.start()
+
+    def _queued_gain(self):
+        with self.lock:
+            self.apply_queued_gain()
+
+    # ==================== Danh sách ====================
+
+    def current_path(self) -> str:
+        """Bài đang phát (None nếu danh sách trống)"""
+        if 0 <= self.current_index < len(self.playlist):
+            return self.playlist[self.current_index]
+        return None
+
+    def playlist_ready(self):
+        """Quét thư mục xong: khôi phục vòng shuffle đã lưu (seed + cursor), không có thì xáo vòng mới"""
+        engine = None
+        if self.saved_shuffle:
+            engine = ShuffleEngine.from_state(self.saved_shuffle, self.playlist)
+        if engine is None:
+            self.shuffle.reset(self.playlist)
+        else:
+            self.shuffle = engine
+        self.saved_shuffle = None
+        self.seek_cache.prune({entry['id'] for entry in self.library.entries.values()})
+        if self.is_playing or self.is_paused:
+            self.next_path = None
+            self.prepare_next()
+
+    def apply_folder_changes(self, added: list, removed: list):
+        """Áp thay đổi vào danh sách, giữ đúng bài đang phát và trạng thái shuffle"""
+        current_path = self.current_path()
+
+        self.update_tracks(added, removed)
+
+        if current_path is not None:
+            row = self.row_of(current_path)
+            self.current_index = row if row >= 0 else min(self.current_index,
+                                                          max(len(self.playlist) - 1, 0))
+        # Vòng shuffle theo path nên không phải xáo lại: bài mới vào phần chưa phát
+        for path in removed:
+            self.shuffle.remove(path)
+        for path in added:
+            self.shuffle.add(path)
+        # Bài kế tiếp có thể đã bị xóa hoặc đổi (bài liền sau / vòng shuffle)
+        if self.play_mode != "shuffle" or self.row_of(self.next_path) < 0:
+            self.prepare_next()
+        self.save_cache()
+
+    # ==================== File ====================
+
+    def get_track_duration(self, filepath: str) -> float:
+        """Lấy duration của file audio (seconds) từ library index"""
+        entry = self.library.get(filepath)
+        if entry is None:
+            try:
+                entry = self.library.ensure(filepath)
+                self.library.save()
+            except OSError:
+                return 0.0
+        return float(entry['duration'])
+
+    def get_seek_index(self, filepath: str):
+        """Seek index của bài (chỉ MP3, lưu theo track ID cạnh library index)"""
+        entry = self.library.get(filepath)
+        key = entry['id'] if entry else hashlib.md5(filepath.encode('utf-8')).hexdigest()
+        try:
+            return self.seek_cache.get(filepath, key)
+        except (OSError, ValueError) as e:
+            print(f"Error indexing: {e}")
+            return None
+
+    def close_seek_file(self):
+        """Đóng file của lần seek trước (pygame đã chuyển sang nguồn khác)"""
+        if self.seek_file is not None:
+            self.seek_file.close()
+            self.seek_file = None
+
+    def get_playable_path(self, filepath: str) -> str:
+        """Đường dẫn pygame phát được (m4a -> giải mã 1 lần sang WAV tạm)"""
+        if filepath.lower().endswith(PYGAME_NATIVE_EXTENSIONS):
+            return filepath
+
+        key = hashlib.md5(filepath.encode('utf-8')).hexdigest()
+        decoded = Path(tempfile.gettempdir()) / f"mp3player_{key}.wav"
+        self.decoded[filepath] = str(decoded)
+        if decoded.exists():
+            return str(decoded)
+
+        ffmpeg = self.script_dir / "ffmpeg.exe"
+        ffmpeg_bin = str(ffmpeg) if ffmpeg.exists() else "ffmpeg"
+        # Tên tạm riêng: luồng preload và luồng chính có thể giải mã cùng lúc
+        fd, temp = tempfile.mkstemp(prefix=decoded.stem, suffix=".tmp", dir=decoded.parent)
+        os.close(fd)
+        subprocess.run([
+            ffmpeg_bin, '-y', '-nostdin', '-loglevel', 'error',
+            '-i', filepath, '-vn', '-f', 'wav', temp,
+        ], capture_output=True, check=True)
+        os.replace(temp, decoded)
+        return str(decoded)
+
+    def evict_decoded(self, keep=()):
+        """Xóa WAV tạm của các bài không nằm trong `keep` (bài đang phát / bài kế tiếp)"""
+        for path, decoded in list(self.decoded.items()):
+            if path in keep:
+                continue
+            try:
+                os.remove(decoded)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue  # Windows: file vẫn đang mở -> xóa ở lần sau
+            self.decoded.pop(path, None)
+
+    # ==================== Phát nhạc ====================
+
+    def play_track(self, index: int):
+        """Phát một bài hát"""
+        if not self.playlist or index < 0 or index >= len(self.playlist):
+            return
+
+        try:
+            # load() bỏ luôn bài đã queue -> chuẩn bị lại sau khi phát
+            pygame.mixer.music.load(self.get_playable_path(self.playlist[index]))
+            pygame.mixer.music.play()
+            self.close_seek_file()
+            self.queued_path = None
+            self.next_path = None
+            self.track_started(index)
+        except Exception as e:
+            print(f"Error playing: {e}")
+
+    def track_started(self, index: int):
+        """Cập nhật trạng thái khi 1 bài bắt đầu phát (load tay hoặc pygame tự chuyển bài queue)"""
+        self.current_index = index
+        track_path = self.playlist[index]
+
+        try:
+            self.is_playing = True
+            self.is_paused = False
+            self.last_poll = (time.perf_counter(), 0)
+
+            # Lấy duration
+            self.track_length = self.get_track_duration(track_path)
+            self.track_duration = int(self.track_length)
+            self.track_start_time = 0
+            self.set_track_gain(track_path)
+
+            # Update shuffle history
+            if self.play_mode == "shuffle_no_repeat":
+                self.shuffle.take(track_path)
+
+            self.on_track_changed()
+            self.save_cache()
+            self.prepare_next()
+            self.evict_decoded({track_path, self.next_path, self.queued_path})
+            # Seek index của bài đang phát (đã có nếu bài này được preload)
+            threading.Thread(target=self.get_seek_index, args=(track_path,), daemon=True).start()
+
+        except Exception as e:
+            print(f"Error playing: {e}")
+
+    def next_track_path(self) -> str:
+        """Bài phát sau bài hiện tại theo chế độ phát (None nếu danh sách trống)"""
+        if not self.playlist:
+            return None
+
+        if self.play_mode == "shuffle":
+            return random.choice(self.playlist)
+
+        if self.play_mode == "shuffle_no_repeat":
+            next_path = self.shuffle.peek()
+            if next_path is None or self.row_of(next_path) < 0:
+                # Reset khi hết vòng (hoặc vòng cũ chưa khớp danh sách đang quét)
+                self.shuffle.reset(self.playlist)
+                next_path = self.shuffle.peek()
+            return next_path
+
+        return self.playlist[(self.current_index + 1) % len(self.playlist)]
+
+    def prepare_next(self):
+        """Tính trước bài kế tiếp, giải mã/đọc trước trong nền rồi queue để chuyển bài liền mạch"""
+        next_path = self.next_track_path()
+        if next_path is None or next_path == self.next_path:
+            return
+        self.next_path = next_path
+        self.start_preload(next_path)
+
+    def on_track_ready(self, path: str, playable: str):
+        """Bài kế tiếp đã sẵn sàng -> queue, pygame tự phát ngay khi bài hiện tại hết"""
+        if path != self.next_path or not (self.is_playing or self.is_paused):
+            return
+        try:
+            pygame.mixer.music.queue(playable)
+            self.queued_path = path
+        except pygame.error as e:
+            print(f"Error queueing: {e}")
+
+    def on_queued_track(self, pos_ms: int):
+        """pygame đã tự chuyển sang bài queue (phát hiện khi get_pos quay về 0)"""
+        ended_at = self.expected_end()
+        index = self.row_of(self.queued_path)
+        self.close_seek_file()
+        self.queued_path = None
+        self.next_path = None
+        self.record_transition("queue", ended_at, time.perf_counter() - pos_ms / 1000)
+        if index >= 0:
+            self.track_started(index)
+
+    def expected_end(self) -> float:
+        """Thời điểm (perf_counter) bài hiện tại hết, ước từ lần poll cuối và duration"""
+        polled_at, pos_ms = self.last_poll
+        played = self.track_start_time + max(pos_ms, 0) / 1000
+        return polled_at + max(self.track_length - played, 0.0)
+
+    def record_transition(self, how: str, ended_at: float, started_at: float):
+        """Ghi lại khoảng lặng giữa 2 bài khi tự chuyển bài"""
+        gap_ms = max(started_at - ended_at, 0.0) * 1000
+        self.transitions.append(gap_ms)
+        avg = sum(self.transitions) / len(self.transitions)
+        print(f"[TRANSITION] {how}: {gap_ms:.0f} ms "
+              f"(trung bình {avg:.0f} ms / {len(self.transitions)} lần)")
+
+    def toggle_play(self):
+        """Play/Pause"""
+        if not self.playlist:
+            return
+
+        if not self.is_playing:
+            if self.is_paused:
+                pygame.mixer.music.unpause()
+                self.is_paused = False
+            else:
+                self.play_track(self.current_index)
+            self.is_playing = True
+        else:
+            pygame.mixer.music.pause()
+            self.is_playing = False
+            self.is_paused = True
+        self.on_state_changed()
+
+    def play_next(self):
+        """Phát bài tiếp theo"""
+        if not self.playlist:
+            return
+
+        # Bài đã tính trước (đã giải mã/đọc sẵn), không còn thì tính lại
+        next_path = self.next_path
+        if next_path is None or self.row_of(next_path) < 0:
+            next_path = self.next_track_path()
+
+        self.play_track(self.row_of(next_path))
+
+    def play_previous(self):
+        """Phát bài trước"""
+        if not self.playlist:
+            return
+
+        if self.play_mode == "shuffle_no_repeat" and self.shuffle.history:
+            # Quay lại bài trước trong history
+            prev_idx = self.row_of(self.shuffle.previous())
+        else:
+            prev_idx = (self.current_index - 1) % len(self.playlist)
+
+        self.play_track(prev_idx)
+
+    def set_play_mode(self, mode: str):
+        """Đổi chế độ phát"""
+        self.play_mode = mode
+
+        # Reset shuffle state khi đổi mode
+        if mode == "shuffle_no_repeat":
+            self.shuffle.reset(self.playlist)
+            if self.playlist:
+                self.shuffle.take(self.playlist[self.current_index])
+
+        # Bài kế tiếp đổi theo chế độ
+        self.next_path = None
+        self.prepare_next()
+        self.save_cache()
+
+    def seek(self, seconds: float):
+        """Phát từ vị trí `seconds` của bài hiện tại"""
+        if not (self.is_playing or self.is_paused) or self.track_duration <= 0:
+            return
+        track_path = self.playlist[self.current_index]
+        try:
+            index = self.get_seek_index(track_path)
+            if index is not None:
+                # MP3: phát từ đúng frame chứa vị trí seek (tra index, không lệch với VBR)
+                seconds, offset = index.locate(track_path, seconds)
+                seek_file = FrameSlice(track_path, offset)
+                pygame.mixer.music.load(seek_file, "mp3")
+                pygame.mixer.music.play()
+                self.close_seek_file()
+                self.seek_file = seek_file
+                # load() bỏ bài đã queue -> queue lại
+                self.queued_path = None
+                self.next_path = None
+                self.prepare_next()
+            else:
+                # Pygame seek bằng cách play lại từ vị trí mới
+                pygame.mixer.music.play(start=seconds)
+            self.track_start_time = seconds
+            self.last_poll = (time.perf_counter(), 0)
+            if self.is_paused:
+                pygame.mixer.music.pause()
+        except Exception as e:
+            print(f"Seek error: {e}")
+
+    def position(self) -> float:
+        """Vị trí đang phát trong bài (giây)"""
+        pos_ms = pygame.mixer.music.get_pos()
+        return self.track_start_time + max(pos_ms, 0) / 1000
+
+    def poll(self, interval_ms: int) -> int:
+        """
+        Gọi định kỳ mỗi `interval_ms`: phát hiện pygame tự chuyển sang bài queue,
+        hẹn đổi gain đúng lúc chuyển bài, tự phát bài tiếp khi hết bài
+
+        Returns:
+            Vị trí hiện tại (giây), None nếu không đang phát
+        """
+        current_pos = None
+        if self.is_playing and pygame.mixer.music.get_busy():
+            # Tính thời gian hiện tại
+            pos_ms = pygame.mixer.music.get_pos()  # milliseconds từ lúc play
+            if self.queued_path is not None and 0 <= pos_ms < self.last_poll[1]:
+                # get_pos quay về 0 -> pygame đã tự chuyển sang bài queue
+                self.on_queued_track(pos_ms)
+            self.last_poll = (time.perf_counter(), pos_ms)
+            if self.queued_path is not None:
+                remaining = self.expected_end() - time.perf_counter()
+                if remaining * 1000 < interval_ms:
+                    self.schedule_queued_gain(remaining)
+            if pos_ms >= 0:
+                current_pos = int(self.track_start_time + pos_ms / 1000)
+
+        # Auto play next khi hết bài
+        if self.is_playing and not pygame.mixer.music.get_busy() and not self.is_paused:
+            ended_at = self.expected_end()
+            self.play_next()
+            self.record_transition("reload", ended_at, time.perf_counter())
+        return current_pos
+
+    # ==================== Âm lượng ====================
+
+    def apply_volume(self):
+        """Âm lượng thực = âm lượng chọn x gain của bài (pygame không khuếch đại quá 1.0)"""
+        pygame.mixer.music.set_volume(min(self.volume / 100 * self.track_gain, 1.0))
+
+    def set_volume(self, volume: int):
+        """Đổi âm lượng (0-100)"""
+        self.volume = max(0, min(int(volume), 100))
+        self.apply_volume()
+        self.save_cache()
+
+    def set_track_gain(self, path: str):
+        """Gain theo loudness đã đo của bài (chưa đo = giữ nguyên mức)"""
+        gain_db = self.loudness.gain(path) if NORMALIZE_LOUDNESS else 0.0
+        self.track_gain = 10 ** (gain_db / 20)
+        self.apply_volume()
+
+    def apply_queued_gain(self):
+        """Đổi gain đúng lúc pygame chuyển sang bài queue (không chờ tới lần poll sau)"""
+        if self.queued_path is not None and self.is_playing:
+            self.set_track_gain(self.queued_path)
+
+    # ==================== Trạng thái ====================
+
+    def save_cache(self):
+        """Lưu trạng thái (ghi trễ, gom nhiều lần lưu thành 1 lần ghi)"""
+        if self.saved_shuffle is not None:
+            # Chưa quét xong thư mục -> giữ nguyên vòng shuffle đã lưu
+            shuffle = self.saved_shuffle
+        else:
+            shuffle = self.shuffle.state()
+        self.state.update(
+            music_folder=str(self.music_folder),
+            current_index=self.current_index,
+            play_mode=self.play_mode,
+            shuffle=shuffle,
+            volume=self.volume,
+        )
+
+    def load_cache(self):
+        """Load trạng thái đã lưu"""
+        cache = self.state.load()
+        # Cache cũ lưu cả danh sách chỉ số (history nay nằm trong "shuffle")
+        self.state.remove("shuffle_remaining", "shuffle_history")
+
+        try:
+            # Thứ tự shuffle dựng lại sau khi quét xong thư mục
+            if "shuffle" in cache:
+                self.saved_shuffle = cache["shuffle"]
+
+            if "music_folder" in cache:
+                self.music_folder = Path(cache["music_folder"])
+
+            if "current_index" in cache:
+                self.current_index = cache["current_index"]
+
+            if "play_mode" in cache:
+                self.set_play_mode(cache["play_mode"])
+
+            if "volume" in cache:
+                self.volume = cache["volume"]
+                self.apply_volume()
+
+        except Exception as e:
+            print(f"Error loading cache: {e}")
+
+    def shutdown(self):
+        """Lưu trạng thái, tắt mixer, xóa WAV tạm (khi đóng app / dừng daemon)"""
+        if self._gain_timer is not None:
+            self._gain_timer.cancel()
+        self.save_cache()
+        self.state.flush()
+        self.close_seek_file()
+        pygame.mixer.quit()
+        self.evict_decoded()
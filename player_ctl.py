@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Player Control
+Gửi lệnh tới player_daemon.py đang chạy qua HTTP cục bộ (chỉ dùng thư viện chuẩn,
+không import pygame/Qt nên mỗi lệnh chạy gần như tức thì - gắn vào phím tắt được)
+
+Dùng:  python player_ctl.py status | play [index] | pause | toggle | next | prev
+                           | seek GIÂY | mode TÊN | volume 0-100
+
+Mỗi lệnh gửi kèm token của lần chạy daemon hiện tại (file TOKEN_FILE_NAME cạnh
+player_cache.json) - trang web mở trong trình duyệt không đọc được file này nên
+không điều khiển được player.
+
+Author: Your Name
+License: MIT
+"""
+
+import io
+import sys
+import json
+import argparse
+from pathlib import Path
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+# ==================== CẤU HÌNH ====================
+# Địa chỉ HTTP điều khiển của daemon (chỉ nghe trên máy này)
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+
+# Lệnh có tham số -> tên tham số trong query string
+COMMAND_ARGS = {"play": "index", "seek": "pos", "mode": "name", "volume": "level"}
+COMMANDS = ("status", "play", "pause", "toggle", "next", "prev", "seek", "mode", "volume")
+REQUIRED_ARGS = ("seek", "mode", "volume")
+
+# Token ngẫu nhiên mỗi lần chạy daemon (ghi cạnh player_cache.json, xóa khi dừng),
+# gửi trong header TOKEN_HEADER - thiếu/sai token daemon trả 403
+TOKEN_FILE_NAME = "player_daemon.token"
+TOKEN_HEADER = "X-Player-Token"
+
+
+def read_token(folder: Path = None) -> str:
+    """
+    Token của daemon đang chạy (mặc định: thư mục chứa script)
+
+    Raises:
+        OSError: Không có file token (daemon chưa chạy)
+    """
+    folder = Path(folder) if folder is not None else Path(__file__).parent.absolute()
+    return (folder / TOKEN_FILE_NAME).read_text(encoding="utf-8").strip()
+
+
+def send_command(name: str, value: str = None, port: int = DAEMON_PORT,
+                 host: str = DAEMON_HOST, token: str = None) -> dict:
+    """Gửi lệnh tới daemon đang chạy, trả về trạng thái (JSON) hoặc {'error': ...}"""
+    url = f"http://{host}:{port}/{name}"
+    if value is not None:
+        url += "?" + urllib.parse.urlencode({COMMAND_ARGS[name]: value})
+    request = urllib.request.Request(url, method="GET" if name == "status" else "POST")
+    if token is None:
+        token = read_token()
+    request.add_header(TOKEN_HEADER, token)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        if e.headers.get_content_type() == "application/json":
+            return json.load(e)
+        return {'error': f"HTTP {e.code} {e.reason}"}
+
+
+def format_status(status: dict) -> str:
+    """1 dòng trạng thái cho console"""
+    if 'error' in status:
+        return f"[ERROR] {status['error']}"
+    icon = {"playing": "▶", "paused": "⏸", "stopped": "⏹"}[status['state']]
+    pos, total = int(status['position']), int(status['duration'])
+    return (f"[STATUS] {icon} {status['index']}: {status['title'] or '-'} "
+            f"({pos // 60}:{pos % 60:02d} / {total // 60}:{total % 60:02d}) "
+            f"| {status['mode']} | vol {status['volume']} | {status['tracks']} bài")
+
+
+def main():
+    # Fix encoding cho Windows console (chỉ khi chạy trực tiếp: player_daemon import module này)
+    if sys.platform == 'win32':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+    parser = argparse.ArgumentParser(description="Điều khiển player_daemon.py đang chạy")
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("value", nargs="?", help="index / giây / tên mode / âm lượng")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    parser.add_argument("--state-dir", type=Path,
+                        help="Thư mục chứa player_cache.json / token của daemon (mặc định: thư mục script)")
+    args = parser.parse_args()
+
+    if args.command in REQUIRED_ARGS and args.value is None:
+        parser.error(f"{args.command} cần tham số {COMMAND_ARGS[args.command]}")
+    try:
+        token = read_token(args.state_dir)
+    except OSError:
+        print(f"[ERROR] Daemon chưa chạy? (không đọc được {TOKEN_FILE_NAME})")
+        sys.exit(1)
+    try:
+        status = send_command(args.command, args.value, args.port, token=token)
+    except urllib.error.URLError as e:
+        print(f"[ERROR] Daemon chưa chạy? ({e.reason})")
+        sys.exit(1)
+    print(format_status(status))
+    if 'error' in status:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
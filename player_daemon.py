@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Player Daemon
+Phát nhạc chạy nền không giao diện (không import Qt): khởi động nhanh, ít RAM,
+điều khiển qua HTTP cục bộ (chỉ nghe 127.0.0.1). Dùng chung thư mục nhạc, trạng thái
+(player_cache.json), library index, seek index và loudness cache với music_player.py
+
+Chạy daemon:      python player_daemon.py [--dir THƯ_MỤC] [--port 8765]
+Điều khiển:       python player_ctl.py status | next | ...  (xem player_ctl.py)
+Hoặc HTTP:        GET /status, POST /play?index=3, /pause, /toggle, /next, /prev,
+                  /seek?pos=90, /mode?name=shuffle, /volume?level=50
+                  (header X-Player-Token: nội dung file player_daemon.token)
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import hmac
+import signal
+import secrets
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from loudness import analyze_files
+from player_core import PlayerCore, PLAY_MODES, NORMALIZE_LOUDNESS
+from player_ctl import (DAEMON_HOST, DAEMON_PORT, COMMAND_ARGS, REQUIRED_ARGS,
+                        TOKEN_FILE_NAME, TOKEN_HEADER)
+
+# Fix encoding cho Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+
+# ==================== CẤU HÌNH ====================
+# Địa chỉ HTTP điều khiển: DAEMON_HOST / DAEMON_PORT trong player_ctl.py
+
+# Chu kỳ kiểm tra trạng thái phát (ms): chuyển bài, tự phát bài tiếp
+POLL_MS = 250
+
+# Kiểm tra thư mục nhạc mỗi RESCAN_INTERVAL giây (bài mới tải xong tự vào danh sách)
+RESCAN_INTERVAL = 5
+
+# Số process đo loudness nền (để dành CPU cho việc phát nhạc)
+LOUDNESS_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+
+class PlayerDaemon(PlayerCore):
+    """Player không giao diện: quét thư mục đồng bộ, poll trong vòng lặp chính, lệnh qua HTTP"""
+
+    def __init__(self, script_dir: Path, music_folder: Path = None):
+        super().__init__(script_dir)
+        self.stop_event = threading.Event()
+        self.analyzer = None
+        self.analysis_pending = False
+
+        self.load_cache()
+        if music_folder is not None and Path(music_folder).absolute() != self.music_folder:
+            self.music_folder = Path(music_folder).absolute()
+            self.saved_shuffle = None
+        self.load_music_folder()
+
+    # ==================== Thư mục nhạc ====================
+
+    def load_music_folder(self):
+        """Quét thư mục (chỉ parse file mới/đã đổi) rồi dựng danh sách phát"""
+        self.music_folder.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        self.set_tracks([path for path, entry in self.library.scan(self.music_folder)])
+        self.playlist_ready()
+        print(f"[LIBRARY] {self.music_folder}: {len(self.playlist)} bài "
+              f"({time.perf_counter() - started:.2f}s)")
+        self.start_analysis()
+
+    def refresh_folder(self):
+        """Cập nhật danh sách theo thay đổi của thư mục, không quét lại toàn bộ"""
+        try:
+            added, removed = self.library.refresh(self.music_folder, set(self.playlist))
+        except OSError as e:
+            print(f"Error refreshing folder: {e}")
+            return
+        if added or removed:
+            self.apply_folder_changes([path for path, entry in added], removed)
+            print(f"[LIBRARY] +{len(added)} -{len(removed)} -> {len(self.playlist)} bài")
+            if added:
+                self.start_analysis()
+
+    # ==================== Loudness ====================
+
+    def start_analysis(self):
+        """Đo loudness các bài chưa đo (luồng nền); đang đo thì đo tiếp sau lượt hiện tại"""
+        if not NORMALIZE_LOUDNESS:
+            return
+        with self.lock:
+            if self.analyzer is not None:
+                self.analysis_pending = True
+                return
+            self.analysis_pending = False
+            self.analyzer = threading.Thread(target=self._analyze, name="loudness", daemon=True)
+            self.analyzer.start()
+
+    def _analyze(self):
+        while True:
+            with self.lock:
+                paths = list(self.playlist)
+            try:
+                for path, result, seconds in analyze_files(paths, self.loudness, LOUDNESS_WORKERS,
+                                                           stop=self.stop_event.is_set):
+                    # Bài vừa đo xong đang phát -> áp gain ngay
+                    if result is not None:
+                        with self.lock:
+                            if path == self.current_path():
+                                self.set_track_gain(path)
+            except (RuntimeError, OSError) as e:
+                print(f"[LOUDNESS] {e}")
+            # Có bài mới trong lúc đo -> đo tiếp ngay trong luồng này (chỉ bài chưa có trong cache)
+            with self.lock:
+                if not self.analysis_pending or self.stop_event.is_set():
+                    self.analyzer = None
+                    return
+                self.analysis_pending = False
+
+    # ==================== Lệnh ====================
+
+    def on_track_changed(self):
+        print(f"[PLAY] {self.current_index}: {Path(self.current_path()).stem}")
+
+    def status(self) -> dict:
+        """Trạng thái hiện tại (trả về cho /status và sau mỗi lệnh)"""
+        path = self.current_path()
+        if self.is_playing:
+            state = "playing"
+        elif self.is_paused:
+            state = "paused"
+        else:
+            state = "stopped"
+        return {
+            'state': state,
+            'index': self.current_index,
+            'track': path,
+            'title': Path(path).stem if path else None,
+            'position': round(self.position(), 1) if state != "stopped" else 0.0,
+            'duration': round(self.track_length, 1),
+            'mode': self.play_mode,
+            'volume': self.volume,
+            'gain': round(self.track_gain, 3),
+            'tracks': len(self.playlist),
+            'folder': str(self.music_folder),
+        }
+
+    def command(self, name: str, value: str = None) -> dict:
+        """
+        Thực hiện 1 lệnh điều khiển
+
+        Raises:
+            KeyError: Lệnh không tồn tại
+            ValueError: Tham số sai
+        """
+        if name in REQUIRED_ARGS and value is None:
+            raise ValueError(f"{name} cần tham số {COMMAND_ARGS[name]}")
+        with self.lock:
+            if name == "play":
+                if value is not None:
+                    index = int(value)
+                    if not 0 <= index < len(self.playlist):
+                        raise ValueError(f"index ngoài danh sách (0-{len(self.playlist) - 1})")
+                    self.play_track(index)
+                elif not self.is_playing:
+                    self.toggle_play()
+            elif name == "pause":
+                if self.is_playing:
+                    self.toggle_play()
+            elif name == "toggle":
+                self.toggle_play()
+            elif name == "next":
+                self.play_next()
+            elif name == "prev":
+                self.play_previous()
+            elif name == "seek":
+                self.seek(float(value))
+            elif name == "mode":
+                if value not in PLAY_MODES:
+                    raise ValueError(f"mode phải là 1 trong {', '.join(PLAY_MODES)}")
+                self.set_play_mode(value)
+            elif name == "volume":
+                self.set_volume(int(value))
+            elif name != "status":
+                raise KeyError(name)
+            return self.status()
+
+    # ==================== Chạy ====================
+
+    def serve(self, port: int = DAEMON_PORT, host: str = DAEMON_HOST):
+        """Chạy endpoint điều khiển trong luồng nền (chỉ nhận request có token của lần chạy này)"""
+        daemon = self
+        token = self.write_token()
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self, allow_commands: bool):
+                # Trang web trong trình duyệt không đọc được file token, và header riêng
+                # buộc trình duyệt hỏi CORS preflight trước (daemon không trả lời) -> 403
+                sent = self.headers.get(TOKEN_HEADER, "")
+                if not hmac.compare_digest(sent.encode("utf-8"), token.encode("utf-8")):
+                    self.send_error(403)
+                    return
+                url = urllib.parse.urlsplit(self.path)
+                name = url.path.strip("/")
+                query = urllib.parse.parse_qs(url.query)
+                value = query.get(COMMAND_ARGS.get(name, ""), [None])[0]
+                if name != "status" and not allow_commands:
+                    self.send_error(405)
+                    return
+                try:
+                    body, code = daemon.command(name, value), 200
+                except KeyError:
+                    self.send_error(404)
+                    return
+                except (TypeError, ValueError) as e:
+                    body, code = {'error': str(e)}, 400
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle(allow_commands=False)
+
+            def do_POST(self):
+                self._handle(allow_commands=True)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="player-http", daemon=True).start()
+        return server
+
+    def write_token(self) -> str:
+        """Tạo token mới cho lần chạy này, ghi cạnh player_cache.json (chỉ user hiện tại đọc được)"""
+        token = secrets.token_urlsafe(32)
+        token_file = self.script_dir / TOKEN_FILE_NAME
+        fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(token)
+        return token
+
+    def run(self, port: int = DAEMON_PORT, host: str = DAEMON_HOST):
+        """Vòng lặp chính: poll trạng thái phát, kiểm tra thư mục, dừng khi Ctrl+C / SIGTERM"""
+        server = self.serve(port, host)
+        print(f"[DAEMON] http://{host}:{server.server_address[1]} (Ctrl+C để dừng)")
+
+        def stop(signum, frame):
+            self.stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        next_rescan = time.monotonic() + RESCAN_INTERVAL
+        try:
+            while not self.stop_event.wait(POLL_MS / 1000):
+                with self.lock:
+                    self.poll(POLL_MS)
+                    if time.monotonic() >= next_rescan:
+                        self.refresh_folder()
+                        next_rescan = time.monotonic() + RESCAN_INTERVAL
+        finally:
+            server.shutdown()
+            server.server_close()
+            (self.script_dir / TOKEN_FILE_NAME).unlink(missing_ok=True)
+            self.stop_event.set()
+            analyzer = self.analyzer
+            if analyzer is not None:
+                analyzer.join()
+            with self.lock:
+                self.shutdown()
+            print("[DAEMON] Đã dừng, trạng thái đã lưu")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Player chạy nền, điều khiển qua HTTP cục bộ")
+    parser.add_argument("--dir", type=Path, help="Thư mục nhạc (mặc định: như lần chạy trước)")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).parent.absolute()
+    PlayerDaemon(script_dir, args.dir).run(args.port)
+
+
+if __name__ == "__main__":
+    main()
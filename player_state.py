@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Player State
+Lưu trạng thái player: gom nhiều lần ghi (debounce), ghi atomic, JSON gọn
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+
+
+# Gom các lần lưu trong khoảng này (giây) thành 1 lần ghi
+STATE_DEBOUNCE = 1.0
+
+
+class StateStore:
+    """
+    Trạng thái player trong RAM, ghi ra đĩa trễ STATE_DEBOUNCE giây
+
+    Nhiều lần update liên tiếp chỉ ghi 1 lần; ghi vào file tạm rồi rename
+    nên file cũ không bao giờ bị hỏng giữa chừng. Không phụ thuộc Qt.
+    """
+
+    def __init__(self, path: Path, delay: float = STATE_DEBOUNCE):
+        self.path = Path(path)
+        self.delay = delay
+        self.writes = 0
+        self._dirty = False
+        self._state = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        """Đọc trạng thái đã lưu ({} nếu chưa có hoặc file hỏng)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        if not isinstance(state, dict):
+            state = {}
+        with self._lock:
+            self._state = dict(state)
+        return state
+
+    def update(self, **fields):
+        """Cập nhật trạng thái, hẹn ghi sau `delay` giây"""
+        with self._lock:
+            self._state.update(fields)
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def remove(self, *keys):
+        """Bỏ các trường không còn dùng (vd: định dạng cache cũ)"""
+        with self._lock:
+            for key in keys:
+                if self._state.pop(key, None) is not None:
+                    self._dirty = True
+
+    def flush(self):
+        """Ghi ngay (atomic: file tạm rồi rename)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            data = json.dumps(self._state, ensure_ascii=False, separators=(',', ':'))
+            temp = self.path.with_name(self.path.name + ".tmp")
+            try:
+                with open(temp, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(temp, self.path)
+                self._dirty = False
+                self.writes += 1
+            except OSError as e:
+                print(f"Error saving state: {e}")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Playlist Model
+Model Qt cho danh sách bài: chỉ giữ mảng đường dẫn, view chỉ vẽ các dòng đang hiển thị
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import bisect
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QEvent
+from PyQt6.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+
+
+# Khoảng đệm trên/dưới mỗi dòng (px) - khớp "::item { padding }" trong stylesheet
+ROW_PADDING = 8
+
+
+def display_name(path: str) -> str:
+    """Tên hiển thị: tên file bỏ extension"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class PlaylistModel(QAbstractListModel):
+    """
+    Danh sách bài dạng model: row -> path và path -> row đều O(1)
+
+    Khi lọc (tìm kiếm), model chỉ hiện các bài trong kết quả: dòng của view
+    khác chỉ số trong danh sách phát, đổi qua lại bằng playlist_row / view_row.
+    """
+
+    PathRole = Qt.ItemDataRole.UserRole + 1
+    _ROLES = (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole, PathRole)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._paths = []
+        self._rows = {}
+        self._shown = None  # kết quả lọc (path theo thứ tự tên), None = hiện tất cả
+
+    def _visible(self):
+        return self._paths if self._shown is None else self._shown
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._visible())
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        # View hỏi ~7 role mỗi dòng mỗi lần vẽ: role không dùng thì trả về ngay
+        if role not in self._ROLES:
+            return None
+        visible = self._visible()
+        if not index.isValid() or index.row() >= len(visible):
+            return None
+        path = visible[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"🎵 {display_name(path)}"
+        return path
+
+    def set_tracks(self, paths: list):
+        """Thay toàn bộ danh sách (không copy list)"""
+        self.beginResetModel()
+        self._paths = paths
+        self._rows = {path: row for row, path in enumerate(paths)}
+        self._shown = None
+        self.endResetModel()
+
+    def set_filter(self, shown):
+        """
+        Chỉ hiện các bài trong `shown` (dãy path đã sắp xếp, vd SearchHits), None = bỏ lọc
+
+        Kết quả không đổi (gõ thêm chữ vẫn cùng các bài) -> không báo gì, không vẽ lại.
+        Kết quả đổi -> reset: O(1) phía model, PlaylistView (dòng cao cố định) cũng không
+        dựng layout từng dòng nên chỉ tốn vẽ lại các dòng đang hiện. Báo từng khoảng dòng
+        xóa/chèn thì phải so 2 kết quả (O(n)) mà view vẫn phải vẽ lại như reset.
+        """
+        if shown == self._shown:
+            return
+        self.beginResetModel()
+        self._shown = shown
+        self.endResetModel()
+
+    def append_tracks(self, paths: list):
+        """Thêm các bài vào cuối danh sách (khi quét theo từng đợt)"""
+        if not paths:
+            return
+        first = len(self._paths)
+        if self._shown is None:
+            self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        for row, path in enumerate(paths, first):
+            self._paths.append(path)
+            self._rows[path] = row
+        if self._shown is None:
+            self.endInsertRows()
+
+    def update_tracks(self, added: list, removed: list):
+        """
+        Bỏ các bài `removed`, chèn `added` đúng thứ tự tên (sửa list tại chỗ)
+
+        Đang lọc thì không báo từng dòng cho view - người gọi lọc lại bằng set_filter.
+        """
+        notify = self._shown is None
+        rows = sorted((self._rows[p] for p in removed if p in self._rows), reverse=True)
+        for row in rows:
+            if notify:
+                self.beginRemoveRows(QModelIndex(), row, row)
+            del self._paths[row]
+            if notify:
+                self.endRemoveRows()
+        for path in sorted(added):
+            row = bisect.bisect_left(self._paths, path)
+            if notify:
+                self.beginInsertRows(QModelIndex(), row, row)
+            self._paths.insert(row, path)
+            if notify:
+                self.endInsertRows()
+        self._rows = {path: row for row, path in enumerate(self._paths)}
+
+    def path(self, row: int) -> str:
+        return self._paths[row]
+
+    def row_of(self, path: str) -> int:
+        """Vị trí của path trong danh sách, -1 nếu không có"""
+        return self._rows.get(path, -1)
+
+    def playlist_row(self, view_row: int) -> int:
+        """Dòng của view -> chỉ số trong danh sách phát"""
+        if self._shown is None:
+            return view_row
+        return self.row_of(self._shown[view_row])
+
+    def view_row(self, row: int) -> int:
+        """Chỉ số trong danh sách phát -> dòng của view (-1 nếu bị lọc ẩn) - O(log n)"""
+        if not 0 <= row < len(self._paths):
+            return -1
+        if self._shown is None:
+            return row
+        shown = self._shown
+        path = self._paths[row]
+        i = bisect.bisect_left(shown, path)
+        return i if i < len(shown) and shown[i] == path else -1
+
+
+class PlaylistView(QTableView):
+    """
+    Danh sách bài 1 cột: bảng không header, không lưới, dòng cao cố định
+
+    QListView dựng lại layout của mọi dòng sau mỗi reset / chèn / xóa (O(n), hàng trăm ms
+    với 50.000 bài); ở đây vị trí dòng tính thẳng từ chỉ số nên lọc, cuộn tới dòng bất kỳ
+    đều không phụ thuộc số bài.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setTabKeyNavigation(False)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self._update_row_height()
+
+    def _update_row_height(self):
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 2 * ROW_PADDING)
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.FontChange:
+            self._update_row_height()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate Limiter
+Token bucket dùng chung cho mọi luồng tải: giới hạn tổng băng thông (bytes/s) và số request/s
+
+Author: Your Name
+License: MIT
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket thread-safe, đổi được rate/burst khi đang chạy (rate None/0 = không giới hạn)"""
+
+    def __init__(self, rate: float = None, burst: float = None):
+        self._cond = threading.Condition()
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.rate = 0.0
+        self.burst = 0.0
+        self.waited = 0.0
+        self.set_rate(rate, burst)
+        self._tokens = self.burst
+
+    def set_rate(self, rate: float = None, burst: float = None):
+        """Đổi giới hạn (burst mặc định = 1 giây theo rate)"""
+        with self._cond:
+            self._refill()
+            self.rate = float(rate or 0)
+            self.burst = float(burst or self.rate)
+            self._tokens = min(self._tokens, self.burst)
+            self._cond.notify_all()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Lấy `amount` token, chờ nếu chưa đủ
+
+        Lượng lớn hơn burst được cho "nợ" (token âm) để không chờ mãi;
+        các luồng sau sẽ chờ trả nợ.
+
+        Returns:
+            Số giây đã chờ
+        """
+        if not self.rate:
+            return 0.0
+
+        started = time.monotonic()
+        with self._cond:
+            while self.rate:
+                self._refill()
+                need = min(amount, self.burst)
+                if self._tokens >= need:
+                    self._tokens -= amount
+                    break
+                self._cond.wait((need - self._tokens) / self.rate)
+            waited = time.monotonic() - started
+            self.waited += waited
+        return waited
+
+
+class RateLimiter:
+    """Giới hạn toàn process: băng thông (bytes/s) + tần suất request (requests/s)"""
+
+    def __init__(self, bytes_per_sec: float = None, bytes_burst: float = None,
+                 requests_per_sec: float = None, requests_burst: float = None):
+        self.bandwidth = TokenBucket(bytes_per_sec, bytes_burst)
+        self.requests = TokenBucket(requests_per_sec, requests_burst)
+
+    def set_bandwidth(self, bytes_per_sec: float = None, burst: float = None):
+        """Đổi giới hạn băng thông khi đang chạy"""
+        self.bandwidth.set_rate(bytes_per_sec, burst)
+
+    def set_request_rate(self, requests_per_sec: float = None, burst: float = None):
+        """Đổi giới hạn request/s khi đang chạy"""
+        self.requests.set_rate(requests_per_sec, burst)
+
+    def consume_bytes(self, nbytes: int) -> float:
+        """Trừ băng thông cho `nbytes` vừa tải, trả về số giây phải chờ"""
+        return self.bandwidth.acquire(nbytes) if nbytes > 0 else 0.0
+
+    def before_request(self) -> float:
+        """Gọi trước mỗi request tới YouTube, trả về số giây phải chờ"""
+        return self.requests.acquire(1)
+
+    @property
+    def waited(self) -> float:
+        """Tổng thời gian các luồng đã chờ limiter (giây)"""
+        return self.bandwidth.waited + self.requests.waited
+
+    def summary(self) -> str:
+        return (f"Limiter wait: {self.waited:.1f}s "
+                f"(bandwidth {self.bandwidth.waited:.1f}s, requests {self.requests.waited:.1f}s)")
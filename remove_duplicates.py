@@ -2,16 +2,28 @@
 # -*- coding: utf-8 -*-
 """
 Lọc nhạc trùng lặp trong thư mục downloads
-Dựa trên tên file và kích thước file
+Dựa trên tên file, nội dung file (hash) hoặc âm thanh (fingerprint)
 """
 
 import os
 import sys
+import json
 import hashlib
+import math
+import filecmp
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import re
 
+from audio_files import list_audio_files
+from audio_fingerprint import find_fingerprint_duplicates
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 # Fix encoding cho Windows
 if sys.platform == 'win32':
     import io
@@ -34,23 +46,145 @@ def normalize_title(filename: str) -> str:
     return name
 
 
-def get_file_hash(filepath: Path, chunk_size: int = 8192) -> str:
-    """Tính MD5 hash của file"""
+# Cache hash nằm trong thư mục nhạc, key theo (path, size, mtime)
+HASH_CACHE_NAME = ".hash_cache.json"
+
+# Số byte đọc ở đầu và cuối file cho partial hash
+PARTIAL_BLOCK = 64 * 1024
+
+
+def get_file_hash(filepath: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Tính MD5 hash của toàn bộ file (đọc theo từng chunk)"""
+    hasher = hashlib.md5()
+    with open(filepath, 'rb') as f:
+        for data in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def get_partial_hash(filepath: Path, size: int, block: int = PARTIAL_BLOCK) -> str:
+    """MD5 của block đầu + block cuối file (lọc nhanh trước khi hash toàn bộ)"""
     hasher = hashlib.md5()
     with open(filepath, 'rb') as f:
-        # Chỉ hash 1MB đầu để nhanh hơn
-        data = f.read(1024 * 1024)
-        hasher.update(data)
+        hasher.update(f.read(block))
+        if size > 2 * block:
+            f.seek(-block, os.SEEK_END)
+            hasher.update(f.read(block))
+        else:
+            hasher.update(f.read())
     return hasher.hexdigest()
 
 
+class HashCache:
+    """Cache partial/full hash trên đĩa, tự bỏ entry khi size hoặc mtime đổi"""
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+    
+    def get(self, filepath: Path, stat: os.stat_result, kind: str) -> str:
+        entry = self.entries.get(str(filepath))
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry.get(kind)
+        return None
+    
+    def put(self, filepath: Path, stat: os.stat_result, kind: str, value: str):
+        key = str(filepath)
+        entry = self.entries.get(key)
+        if not entry or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+            entry = self.entries[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        entry[kind] = value
+        self.dirty = True
+    
+    def save(self):
+        """Ghi cache (atomic: file tạm rồi rename)"""
+        if not self.dirty:
+            return
+        temp = self.path.with_name(self.path.name + ".tmp")
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(temp, self.path)
+        self.dirty = False
+
+
+def _hash_stage(files: list, stats: dict, kind: str, cache: HashCache, workers: int) -> dict:
+    """Hash song song các file chưa có trong cache, trả về {file: hash}"""
+    def compute(f):
+        if kind == 'partial':
+            return get_partial_hash(f, stats[f].st_size)
+        return get_file_hash(f)
+    
+    result = {}
+    todo = []
+    for f in files:
+        cached = cache.get(f, stats[f], kind)
+        if cached:
+            result[f] = cached
+        else:
+            todo.append(f)
+    
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for f, digest in zip(todo, executor.map(compute, todo)):
+                result[f] = digest
+                cache.put(f, stats[f], kind, digest)
+    return result
+
+
+def _regroup(groups: list, hashes: dict) -> list:
+    """Chia mỗi nhóm theo hash, bỏ nhóm chỉ còn 1 file"""
+    result = []
+    for group in groups:
+        by_hash = defaultdict(list)
+        for f in group:
+            by_hash[hashes[f]].append(f)
+        result.extend(g for g in by_hash.values() if len(g) > 1)
+    return result
+
+
+def find_content_duplicates(folder: Path, workers: int = None) -> dict:
+    """
+    Tìm file trùng nội dung theo 3 bước, chỉ đọc file khi thật sự cần
+    
+    1. Group theo kích thước (chỉ stat, không đọc file)
+    2. Partial hash (block đầu + cuối) cho nhóm cùng kích thước
+    3. Hash toàn bộ file cho nhóm trùng partial hash
+    
+    Hash được cache trong HASH_CACHE_NAME theo (path, size, mtime).
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    cache = HashCache(folder / HASH_CACHE_NAME)
+    
+    stats = {f: f.stat() for f in list_audio_files(folder)}
+    by_size = defaultdict(list)
+    for f, st in stats.items():
+        by_size[st.st_size].append(f)
+    groups = [g for g in by_size.values() if len(g) > 1]
+    
+    candidates = [f for g in groups for f in g]
+    groups = _regroup(groups, _hash_stage(candidates, stats, 'partial', cache, workers))
+    
+    candidates = [f for g in groups for f in g]
+    full_hashes = _hash_stage(candidates, stats, 'full', cache, workers)
+    groups = _regroup(groups, full_hashes)
+    
+    cache.save()
+    return {full_hashes[g[0]]: g for g in groups}
+
+
 def find_duplicates(folder: Path) -> dict:
     """Tìm file trùng lặp dựa trên tên chuẩn hóa"""
-    mp3_files = list(folder.glob("*.mp3"))
+    audio_files = list_audio_files(folder)
     
-    # Group theo tên chuẩn hóa
+    # Group theo tên chuẩn hóa (cùng bài ở .mp3 và .m4a/.opus cũng tính là trùng)
     groups = defaultdict(list)
-    for f in mp3_files:
+    for f in audio_files:
         normalized = normalize_title(f.name)
         groups[normalized].append(f)
     
@@ -59,18 +193,133 @@ def find_duplicates(folder: Path) -> dict:
     return duplicates
 
 
-def remove_duplicates(folder: Path, dry_run: bool = True) -> int:
+# Từ "nhiễu" bị bỏ khi so tên gần đúng (thêm/bớt tùy thư viện)
+NOISE_TOKENS = (
+    'official', 'music video', 'video', 'mv', 'm/v', 'lyric', 'lyrics', 'audio', 'visualizer',
+    'hd', '4k', 'remix', 'vietsub', 'engsub', 'mp3',
+)
+
+# Ngưỡng Jaccard (trigram ký tự) để coi 2 tên là cùng một bài
+FUZZY_THRESHOLD = 0.8
+
+
+def clean_title(filename: str, noise: tuple = NOISE_TOKENS) -> str:
+    """Tên chuẩn hóa đã bỏ từ nhiễu (MV, lyrics, official, ...)"""
+    name = re.sub(r'^\d{1,4}\s*[-_\.]\s*', '', Path(filename).stem).lower()
+    for token in noise:
+        if not token.isalnum():
+            name = name.replace(token, ' ')
+    words = re.sub(r'[^\w\s]', ' ', name).split()
+    return ' '.join(w for w in words if w not in noise)
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def find_fuzzy_duplicates(folder: Path, threshold: float = FUZZY_THRESHOLD) -> dict:
+    """
+    Tìm file trùng theo tên gần đúng (Jaccard trigram >= threshold)
+    
+    Không so mọi cặp: trigram được xếp theo độ hiếm, mỗi tên chỉ index
+    "prefix" gồm các trigram hiếm nhất - 2 tên đạt ngưỡng chắc chắn chung
+    ít nhất 1 trigram trong prefix (prefix filtering), sau đó mới tính Jaccard thật.
+    """
+    files = list_audio_files(folder)
+    names = {f: clean_title(f.name) for f in files}
+    records = [(f, _trigrams(n)) for f, n in names.items() if n]
+    
+    frequency = defaultdict(int)
+    for _, grams in records:
+        for g in grams:
+            frequency[g] += 1
+    # Đổi trigram thành số theo độ hiếm (0 = hiếm nhất) -> sort/giao tập nhanh hơn
+    rank = {g: r for r, g in enumerate(sorted(frequency, key=lambda g: (frequency[g], g)))}
+    records = [(f, {rank[g] for g in grams}) for f, grams in records]
+    
+    # Xử lý tên ngắn trước để ràng buộc độ dài chỉ cần kiểm tra 1 chiều
+    records.sort(key=lambda r: len(r[1]))
+    index_ratio = 2 * threshold / (1 + threshold)
+    index = defaultdict(list)
+    start = defaultdict(int)
+    scores = {}
+    for i, (f, grams) in enumerate(records):
+        size = len(grams)
+        ordered = sorted(grams)
+        min_size = threshold * size
+    
+        candidates = set()
+        for g in ordered[:size - math.ceil(threshold * size - 1e-9) + 1]:
+            postings = index[g]
+            # Tên trong index ngắn dần về đầu danh sách -> bỏ hẳn tên quá ngắn
+            k = start[g]
+            while k < len(postings) and len(records[postings[k]][1]) < min_size:
+                k += 1
+            start[g] = k
+            candidates.update(postings[k:])
+        for j in candidates:
+            other = records[j][1]
+            shared = len(grams & other)
+            score = shared / (size + len(other) - shared)
+            if score >= threshold:
+                scores[(records[j][0], f)] = score
+    
+        # Tên sau luôn dài hơn -> chỉ cần index prefix ngắn hơn
+        for g in ordered[:size - math.ceil(index_ratio * size - 1e-9) + 1]:
+            index[g].append(i)
+    
+    # Gom cụm các cặp đạt ngưỡng (union-find)
+    parent = {}
+    
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    
+    for a, b in scores:
+        parent[find(a)] = find(b)
+    
+    clusters = defaultdict(list)
+    for f in parent:
+        clusters[find(f)].append(f)
+    lowest = defaultdict(lambda: 1.0)
+    for (a, b), score in scores.items():
+        root = find(a)
+        lowest[root] = min(lowest[root], score)
+    
+    return {
+        f"~{lowest[root]:.2f} {names[min(g)]}": sorted(g)
+        for root, g in clusters.items() if len(g) > 1
+    }
+
+
+# Cách tìm trùng: theo tên chuẩn hóa, tên gần đúng, nội dung file hoặc âm thanh
+FINDERS = {
+    'title': find_duplicates,
+    'fuzzy': find_fuzzy_duplicates,
+    'content': find_content_duplicates,
+    'fingerprint': find_fingerprint_duplicates,
+}
+
+
+def remove_duplicates(folder: Path, dry_run: bool = True, mode: str = "title") -> int:
     """
     Xóa file trùng lặp, giữ lại file có số thứ tự nhỏ nhất
     
     Args:
         folder: Thư mục chứa file
         dry_run: True = chỉ hiển thị, False = xóa thật
+        mode: "title" = theo tên chuẩn hóa, "fuzzy" = theo tên gần đúng,
+              "content" = theo nội dung (hash),
+              "fingerprint" = theo âm thanh (bắt cả bản upload khác nhau)
     
     Returns:
         Số file đã xóa
     """
-    duplicates = find_duplicates(folder)
+    duplicates = FINDERS[mode](folder)
     
     if not duplicates:
         print("[OK] Khong tim thay file trung lap!")
@@ -102,6 +351,106 @@ def remove_duplicates(folder: Path, dry_run: bool = True) -> int:
     return removed
 
 
+# ioctl FICLONE (Linux: Btrfs, XFS, ...) - tạo reflink chia sẻ dữ liệu, copy-on-write
+FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """Tạo dst là reflink của src, False nếu filesystem không hỗ trợ"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def _replace_with_link(keep: Path, target: Path) -> str:
+    """
+    Thay target bằng reflink (ưu tiên) hoặc hardlink tới keep, atomic theo từng file
+
+    Link được tạo ở tên tạm cạnh target rồi rename đè lên, nên đường dẫn
+    target luôn tồn tại và luôn đầy đủ nội dung.
+
+    Returns:
+        "reflink" hoặc "hardlink"
+    """
+    temp = target.with_name(f".{target.name}.link-tmp")
+    temp.unlink(missing_ok=True)
+    method = "reflink"
+    try:
+        if not _reflink(keep, temp):
+            method = "hardlink"
+            os.link(keep, temp)
+        os.replace(temp, target)
+    except OSError:
+        temp.unlink(missing_ok=True)
+        raise
+    return method
+
+
+def link_duplicates(folder: Path, dry_run: bool = True, mode: str = "content") -> tuple:
+    """
+    Thay file trùng giống hệt từng byte bằng reflink/hardlink thay vì xóa
+
+    Mọi đường dẫn vẫn dùng được (playlist ngoài không bị hỏng), dung lượng được thu hồi.
+    File khác nội dung (vd: nhóm theo tên/fingerprint) được bỏ qua.
+
+    Args:
+        folder: Thư mục chứa file
+        dry_run: True = chỉ hiển thị, False = link thật
+        mode: Cách tìm trùng (như remove_duplicates), "content" là an toàn nhất
+
+    Returns:
+        (số file đã link, số byte thu hồi)
+    """
+    duplicates = FINDERS[mode](folder)
+    
+    if not duplicates:
+        print("[OK] Khong tim thay file trung lap!")
+        return 0, 0
+    
+    linked = 0
+    reclaimed = 0
+    
+    print(f"\n[FOUND] Tim thay {len(duplicates)} nhom file trung lap:\n")
+    
+    for title, files in duplicates.items():
+        files_sorted = sorted(files, key=lambda x: x.name)
+        keep = files_sorted[0]
+        
+        print(f"  [{title[:50]}...]")
+        print(f"    GIU : {keep.name}")
+        
+        for f in files_sorted[1:]:
+            try:
+                if os.path.samefile(keep, f):
+                    print(f"    (da link): {f.name}")
+                    continue
+                # Hash đã xác nhận ở chế độ content, các chế độ khác phải so từng byte
+                if mode != 'content' and not filecmp.cmp(keep, f, shallow=False):
+                    print(f"    BO QUA (khac noi dung): {f.name}")
+                    continue
+                stat = f.stat()
+                print(f"    LINK: {f.name}")
+                if dry_run:
+                    continue
+                method = _replace_with_link(keep, f)
+                linked += 1
+                # File còn hardlink khác thì chưa giải phóng được dung lượng
+                if stat.st_nlink == 1:
+                    reclaimed += stat.st_size
+                print(f"          -> {method}")
+            except OSError as e:
+                print(f"    [ERROR] Khong link duoc {f.name}: {e}")
+        print()
+    
+    return linked, reclaimed
+
+
 def main():
     """Entry point"""
     print("=" * 60)
@@ -116,42 +465,67 @@ def main():
         input("\nNhan Enter de thoat...")
         return
     
-    # Đếm file MP3
-    mp3_count = len(list(downloads_folder.glob("*.mp3")))
+    # Đếm file nhạc
+    audio_count = len(list_audio_files(downloads_folder))
     print(f"\n[INFO] Thu muc: {downloads_folder}")
-    print(f"[INFO] Tong so file MP3: {mp3_count}")
+    print(f"[INFO] Tong so file nhac: {audio_count}")
     print("-" * 60)
     
+    # Chọn cách tìm trùng
+    print("\nChe do tim trung:")
+    print("  1. Theo ten bai (mac dinh)")
+    print("  2. Theo noi dung file (hash, bat ca file khac ten)")
+    print("  3. Theo am thanh (fingerprint, bat ca ban MV/Lyrics/reupload - can numpy)")
+    print("  4. Theo ten gan dung (bo MV/Lyrics/Official..., cho diem giong nhau)")
+    modes = {'2': 'content', '3': 'fingerprint', '4': 'fuzzy'}
+    mode = modes.get(input("Chon (1/2/3/4): ").strip(), 'title')
+    
     # Tìm duplicates (dry run)
-    duplicates = find_duplicates(downloads_folder)
+    duplicates = FINDERS[mode](downloads_folder)
     
     if not duplicates:
         print("\n[OK] Khong co file trung lap!")
         input("\nNhan Enter de thoat...")
         return
     
+    # Chọn hành động
+    print("\nHanh dong:")
+    print("  1. Xoa file trung (mac dinh)")
+    print("  2. Thay bang link (giu nguyen duong dan, chi file giong het tung byte)")
+    link = input("Chon (1/2): ").strip() == '2'
+    
     # Hiển thị và hỏi xác nhận
     total_to_remove = sum(len(v) - 1 for v in duplicates.values())
+    action = "thay bang link" if link else "bi xoa"
     
-    print(f"\n[FOUND] {len(duplicates)} nhom trung lap ({total_to_remove} file se bi xoa)")
+    print(f"\n[FOUND] {len(duplicates)} nhom trung lap ({total_to_remove} file se {action})")
     print("-" * 60)
     
     # Hiển thị preview
-    remove_duplicates(downloads_folder, dry_run=True)
+    if link:
+        link_duplicates(downloads_folder, dry_run=True, mode=mode)
+    else:
+        remove_duplicates(downloads_folder, dry_run=True, mode=mode)
     
-    # Xác nhận xóa
+    # Xác nhận
     print("-" * 60)
-    confirm = input("\nBan co muon XOA cac file trung lap? (y/n): ").strip().lower()
+    if link:
+        confirm = input("\nBan co muon THAY cac file trung bang link? (y/n): ").strip().lower()
+    else:
+        confirm = input("\nBan co muon XOA cac file trung lap? (y/n): ").strip().lower()
     
-    if confirm == 'y':
-        removed = remove_duplicates(downloads_folder, dry_run=False)
+    if confirm == 'y' and link:
+        linked, reclaimed = link_duplicates(downloads_folder, dry_run=False, mode=mode)
+        print(f"\n[DONE] Da link {linked} file, thu hoi {reclaimed / 1024 / 1024:.1f} MB")
+    elif confirm == 'y':
+        removed = remove_duplicates(downloads_folder, dry_run=False, mode=mode)
         print(f"\n[DONE] Da xoa {removed} file trung lap!")
         
         # Đếm lại
-        new_count = len(list(downloads_folder.glob("*.mp3")))
-        print(f"[INFO] Con lai: {new_count} file MP3")
+        new_count = len(list_audio_files(downloads_folder))
+        print(f"[INFO] Con lai: {new_count} file nhac")
     else:
-        print("\n[CANCELLED] Khong xoa gi ca.")
+        print("\n[CANCELLED] Khong thay doi gi ca.")
     
     input("\nNhan Enter de thoat...")
 
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search Index
+Chỉ mục tìm kiếm theo tiền tố từ cho thư viện nhạc, bỏ dấu tiếng Việt
+("tinh yeu" khớp "tình yêu"), tra cứu mỗi lần gõ phím không phải duyệt cả danh sách
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import re
+import bisect
+import threading
+import unicodedata
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from library_index import TAG_FIELDS
+
+
+# Tiền tố đến PREFIX_MAX ký tự có posting riêng; từ dài hơn tra theo từ điển các từ đầy đủ
+PREFIX_MAX = 4
+_PREFIX_LENGTHS = range(1, PREFIX_MAX + 1)
+
+# Dấu thanh/dấu phụ sau khi tách NFD (tiếng Việt nằm trọn trong khối này)
+_MARKS = re.compile('[\u0300-\u036f]')
+_WORD = re.compile(r'\w+')
+
+
+def fold(text: str) -> str:
+    """Chữ thường, bỏ dấu: "Tình Yêu Đẹp" -> "tinh yeu dep" """
+    text = unicodedata.normalize('NFD', text.lower()).replace('đ', 'd')
+    return _MARKS.sub('', text)
+
+
+def tokenize(text: str) -> list:
+    """Các từ (đã bỏ dấu) của tiêu đề / câu tìm kiếm"""
+    return _WORD.findall(fold(text))
+
+
+def track_text(path: str, entry: dict = None) -> str:
+    """Nội dung tìm kiếm của 1 bài: tên file + tags trong library index (nếu có)"""
+    parts = [os.path.splitext(os.path.basename(path))[0]]
+    if entry:
+        parts.extend(entry[field] for field in TAG_FIELDS if entry.get(field))
+    return ' '.join(parts)
+
+
+def _keys(tokens) -> set:
+    """Khóa posting của 1 bài: tiền tố ngắn của mọi từ + từ dài đầy đủ"""
+    keys = {token[:n] for token in tokens for n in _PREFIX_LENGTHS}
+    keys.update(token for token in tokens if len(token) > PREFIX_MAX)
+    return keys
+
+
+def _intersect(postings: list):
+    """Giao các dãy doc tăng dần (ngắn nhất trước, không rỗng)"""
+    if np is None or len(postings) == 1:
+        docs = postings[0][:]
+        for posting in postings[1:]:
+            members = set(posting)
+            docs = [doc for doc in docs if doc in members]
+        return docs
+    # numpy: tra nhị phân từng doc trong posting dài (không dựng set cả chục nghìn doc mỗi phím gõ)
+    docs = np.asarray(postings[0])
+    for posting in postings[1:]:
+        posting = np.asarray(posting)
+        found = np.minimum(np.searchsorted(posting, docs), len(posting) - 1)
+        docs = docs[posting[found] == docs]
+    return docs.tolist()
+
+
+class SearchHits:
+    """Kết quả tìm kiếm: danh sách path theo thứ tự tên (không copy path)"""
+
+    def __init__(self, docs, paths: list):
+        self._docs = docs
+        self._paths = paths
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __getitem__(self, i: int) -> str:
+        return self._paths[self._docs[i]]
+
+    def __eq__(self, other) -> bool:
+        """Cùng kết quả (cùng chỉ mục, cùng các doc) - để bỏ qua phím gõ không đổi kết quả"""
+        if not isinstance(other, SearchHits):
+            return NotImplemented
+        return (self._paths is other._paths and len(self._docs) == len(other._docs)
+                and list(self._docs) == list(other._docs))
+
+
+class SearchIndex:
+    """
+    Tiền tố (đến PREFIX_MAX ký tự) và từ dài đầy đủ -> doc ID tăng dần
+
+    Doc ID cấp theo thứ tự thêm vào; khi quét thư mục (theo tên file) thì thứ tự
+    doc ID cũng là thứ tự danh sách phát nên kết quả không phải sắp xếp lại.
+    Bài thêm sau (ngoài thứ tự) được chèn vào đúng chỗ khi trả kết quả. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def clear(self):
+        """Bỏ toàn bộ (khi đổi thư mục nhạc)"""
+        with self._lock:
+            self._paths = []      # doc -> path (None nếu đã xóa)
+            self._tokens = []     # doc -> các từ
+            self._docs = {}       # path -> doc
+            self._postings = {}   # tiền tố / từ dài -> array doc tăng dần
+            self._long = []       # các từ dài hơn PREFIX_MAX, sắp xếp (tra tiền tố dài bằng bisect)
+            self._ordered = 0     # số doc đầu tiên đúng thứ tự path
+            self._last_ordered = None
+
+    def add(self, path: str, text: str):
+        """Thêm bài với nội dung tìm kiếm `text` (tên hiển thị, tags...)"""
+        self.add_many([(path, text)])
+
+    def add_many(self, items):
+        """Thêm nhiều bài [(path, text), ...] - từ điển từ dài chỉ sắp xếp lại 1 lần"""
+        with self._lock:
+            postings = self._postings
+            get = postings.get
+            new_long = []
+            for path, text in items:
+                if path in self._docs:
+                    self.remove(path)
+                doc = len(self._paths)
+                tokens = tuple(tokenize(text))
+                self._paths.append(path)
+                self._tokens.append(tokens)
+                self._docs[path] = doc
+                for key in _keys(tokens):
+                    posting = get(key)
+                    if posting is None:
+                        posting = postings[key] = array('i')
+                        if len(key) > PREFIX_MAX:
+                            new_long.append(key)
+                    posting.append(doc)
+                if self._ordered == doc and (self._last_ordered is None or path > self._last_ordered):
+                    self._ordered += 1
+                    self._last_ordered = path
+            if new_long:
+                self._long.extend(new_long)
+                self._long.sort()
+
+    def remove(self, path: str):
+        with self._lock:
+            doc = self._docs.pop(path, None)
+            if doc is None:
+                return
+            for key in _keys(self._tokens[doc]):
+                posting = self._postings[key]
+                posting.remove(doc)
+                if not posting:
+                    del self._postings[key]
+                    if len(key) > PREFIX_MAX:
+                        del self._long[bisect.bisect_left(self._long, key)]
+            self._paths[doc] = None
+            self._tokens[doc] = ()
+
+    def _posting(self, word: str):
+        """Các doc có từ bắt đầu bằng `word` (tăng dần)"""
+        if len(word) <= PREFIX_MAX:
+            return self._postings.get(word, ())
+        start = bisect.bisect_left(self._long, word)
+        end = start
+        while end < len(self._long) and self._long[end].startswith(word):
+            end += 1
+        if end - start == 1:
+            return self._postings[self._long[start]]
+        return sorted(set().union(*(self._postings[t] for t in self._long[start:end])))
+
+    def search(self, query: str) -> SearchHits:
+        """
+        Các bài có đủ mọi từ của `query` (mỗi từ là tiền tố của 1 từ trong tiêu đề)
+
+        Returns:
+            SearchHits theo thứ tự path, None nếu query rỗng (không lọc)
+        """
+        words = sorted(set(tokenize(query)))
+        if not words:
+            return None
+        with self._lock:
+            postings = sorted((self._posting(word) for word in words), key=len)
+            if not postings[0]:
+                return SearchHits((), self._paths)
+
+            docs = _intersect(postings)
+
+            # Bài thêm sau khi quét: chèn vào đúng thứ tự path
+            split = bisect.bisect_left(docs, self._ordered)
+            if split < len(docs):
+                head = list(docs[:split])
+                tail = sorted(docs[split:], key=self._paths.__getitem__)
+                hits = SearchHits(head, self._paths)
+                for doc in tail:
+                    head.insert(bisect.bisect_left(hits, self._paths[doc]), doc)
+                docs = head
+            return SearchHits(docs, self._paths)
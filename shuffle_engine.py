@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shuffle Engine
+Phát ngẫu nhiên không lặp: next / previous / bỏ bài bất kỳ đều O(1),
+thêm/xóa bài giữa vòng không phải xáo lại, lưu gọn dạng seed + cursor
+
+Author: Your Name
+License: MIT
+"""
+
+import os
+import bisect
+import hashlib
+import random
+from collections import deque
+
+
+# Số bài gần nhất giữ trong history (cho nút "bài trước")
+HISTORY_LIMIT = 100
+
+# Khóa shuffle là số 64 bit
+KEY_MAX = (1 << 64) - 1
+
+
+def shuffle_key(seed: int, path: str) -> int:
+    """Khóa sắp xếp của 1 bài trong vòng shuffle (theo tên file, không phụ thuộc vị trí)"""
+    name = os.path.basename(path)
+    digest = hashlib.blake2b(f"{seed}:{name}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class ShuffleEngine:
+    """
+    Vòng shuffle = các bài sắp theo khóa shuffle_key(seed, tên file)
+
+    - `_order`/`_keys`: thứ tự của vòng, `_cursor` trỏ tới bài kế tiếp
+    - `_upcoming`: tập bài chưa phát; bài đã phát/bị xóa chỉ bị bỏ khỏi tập
+      (tombstone), `next` bỏ qua khi đi tới -> O(1) khấu hao
+    - Bài thêm giữa vòng nhận khóa ngẫu nhiên sau cursor (lưu trong `_extra`)
+    """
+
+    def __init__(self, seed: int = None):
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.history = deque(maxlen=HISTORY_LIMIT)
+        self._order = []
+        self._keys = []
+        self._cursor = 0
+        self._upcoming = set()
+        self._extra = {}
+        self._taken_ahead = set()
+
+    def __len__(self) -> int:
+        """Số bài chưa phát trong vòng"""
+        return len(self._upcoming)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._upcoming
+
+    def key(self, path: str) -> int:
+        name = os.path.basename(path)
+        return self._extra.get(name) or shuffle_key(self.seed, name)
+
+    def _build(self, paths: list, cursor: int = None, skipped: set = frozenset()):
+        ordered = sorted((self.key(p), p) for p in paths)
+        self._keys = [k for k, _ in ordered]
+        self._order = [p for _, p in ordered]
+        self._cursor = 0 if cursor is None else bisect.bisect_left(self._keys, cursor)
+        self._upcoming = {
+            p for p in self._order[self._cursor:] if os.path.basename(p) not in skipped
+        }
+        self._taken_ahead = set(skipped)
+
+    def reset(self, paths: list, seed: int = None):
+        """Vòng mới với seed mới"""
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self._extra = {}
+        self._build(paths)
+
+    def peek(self) -> str:
+        """Bài kế tiếp của vòng (None nếu đã hết vòng)"""
+        while self._cursor < len(self._order) and self._order[self._cursor] not in self._upcoming:
+            self._cursor += 1
+        if self._cursor == len(self._order):
+            return None
+        return self._order[self._cursor]
+
+    def take(self, path: str):
+        """Đánh dấu bài đã phát (bài kế tiếp hoặc bài chọn tay bất kỳ)"""
+        if path in self._upcoming:
+            self._upcoming.discard(path)
+            if self.peek() is not None and self.key(path) > self._keys[self._cursor]:
+                self._taken_ahead.add(os.path.basename(path))
+        if not self.history or self.history[-1] != path:
+            self.history.append(path)
+
+    def previous(self) -> str:
+        """Bài phát trước bài hiện tại (None nếu chưa có history)"""
+        if len(self.history) > 1:
+            self.history.pop()
+        return self.history[-1] if self.history else None
+
+    def add(self, path: str):
+        """Thêm bài mới vào phần chưa phát của vòng, không xáo lại"""
+        if path in self._upcoming:
+            return
+        key = self.key(path)
+        head = self.peek()
+        if head is not None and key <= self._keys[self._cursor]:
+            # Khóa rơi vào phần đã phát -> khóa ngẫu nhiên sau cursor
+            key = random.randint(self._keys[self._cursor] + 1, KEY_MAX)
+            self._extra[os.path.basename(path)] = key
+        elif head is None and self._order:
+            # Vòng đã hết: bài mới là bài duy nhất còn lại
+            key = KEY_MAX
+            self._extra[os.path.basename(path)] = key
+        row = bisect.bisect_right(self._keys, key)
+        self._keys.insert(row, key)
+        self._order.insert(row, path)
+        self._upcoming.add(path)
+
+    def remove(self, path: str):
+        """Bỏ bài khỏi vòng (file bị xóa/đổi tên)"""
+        self._upcoming.discard(path)
+        self._extra.pop(os.path.basename(path), None)
+        if path in self.history:
+            self.history = deque((p for p in self.history if p != path), maxlen=HISTORY_LIMIT)
+
+    def state(self) -> dict:
+        """Dạng gọn để lưu: seed, khóa của bài kế tiếp, bài chọn tay phía trước, bài thêm giữa vòng"""
+        head = self.peek()
+        cursor = self._keys[self._cursor] if head is not None else None
+        if cursor is None:
+            skipped, extra = [], {}
+        else:
+            self._taken_ahead = {n for n in self._taken_ahead if self.key(n) > cursor}
+            skipped = sorted(self._taken_ahead)
+            extra = {n: k for n, k in self._extra.items() if k >= cursor}
+        return {
+            'seed': self.seed,
+            'cursor': cursor,
+            'skipped': skipped,
+            'extra': extra,
+            'history': [os.path.basename(p) for p in self.history],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, paths: list):
+        """Dựng lại engine từ state() và danh sách bài hiện tại (None nếu state hỏng)"""
+        try:
+            engine = cls(int(state['seed']))
+            cursor = state['cursor']
+            engine._extra = {str(n): int(k) for n, k in state.get('extra', {}).items()}
+            skipped = set(state.get('skipped', []))
+            history = state.get('history', [])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None
+        if cursor is None:
+            engine._build(paths)
+            engine._cursor = len(engine._order)
+            engine._upcoming = set()
+        else:
+            engine._build(paths, int(cursor), skipped)
+        by_name = {os.path.basename(p): p for p in paths}
+        engine.history.extend(by_name[n] for n in history if n in by_name)
+        return engine